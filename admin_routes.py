@@ -1,53 +1,77 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, Form, UploadFile, File
 from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User, Company, Tool, ProcessedFile
+from sqlalchemy import delete, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from database import get_async_db
+from models import User, Company, Tool, ToolGuide, ProcessedFile, ProcessingJob, ProcessingJobFile
+from processing import jobs, job_worker
+import user_context
+import catalog
+import guides
+import asyncio
 import os
 import json
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-def require_admin(request: Request, db: Session = Depends(get_db)):
+async def require_admin(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Middleware to verify that the user is an administrator"""
     user_session = request.session.get("user")
     if not user_session:
         raise HTTPException(status_code=401, detail="No autorizado")
     
-    user = db.query(User).filter(User.email == user_session["email"]).first()
+    user = await db.scalar(select(User).where(User.email == user_session["email"]))
     if not user or not user.is_admin:
         raise HTTPException(status_code=403, detail="Acceso denegado - Se requieren permisos de administrador")
     
     return user
 
 @router.get("/", response_class=HTMLResponse)
-async def admin_panel(request: Request, db: Session = Depends(get_db)):
+async def admin_panel(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Main administration panel"""
-    admin_user = require_admin(request, db)
+    admin_user = await require_admin(request, db)
     
-    # Get data for the admin panel
-    users = db.query(User).all()
-    companies = db.query(Company).all()
-    tools = db.query(Tool).all()
+    # Get data for the admin panel (relationships used by the template are loaded up front)
+    users = (await db.scalars(select(User).options(selectinload(User.companies)))).all()
+    companies = (await db.scalars(
+        select(Company).options(selectinload(Company.tools), selectinload(Company.users))
+    )).all()
+    tools = (await db.scalars(
+        select(Tool).options(
+            selectinload(Tool.company),
+            selectinload(Tool.linked_processing_tools),
+            selectinload(Tool.guide)
+        )
+    )).all()
+    
+    # Count processed files per tool without loading the files themselves
+    processed_counts = dict((await db.execute(
+        select(ProcessedFile.tool_id, func.count(ProcessedFile.id)).group_by(ProcessedFile.tool_id)
+    )).all())
     
     return templates.TemplateResponse("admin.html", {
         "request": request,
         "admin_user": admin_user,
         "users": users,
         "companies": companies,
-        "tools": tools
+        "tools": tools,
+        "processed_counts": processed_counts
     })
 
 @router.get("/api/files")
-async def get_all_files(request: Request, db: Session = Depends(get_db)):
+async def get_all_files(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Retrieve all processed files for the admin panel"""
-    admin_user = require_admin(request, db)
+    admin_user = await require_admin(request, db)
     
     try:
         # Obtener todos los archivos con información relacionada
-        files = db.query(ProcessedFile).join(User).join(Tool).join(Company).all()
+        files = (await db.scalars(
+            select(ProcessedFile).join(User).join(Tool).join(Company)
+            .options(selectinload(ProcessedFile.user), selectinload(ProcessedFile.tool).selectinload(Tool.company))
+        )).all()
         
         files_data = []
         for file in files:
@@ -86,14 +110,14 @@ async def get_all_files(request: Request, db: Session = Depends(get_db)):
 async def download_admin_file(
     file_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Descargar archivo procesado desde el panel de administración"""
-    admin_user = require_admin(request, db)
+    admin_user = await require_admin(request, db)
     
     try:
         # Obtener archivo
-        file_obj = db.query(ProcessedFile).filter(ProcessedFile.id == file_id).first()
+        file_obj = await db.scalar(select(ProcessedFile).where(ProcessedFile.id == file_id))
         
         if not file_obj:
             raise HTTPException(status_code=404, detail="Archivo no encontrado")
@@ -110,18 +134,34 @@ async def download_admin_file(
         print(f"❌ Error downloading file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al descargar archivo: {str(e)}")
 
+@router.post("/api/jobs/{job_id}/reprocess")
+async def reprocess_job(job_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Volver a ejecutar un trabajo con sus mismas entradas, con la prioridad más baja"""
+    admin_user = await require_admin(request, db)
+    
+    try:
+        new_job_id = await asyncio.to_thread(jobs.clone_job, job_id, "admin-reprocess")
+    except jobs.JobInputsPurged:
+        raise HTTPException(status_code=410, detail="Los archivos de entrada del trabajo ya no están disponibles")
+    if new_job_id is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    job_worker.wake_workers()
+    
+    print(f"🔁 Job {job_id} queued for reprocessing as job {new_job_id} by {admin_user.email}")
+    return {"job_id": new_job_id, "status_url": f"/api/jobs/{new_job_id}"}
+
 @router.post("/users/create")
 async def create_user(
     request: Request,
     email: str = Form(...),
     is_admin: bool = Form(False),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crear nuevo usuario admin (solo requiere email para SSO)"""
-    require_admin(request, db)
+    await require_admin(request, db)
     
     # Verificar que no exista el usuario
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     
     if existing_user:
         raise HTTPException(status_code=400, detail="Usuario ya existe")
@@ -131,16 +171,17 @@ async def create_user(
     user = User(username=username, email=email, is_admin=is_admin)
     
     db.add(user)
-    db.commit()
+    await db.commit()
+    user_context.invalidate(email)
     
     return RedirectResponse(url="/admin", status_code=302)
 
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: int, request: Request, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Eliminar usuario (proteger owner y admin actual)"""
-    admin_user = require_admin(request, db)
+    admin_user = await require_admin(request, db)
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
@@ -148,8 +189,15 @@ async def delete_user(user_id: int, request: Request, db: Session = Depends(get_
     if user.id == admin_user.id:
         raise HTTPException(status_code=403, detail="No se puede eliminar tu propio usuario")
     
-    db.delete(user)
-    db.commit()
+    # Los trabajos de la cola referencian los processed_files del usuario; en PostgreSQL
+    # las claves foráneas ya los borran (v008), en SQLite no hay ON DELETE
+    user_jobs = select(ProcessingJob.id).where(ProcessingJob.user_id == user.id)
+    await db.execute(delete(ProcessingJobFile).where(ProcessingJobFile.job_id.in_(user_jobs)))
+    await db.execute(delete(ProcessingJob).where(ProcessingJob.user_id == user.id))
+    await db.delete(user)
+    await db.commit()
+    user_context.invalidate(user.email)
+    catalog.bump_version("(user deleted)")
     
     return {"message": "Usuario eliminado correctamente"}
 
@@ -158,20 +206,22 @@ async def create_company(
     request: Request,
     name: str = Form(...),
     folder_name: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crear nueva empresa"""
-    require_admin(request, db)
+    await require_admin(request, db)
     
     # Verificar que no exista la carpeta
-    existing_company = db.query(Company).filter(Company.folder_name == folder_name).first()
+    existing_company = await db.scalar(select(Company).where(Company.folder_name == folder_name))
     if existing_company:
         raise HTTPException(status_code=400, detail="Nombre de carpeta ya existe")
     
     # Crear empresa
     company = Company(name=name, folder_name=folder_name)
     db.add(company)
-    db.commit()
+    await db.commit()
+    user_context.invalidate()
+    catalog.bump_version("(company created)")
     
     # Crear estructura de carpetas física
     try:
@@ -191,14 +241,14 @@ async def create_company(
 async def get_company_processing_tools(
     company_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener herramientas de procesamiento de una empresa para herramientas de vinculación"""
-    require_admin(request, db)
+    await require_admin(request, db)
     
     try:
         # Obtener todas las herramientas de la empresa
-        all_tools = db.query(Tool).filter(Tool.company_id == company_id).all()
+        all_tools = (await db.scalars(select(Tool).where(Tool.company_id == company_id))).all()
         
         print(f"🔍 Company {company_id}: Found {len(all_tools)} total tools")
         
@@ -232,16 +282,20 @@ async def create_tool(
     total_files: int = Form(None),
     linked_tools: str = Form(""),
     file_config: str = Form(""),
-    db: Session = Depends(get_db)
+    pipeline: str = Form(""),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crear nueva herramienta para una empresa"""
-    require_admin(request, db)
+    # Importado aquí: linking carga pandas y solo lo necesita el alta de herramientas
+    from linking import pipeline as linking_pipeline
+    
+    await require_admin(request, db)
     
     try:
         print(f"🔧 Creating tool: {name} ({tool_type}) for company {company_id}")
         print(f"📝 Form data: filename={filename}, total_files={total_files}, linked_tools={linked_tools}")
         
-        company = db.query(Company).filter(Company.id == company_id).first()
+        company = await db.scalar(select(Company).where(Company.id == company_id))
         if not company:
             raise HTTPException(status_code=404, detail="Empresa no encontrada")
         
@@ -250,16 +304,17 @@ async def create_tool(
             raise HTTPException(status_code=400, detail="El nombre del archivo debe terminar en .py")
         
         # Verificar que no exista una herramienta con el mismo nombre de archivo
-        existing_tool = db.query(Tool).filter(
+        existing_tool = await db.scalar(select(Tool).where(
             Tool.filename == filename,
             Tool.company_id == company_id
-        ).first()
+        ))
         
         if existing_tool:
             raise HTTPException(status_code=400, detail="Ya existe una herramienta con ese nombre de archivo")
         
         # Validaciones específicas para herramientas de vinculación
         linked_tool_ids = []
+        linked_tools_check = []
         file_config_data = {}
         
         if tool_type == "vinculacion":
@@ -284,10 +339,10 @@ async def create_tool(
                     raise HTTPException(status_code=400, detail="No puede tener más herramientas vinculadas que archivos totales")
                 
                 # Verificar que todas las herramientas pertenezcan a la misma empresa y sean de procesamiento
-                linked_tools_check = db.query(Tool).filter(
+                linked_tools_check = (await db.scalars(select(Tool).where(
                     Tool.id.in_(linked_tool_ids),
                     Tool.company_id == company_id
-                ).all()
+                ))).all()
                 
                 if len(linked_tools_check) != len(linked_tool_ids):
                     raise HTTPException(status_code=400, detail="Todas las herramientas vinculadas deben pertenecer a la misma empresa")
@@ -310,7 +365,7 @@ async def create_tool(
                 else:
                     # Generar configuración automática con nombres de herramientas
                     file_config_data = {}
-                    linked_tools_info = db.query(Tool).filter(Tool.id.in_(linked_tool_ids)).all()
+                    linked_tools_info = linked_tools_check
                     
                     # Primero asignar archivos vinculados con nombres de herramientas
                     for i, tool_id in enumerate(linked_tool_ids):
@@ -335,6 +390,20 @@ async def create_tool(
             except json.JSONDecodeError as e:
                 print(f"❌ Error parsing file config: {e}")
                 raise HTTPException(status_code=400, detail="Configuración de archivos inválida")
+            
+            # Pipeline declarativo opcional: la herramienta no necesita módulo Python
+            if pipeline.strip():
+                try:
+                    pipeline_spec = json.loads(pipeline)
+                    compiled = linking_pipeline.compile_pipeline(pipeline_spec)
+                except json.JSONDecodeError:
+                    raise HTTPException(status_code=400, detail="El pipeline no es un JSON válido")
+                except linking_pipeline.PipelineError as e:
+                    raise HTTPException(status_code=400, detail=f"Pipeline inválido: {str(e)}")
+                if compiled.total_files != total_files:
+                    raise HTTPException(status_code=400, detail=f"El pipeline declara {compiled.total_files} archivos y la herramienta {total_files}")
+                file_config_data[linking_pipeline.PIPELINE_KEY] = pipeline_spec
+                print(f"📋 Using declarative pipeline: {compiled.describe()}")
         
         # Crear herramienta en BD
         tool_data = {
@@ -351,72 +420,78 @@ async def create_tool(
         print(f"💾 Creating tool with data: {tool_data}")
         
         tool = Tool(**tool_data)
-        db.add(tool)
-        db.commit()
-        db.refresh(tool)
         
-        print(f"✅ Tool created with ID: {tool.id}")
-        
-        # Agregar relaciones para herramientas de vinculación
+        # Agregar relaciones para herramientas de vinculación (antes del commit, en un solo flush)
         if tool_type == "vinculacion" and linked_tool_ids:
             print(f"🔗 Adding relationships for {len(linked_tool_ids)} tools...")
+            tools_by_id = {t.id: t for t in linked_tools_check}
             for tool_id in linked_tool_ids:
-                processing_tool = db.query(Tool).filter(Tool.id == tool_id).first()
+                processing_tool = tools_by_id.get(tool_id)
                 if processing_tool:
                     tool.linked_processing_tools.append(processing_tool)
                     print(f"  ✅ Linked tool {processing_tool.name}")
-            db.commit()
-            print("✅ All relationships added")
         
-        # Crear archivo Python template
+        db.add(tool)
+        await db.commit()
+        catalog.bump_version("(tool created)")
+        
+        print(f"✅ Tool created with ID: {tool.id}")
+        
+        # Crear archivo Python template (las herramientas con pipeline no lo necesitan)
         try:
             file_path = os.path.join(".", company.folder_name, filename)
-            if not os.path.exists(file_path):
+            if not os.path.exists(file_path) and linking_pipeline.PIPELINE_KEY not in file_config_data:
                 if tool_type == "procesamiento":
                     template_content = f'''"""
 Herramienta: {name}
 Empresa: {company.name}
 Tipo: Procesamiento
 """
+import io
 import pandas as pd
 import os
+import tempfile
 from datetime import datetime
 
-def process_file(input_path: str) -> str:
+def process_bytes(data: bytes, filename: str) -> pd.DataFrame:
     """
-    Procesar archivo de entrada y retornar ruta del archivo procesado
+    Procesar el archivo subido en memoria
     
     Args:
-        input_path: Ruta del archivo a procesar
+        data: Contenido del archivo
+        filename: Nombre original del archivo (la extensión decide cómo leerlo)
         
     Returns:
-        str: Ruta del archivo procesado
+        DataFrame: se guarda como xlsx (también se pueden devolver los bytes de un xlsx)
     """
     try:
         # Leer archivo de entrada
-        if input_path.endswith('.csv'):
-            df = pd.read_csv(input_path)
+        if filename.lower().endswith('.csv'):
+            df = pd.read_csv(io.BytesIO(data))
         else:
-            df = pd.read_excel(input_path)
+            df = pd.read_excel(io.BytesIO(data))
         
         # IMPLEMENTAR LÓGICA DE PROCESAMIENTO AQUÍ
         # Ejemplo: agregar columna con timestamp
         df['processed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        # Generar archivo de salida
-        output_filename = f"processed_{name.lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        output_path = os.path.join("downloads", output_filename)
-        
-        # Crear directorio de salida si no existe
-        os.makedirs("downloads", exist_ok=True)
-        
-        # Guardar archivo procesado
-        df.to_excel(output_path, index=False)
-        
-        return output_path
+        return df
         
     except Exception as e:
         raise Exception(f"Error procesando archivo: {{str(e)}}")
+
+def process_file(input_path: str) -> str:
+    """
+    Versión con rutas (pruebas locales): procesar `input_path` y retornar la ruta del
+    archivo procesado
+    """
+    with open(input_path, 'rb') as f:
+        df = process_bytes(f.read(), os.path.basename(input_path))
+    
+    output_filename = f"processed_{name.lower().replace(' ', '_')}_{{datetime.now().strftime('%Y%m%d_%H%M%S')}}.xlsx"
+    output_path = os.path.join(tempfile.gettempdir(), output_filename)
+    df.to_excel(output_path, index=False)
+    return output_path
 '''
                 else:  # vinculacion
                     template_content = f'''"""
@@ -427,6 +502,7 @@ Archivos totales: {total_files}
 """
 import pandas as pd
 import os
+import tempfile
 from datetime import datetime
 from typing import List, Dict
 
@@ -470,10 +546,8 @@ def process_files(file_paths: List[str], file_info: List[Dict]) -> str:
         
         # Generar archivo de salida
         output_filename = f"combined_{name.lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        output_path = os.path.join("downloads", output_filename)
-        
-        # Crear directorio de salida si no existe
-        os.makedirs("downloads", exist_ok=True)
+        # Directorio temporal: en la cola es el del trabajo y se borra al terminar
+        output_path = os.path.join(tempfile.gettempdir(), output_filename)
         
         # Guardar archivo combinado
         combined_df.to_excel(output_path, index=False)
@@ -504,10 +578,10 @@ async def upload_tool_pdf(
     tool_id: int,
     request: Request,
     pdf_file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Subir PDF de guía para una herramienta"""
-    require_admin(request, db)
+    await require_admin(request, db)
     
     try:
         # Verificar que sea un PDF
@@ -519,16 +593,20 @@ async def upload_tool_pdf(
         if len(content) > 10 * 1024 * 1024:  # 10MB
             raise HTTPException(status_code=400, detail="El archivo es demasiado grande (máximo 10MB)")
         
-        # Obtener herramienta
-        tool = db.query(Tool).filter(Tool.id == tool_id).first()
-        if not tool:
+        # Verificar que exista la herramienta
+        tool_exists = await db.scalar(select(Tool.id).where(Tool.id == tool_id))
+        if not tool_exists:
             raise HTTPException(status_code=404, detail="Herramienta no encontrada")
         
-        # Guardar PDF en la base de datos
-        tool.guide_pdf = content
-        tool.guide_pdf_filename = pdf_file.filename
+        # Guardar PDF en su tabla (reemplaza la guía anterior si existía)
+        guide = await guides.get_guide_info(db, tool_id)
+        if not guide:
+            guide = ToolGuide(tool_id=tool_id)
+            db.add(guide)
+        guide.filename = pdf_file.filename
+        guide.set_content(content)
         
-        db.commit()
+        await db.commit()
         
         return {"message": "PDF subido correctamente"}
         
@@ -542,21 +620,21 @@ async def upload_tool_pdf(
 async def view_tool_pdf(
     tool_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ver PDF de guía de una herramienta"""
-    require_admin(request, db)
+    await require_admin(request, db)
     
     try:
-        tool = db.query(Tool).filter(Tool.id == tool_id).first()
-        if not tool or not tool.guide_pdf:
+        guide = await guides.get_guide_info(db, tool_id)
+        if not guide:
             raise HTTPException(status_code=404, detail="PDF no encontrado")
         
-        return Response(
-            content=tool.guide_pdf,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"inline; filename={tool.guide_pdf_filename}"}
-        )
+        if guides.not_modified(request, guide):
+            return guides.not_modified_response(request, guide)
+        
+        guide = await guides.load_guide(db, tool_id)
+        return guides.pdf_response(request, guide, "inline")
         
     except HTTPException:
         raise
@@ -568,21 +646,21 @@ async def view_tool_pdf(
 async def download_tool_pdf(
     tool_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Descargar PDF de guía de una herramienta"""
-    require_admin(request, db)
+    await require_admin(request, db)
     
     try:
-        tool = db.query(Tool).filter(Tool.id == tool_id).first()
-        if not tool or not tool.guide_pdf:
+        guide = await guides.get_guide_info(db, tool_id)
+        if not guide:
             raise HTTPException(status_code=404, detail="PDF no encontrado")
         
-        return Response(
-            content=tool.guide_pdf,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={tool.guide_pdf_filename}"}
-        )
+        if guides.not_modified(request, guide):
+            return guides.not_modified_response(request, guide)
+        
+        guide = await guides.load_guide(db, tool_id)
+        return guides.pdf_response(request, guide, "attachment")
         
     except HTTPException:
         raise
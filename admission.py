@@ -0,0 +1,152 @@
+"""
+Control de admisión de los endpoints de procesamiento.
+
+Antes de encolar, `/process`, `/process-batch` y `/process-linking` llaman a `admit`,
+que rechaza el pedido con 429 y `Retry-After` si:
+
+- el usuario o la empresa ya tienen demasiados trabajos activos (en cola o corriendo)
+- el usuario o la empresa agotaron su token bucket (ráfaga + reposición por minuto)
+- la memoria estimada de los trabajos activos más los nuevos supera el presupuesto
+  global; la estimación sale del tamaño de las entradas (un xlsx ocupa en pandas
+  varias veces lo que pesa el archivo) más una base fija por trabajo
+
+Los trabajos activos se cuentan en la base, así que los topes valen para todos los
+workers y réplicas; los buckets viven en `shared_state` y se comparten entre los
+workers de la máquina. El chequeo y el encolado no son atómicos: dos pedidos
+simultáneos pueden pasar un tope por uno, y el token bucket acota las ráfagas.
+
+Un límite en 0 queda desactivado. Cada rechazo cuenta en
+`admission_rejections_total{limit=...}`.
+"""
+import asyncio
+import math
+import os
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+import metrics
+import shared_state
+from models import ProcessingJob
+from processing.jobs import ACTIVE_STATUSES
+
+# Trabajos activos (en cola o corriendo) permitidos
+ADMISSION_USER_MAX_JOBS = int(os.getenv("ADMISSION_USER_MAX_JOBS", "3"))
+ADMISSION_COMPANY_MAX_JOBS = int(os.getenv("ADMISSION_COMPANY_MAX_JOBS", "10"))
+# Token buckets: capacidad (ráfaga) y reposición por minuto
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "5"))
+ADMISSION_USER_RATE_PER_MIN = float(os.getenv("ADMISSION_USER_RATE_PER_MIN", "10"))
+ADMISSION_COMPANY_BURST = float(os.getenv("ADMISSION_COMPANY_BURST", "20"))
+ADMISSION_COMPANY_RATE_PER_MIN = float(os.getenv("ADMISSION_COMPANY_RATE_PER_MIN", "40"))
+# Presupuesto de memoria de los trabajos activos y cómo se estima cada trabajo
+ADMISSION_MEMORY_BUDGET_MB = float(os.getenv("ADMISSION_MEMORY_BUDGET_MB", "2048"))
+ADMISSION_MEMORY_FACTOR = float(os.getenv("ADMISSION_MEMORY_FACTOR", "10"))
+ADMISSION_JOB_BASE_MB = float(os.getenv("ADMISSION_JOB_BASE_MB", "50"))
+# Retry-After de los rechazos por trabajos activos o memoria (no se sabe cuándo terminan)
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "10"))
+
+BUCKETS_STATE = "admission_buckets"
+
+admissions = metrics.counter("admission_admitted_total", "Processing requests admitted")
+rejections = metrics.counter("admission_rejections_total", "Processing requests rejected with 429, by limit")
+memory_committed = metrics.gauge("admission_memory_committed_mb", "Estimated memory of active jobs at the last admission check")
+
+
+def estimate_memory_mb(job_count, input_bytes):
+    """Memoria estimada de `job_count` trabajos con `input_bytes` de entradas en total"""
+    return job_count * ADMISSION_JOB_BASE_MB + ADMISSION_MEMORY_FACTOR * input_bytes / (1024 * 1024)
+
+
+def _reject(limit, detail, retry_after):
+    rejections.inc(limit=limit)
+    retry_after = max(1, math.ceil(retry_after))
+    print(f"🚦 Admission rejected ({limit}): {detail}")
+    raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+def _take_tokens(buckets):
+    """
+    Tomar un token de cada bucket, o de ninguno
+
+    Args:
+        buckets: lista de (clave, capacidad, reposición por minuto)
+
+    Returns:
+        None si se tomaron, o (clave, segundos hasta tener un token) del bucket vacío.
+    """
+    now = time.time()
+
+    def take(state):
+        levels = {}
+        for key, burst, rate_per_min in buckets:
+            tokens, updated_at = state.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate_per_min / 60)
+            if tokens < 1:
+                return key, (1 - tokens) * 60 / rate_per_min
+            levels[key] = tokens
+        for key, tokens in levels.items():
+            state[key] = (tokens - 1, now)
+        # Un bucket sin uso hace una hora ya se repuso: es igual a uno que no existe
+        for key in list(state):
+            tokens, updated_at = state[key]
+            if now - updated_at > 3600:
+                del state[key]
+        return None
+
+    return shared_state.update_json(BUCKETS_STATE, take)
+
+
+async def admit(db, user, company_id, job_sizes):
+    """
+    Admitir (o rechazar con 429) un pedido de procesamiento
+
+    Args:
+        user: contexto del usuario
+        company_id: empresa de la herramienta
+        job_sizes: bytes de entrada de cada trabajo que se va a encolar (un lote encola
+            varios; para los topes de trabajos activos y los buckets cuenta como un pedido)
+    """
+    table = ProcessingJob.__table__
+    active = (await db.execute(
+        select(
+            func.count(),
+            func.count().filter(table.c.user_id == user.id),
+            func.count().filter(table.c.company_id == company_id),
+            func.coalesce(func.sum(table.c.input_bytes), 0),
+        ).where(table.c.status.in_(ACTIVE_STATUSES))
+    )).one()
+    total_jobs, user_jobs, company_jobs, active_bytes = active
+
+    if ADMISSION_USER_MAX_JOBS and user_jobs >= ADMISSION_USER_MAX_JOBS:
+        _reject("user_jobs", f"Tiene {user_jobs} procesamientos en curso (máximo {ADMISSION_USER_MAX_JOBS}), "
+                             "intente nuevamente cuando terminen", ADMISSION_RETRY_AFTER)
+    if ADMISSION_COMPANY_MAX_JOBS and company_jobs >= ADMISSION_COMPANY_MAX_JOBS:
+        _reject("company_jobs", f"La empresa tiene {company_jobs} procesamientos en curso "
+                                f"(máximo {ADMISSION_COMPANY_MAX_JOBS}), intente nuevamente en unos segundos",
+                ADMISSION_RETRY_AFTER)
+
+    committed_mb = estimate_memory_mb(total_jobs, active_bytes)
+    requested_mb = estimate_memory_mb(len(job_sizes), sum(job_sizes))
+    memory_committed.set(round(committed_mb, 1))
+    # Sin trabajos activos se admite siempre: un pedido más grande que el presupuesto
+    # no quedaría nunca admitido
+    if ADMISSION_MEMORY_BUDGET_MB and total_jobs and committed_mb + requested_mb > ADMISSION_MEMORY_BUDGET_MB:
+        _reject("memory", "El servidor está procesando demasiados archivos grandes, intente nuevamente en unos segundos",
+                ADMISSION_RETRY_AFTER)
+
+    buckets = []
+    if ADMISSION_USER_BURST and ADMISSION_USER_RATE_PER_MIN:
+        buckets.append((f"user:{user.id}", ADMISSION_USER_BURST, ADMISSION_USER_RATE_PER_MIN))
+    if ADMISSION_COMPANY_BURST and ADMISSION_COMPANY_RATE_PER_MIN:
+        buckets.append((f"company:{company_id}", ADMISSION_COMPANY_BURST, ADMISSION_COMPANY_RATE_PER_MIN))
+    if buckets:
+        # update_json toma un flock y escribe el archivo de estado: fuera del event loop
+        empty = await asyncio.to_thread(_take_tokens, buckets)
+        if empty is not None:
+            key, wait = empty
+            limit = f"{key.split(':')[0]}_rate"
+            _reject(limit, f"Demasiadas solicitudes de procesamiento, intente nuevamente en {max(1, math.ceil(wait))} segundos",
+                    wait)
+
+    admissions.inc()
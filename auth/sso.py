@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Request, Response, Depends
 from fastapi.responses import RedirectResponse, JSONResponse
-from fastapi_sso.sso.google import GoogleSSO
-from sqlalchemy.orm import Session
-from database import get_db, SessionLocal
+from sqlalchemy import select
+from database import AsyncSessionLocal, wait_db_ready
 from models import User
+import user_context
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -45,30 +46,40 @@ print(f"🔗 Base URL: {BASE_URL}")
 print(f"🔗 Redirect URI: {REDIRECT_URI}")
 print(f"🔒 Allow Insecure: {ALLOW_INSECURE}")
 
-# Verificar variables requeridas
-if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
-    print("❌ ERROR: GOOGLE_CLIENT_ID y GOOGLE_CLIENT_SECRET son requeridos")
-    raise ValueError("Faltan credenciales de Google OAuth")
+# Cliente de Google SSO: se crea en el primer login para no importar fastapi_sso ni
+# exigir las credenciales al importar la aplicación
+_google_sso = None
+_google_sso_lock = threading.Lock()
+
+def get_google_sso():
+    """Cliente de Google SSO, creado en el primer uso"""
+    global _google_sso
+    with _google_sso_lock:
+        if _google_sso is None:
+            if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
+                print("❌ ERROR: GOOGLE_CLIENT_ID y GOOGLE_CLIENT_SECRET son requeridos")
+                raise ValueError("Faltan credenciales de Google OAuth")
+            
+            from fastapi_sso.sso.google import GoogleSSO
+            
+            _google_sso = GoogleSSO(
+                client_id=GOOGLE_CLIENT_ID,
+                client_secret=GOOGLE_CLIENT_SECRET,
+                redirect_uri=REDIRECT_URI,
+                allow_insecure_http=ALLOW_INSECURE
+            )
+            print("✅ Google SSO configured successfully")
+        return _google_sso
 
-# Configurar Google SSO
-try:
-    google_sso = GoogleSSO(
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET,
-        redirect_uri=REDIRECT_URI,
-        allow_insecure_http=ALLOW_INSECURE
-    )
-    print("✅ Google SSO configured successfully")
-except Exception as e:
-    print(f"❌ Error configuring Google SSO: {e}")
-    raise
+if not GOOGLE_CLIENT_ID or not GOOGLE_CLIENT_SECRET:
+    print("⚠️ GOOGLE_CLIENT_ID / GOOGLE_CLIENT_SECRET no configurados: el login con Google fallará")
 
 @router.get("/login")
 async def login():
     """Redirige al usuario a la página de login de Google"""
     try:
         print(f"🚀 Initiating SSO login - Redirect URI: {REDIRECT_URI}")
-        return await google_sso.get_login_redirect()
+        return await get_google_sso().get_login_redirect()
     except Exception as e:
         print(f"❌ Error in SSO login: {e}")
         return RedirectResponse(url="/?error=sso_config_error", status_code=302)
@@ -80,49 +91,50 @@ async def callback(request: Request):
         print(f"🔄 Processing SSO callback from: {request.url}")
         
         # Verificar y procesar el token de Google
-        user_data = await google_sso.verify_and_process(request)
+        user_data = await get_google_sso().verify_and_process(request)
         print(f"📥 User data received: {user_data.email}")
         
-        # Guardar/actualizar usuario en base de datos
-        db = SessionLocal()
-        try:
-            user = db.query(User).filter(User.email == user_data.email).first()
-            
-            if not user:
-                # Crear nuevo usuario
-                username = (
-                    user_data.display_name or 
-                    user_data.first_name or 
-                    user_data.email.split('@')[0]
-                )
-                user = User(
-                    username=username.replace(' ', '_').lower(),
-                    email=user_data.email,
-                    is_admin=False  # Por defecto no es admin
-                )
-                db.add(user)
-                db.commit()
-                db.refresh(user)
-                print(f"✅ New user created: {user.email}")
-            else:
-                print(f"✅ Existing user logged in: {user.email}")
-            
-            # Guardar en sesión
-            request.session["user"] = {
-                "name": user_data.display_name or user_data.first_name or user.username,
-                "email": user_data.email,
-                "is_admin": user.is_admin,
-                "picture": getattr(user_data, 'picture', '')
-            }
-            
-            print(f"💾 Session saved for user: {user.email}")
-            
-        except Exception as db_error:
-            print(f"❌ Database error: {db_error}")
-            db.rollback()
-            raise
-        finally:
-            db.close()
+        # Guardar/actualizar usuario en base de datos (esperando la inicialización del arranque)
+        await wait_db_ready()
+        async with AsyncSessionLocal() as db:
+            try:
+                user = await db.scalar(select(User).where(User.email == user_data.email))
+                
+                if not user:
+                    # Crear nuevo usuario
+                    username = (
+                        user_data.display_name or 
+                        user_data.first_name or 
+                        user_data.email.split('@')[0]
+                    )
+                    user = User(
+                        username=username.replace(' ', '_').lower(),
+                        email=user_data.email,
+                        is_admin=False  # Por defecto no es admin
+                    )
+                    db.add(user)
+                    await db.commit()
+                    await db.refresh(user)
+                    print(f"✅ New user created: {user.email}")
+                else:
+                    print(f"✅ Existing user logged in: {user.email}")
+                # Los usuarios sin fila no se cachean: basta con limpiar este worker
+                user_context.invalidate(user.email, shared=False)
+                
+                # Guardar en sesión
+                request.session["user"] = {
+                    "name": user_data.display_name or user_data.first_name or user.username,
+                    "email": user_data.email,
+                    "is_admin": user.is_admin,
+                    "picture": getattr(user_data, 'picture', '')
+                }
+                
+                print(f"💾 Session saved for user: {user.email}")
+                
+            except Exception as db_error:
+                print(f"❌ Database error: {db_error}")
+                await db.rollback()
+                raise
         
         return RedirectResponse(url="/", status_code=302)
         
@@ -148,9 +160,9 @@ async def get_user(request: Request):
     user_session = request.session.get("user")
     if user_session:
         # Obtener información actualizada de la base de datos
-        db = SessionLocal()
         try:
-            user = db.query(User).filter(User.email == user_session["email"]).first()
+            async with AsyncSessionLocal() as db:
+                user = await user_context.resolve_user_context(request, db)
             if user:
                 # Actualizar información de sesión con datos actuales de BD
                 user_session.update({
@@ -166,8 +178,6 @@ async def get_user(request: Request):
         except Exception as e:
             print(f"❌ Error getting user info: {e}")
             return JSONResponse({"error": "Database error"}, status_code=500)
-        finally:
-            db.close()
     
     return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
@@ -0,0 +1,73 @@
+"""
+Catálogo empresa → herramientas que ve cada usuario en el dashboard.
+
+El catálogo se construye una vez por (usuario, versión del catálogo). La versión se
+incrementa cada vez que el panel de administración crea o cambia una empresa, una
+herramienta o una asignación, lo que descarta todo lo cacheado. Cada entrada lleva
+un ETag fuerte derivado de su contenido para responder 304 a las recargas.
+
+La versión es un contador de `shared_state`: un cambio hecho en un worker invalida los
+catálogos cacheados en todos.
+"""
+import hashlib
+import json
+import threading
+
+import metrics
+import shared_state
+
+VERSION_KEY = "catalog_version"
+
+_cache = {}
+_lock = threading.Lock()
+
+catalog_builds = metrics.counter("catalog_builds_total", "Company catalogs built from the database")
+catalog_not_modified = metrics.counter("catalog_not_modified_total", "Catalog requests answered with 304")
+
+
+def current_version():
+    return shared_state.get_generation(VERSION_KEY)
+
+
+def bump_version(reason=""):
+    """Invalidar todos los catálogos cacheados (en todos los workers)"""
+    version = shared_state.bump_generation(VERSION_KEY)
+    with _lock:
+        _cache.clear()
+    print(f"🗂️ Catalog version -> {version} {reason}".rstrip())
+    return version
+
+
+def make_etag(data, version):
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(f"{version}:{payload}".encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def get_cached(user_id):
+    """(etag, data) del catálogo del usuario si sigue vigente, o None"""
+    version = current_version()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1], entry[2]
+
+
+def store(user_id, version, data):
+    """Guardar el catálogo construido con `version` y devolver su ETag"""
+    etag = make_etag(data, version)
+    # Si el catálogo cambió mientras se construía, no se cachea
+    if version == current_version():
+        with _lock:
+            _cache[user_id] = (version, etag, data)
+    catalog_builds.inc()
+    return etag
+
+
+def etag_matches(if_none_match, etag):
+    """Comparar el header If-None-Match con el ETag (admite lista y '*')"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
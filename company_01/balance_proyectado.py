@@ -4,15 +4,23 @@ from datetime import datetime
 import re
 from dateutil.relativedelta import relativedelta
 
+from processing import memory_io
+
 # Balance Resumido
 
 def process_file(filepath):
+    """Versión con rutas: el resultado se escribe junto al archivo original"""
+    original_name = os.path.splitext(os.path.basename(filepath))[0]
+    output_path = os.path.join(os.path.dirname(filepath), f"{original_name}_PROCESADO.xlsx")
+    return memory_io.run_on_path(process_bytes, filepath, output_path)
+
+def process_bytes(data, filename):
     try:
-        ext = os.path.splitext(filepath)[1].lower()
+        ext = memory_io.extension(filename)
         if ext == ".csv":
-            df = pd.read_csv(filepath, header=None)
+            df = pd.read_csv(memory_io.buffer(data), header=None)
         else:
-            df = pd.read_excel(filepath, header=None)
+            df = pd.read_excel(memory_io.buffer(data), header=None)
 
         output_rows = []
 
@@ -111,14 +119,7 @@ def process_file(filepath):
 
         df_resultado = pd.DataFrame(output_rows, columns=columnas)
 
-        # Generar ruta de salida en el mismo directorio del archivo original
-        original_dir = os.path.dirname(filepath)
-        original_name = os.path.splitext(os.path.basename(filepath))[0]
-        output_filename = f"{original_name}_PROCESADO.xlsx"
-        output_path = os.path.join(original_dir, output_filename)
-
-        df_resultado.to_excel(output_path, index=False)
-        return output_path
+        return df_resultado
 
     except Exception as e:
         raise RuntimeError(f"Error procesando archivo balance proyectado: {str(e)}")
\ No newline at end of file
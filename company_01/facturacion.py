@@ -2,20 +2,34 @@ import os
 import pandas as pd
 import re
 
+from processing import incremental, memory_io
+
 # Diario de Facturacion
 
 def process_file(filepath):
+    """Versión con rutas: el resultado se escribe junto al archivo original"""
+    original_name = os.path.splitext(os.path.basename(filepath))[0]
+    output_path = os.path.join(os.path.dirname(filepath), f"{original_name}_PROCESADO.xlsx")
+    return memory_io.run_on_path(process_bytes, filepath, output_path)
+
+def process_bytes(data, filename):
     try:
-        ext = os.path.splitext(filepath)[1].lower()
+        ext = memory_io.extension(filename)
         if ext == ".csv":
-            df = pd.read_csv(filepath, header=None)
+            df = pd.read_csv(memory_io.buffer(data), header=None)
         else:
-            df = pd.read_excel(filepath, header=None)
+            df = pd.read_excel(memory_io.buffer(data), header=None)
 
-        output_rows = []
-        i = 0
+        # Exportación acumulativa: retomar desde el último documento del prefijo ya procesado
+        inc = incremental.start(
+            incremental.frame_row_hashes(df),
+            incremental.source_version(__file__, ext, list(df.dtypes.astype(str)))
+        )
+        i, output_rows, _ = inc.resume(None)
 
         while i < len(df):
+            # Inicio de documento (o fila salteada): se puede retomar desde aquí
+            inc.checkpoint(i, output_rows, None)
             try:
                 celda_a_raw = df.iloc[i, 0]
                 celda_a = str(celda_a_raw).strip() if pd.notna(celda_a_raw) else ""
@@ -102,16 +116,10 @@ def process_file(filepath):
             "Descuento en pesos"
         ]
 
+        inc.save(output_rows)
         df_resultado = pd.DataFrame(output_rows, columns=columnas)
 
-        # Generar ruta de salida en el mismo directorio del archivo original
-        original_dir = os.path.dirname(filepath)
-        original_name = os.path.splitext(os.path.basename(filepath))[0]
-        output_filename = f"{original_name}_PROCESADO.xlsx"
-        output_path = os.path.join(original_dir, output_filename)
-
-        df_resultado.to_excel(output_path, index=False)
-        return output_path
+        return df_resultado
 
     except Exception as e:
         raise RuntimeError(f"Error procesando archivo de facturación: {str(e)}")
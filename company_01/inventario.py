@@ -4,6 +4,9 @@ import xlrd
 import os
 import csv
 from datetime import datetime
+from io import BytesIO
+from processing import memory_io
+from processing.csv_io import read_csv_bytes
 
 def get_column_letter(col_num):
     """Genera letras de columna para Excel (A, B, C, ..., AA, AB, etc.)"""
@@ -45,22 +48,11 @@ def clean_value(value, data_type='string'):
     else:
         return str(value).strip() if str(value).strip() != '' else "Dato no Definido"
 
-def process_csv_file(file_path):
+def process_csv_file(data, filename=None):
     """Procesa archivos CSV - asume que los datos están en un formato tabular simple"""
     try:
-        # Intentar leer el CSV con diferentes encodings
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, encoding=encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if df is None:
-            raise ValueError("No se pudo leer el archivo CSV con ninguna codificación soportada")
+        # Detectar codificación y delimitador y leer el CSV una sola vez
+        df = read_csv_bytes(data, filename)
         
         # Si el CSV tiene el formato esperado con proveedores, procesarlo
         # Si no, intentar mapear columnas conocidas
@@ -124,16 +116,16 @@ def process_csv_file(file_path):
     except Exception as e:
         raise Exception(f"Error al procesar archivo CSV: {str(e)}")
 
-def process_excel_file(file_path, file_extension):
+def process_excel_file(data, file_extension):
     """Procesa archivos Excel (.xls y .xlsx) con el formato específico de proveedores"""
     try:
         if file_extension == '.xlsx':
-            workbook = openpyxl.load_workbook(file_path, data_only=True)
+            workbook = openpyxl.load_workbook(memory_io.buffer(data), data_only=True)
             sheet = workbook.active
             max_row = sheet.max_row
             is_xlsx = True
         elif file_extension == '.xls':
-            workbook = xlrd.open_workbook(file_path)
+            workbook = xlrd.open_workbook(file_contents=data)
             sheet = workbook.sheet_by_index(0)
             max_row = sheet.nrows
             is_xlsx = False
@@ -198,7 +190,7 @@ def process_excel_file(file_path, file_extension):
         if not processed_data and proveedores_encontrados == 0:
             # Si no encontramos el formato de proveedores, intentar leer como tabla normal
             try:
-                df = pd.read_excel(file_path)
+                df = pd.read_excel(memory_io.buffer(data))
                 processed_data = []
                 
                 for _, row in df.iterrows():
@@ -224,13 +216,20 @@ def process_excel_file(file_path, file_extension):
 
 def process_file(file_path):
     """Función principal que procesa archivos CSV, XLS y XLSX"""
+    # Generar ruta de salida en el mismo directorio del archivo original
+    original_name = os.path.splitext(os.path.basename(file_path))[0]
+    output_path = os.path.join(os.path.dirname(file_path), f"{original_name}_PROCESADO.xlsx")
+    return memory_io.run_on_path(process_bytes, file_path, output_path)
+
+def process_bytes(data, filename):
+    """Versión en memoria de `process_file`: devuelve los bytes del xlsx"""
     try:
-        file_extension = os.path.splitext(file_path)[1].lower()
+        file_extension = memory_io.extension(filename)
 
         if file_extension == '.csv':
-            processed_data = process_csv_file(file_path)
+            processed_data = process_csv_file(data, filename)
         elif file_extension in ['.xlsx', '.xls']:
-            processed_data = process_excel_file(file_path, file_extension)
+            processed_data = process_excel_file(data, file_extension)
         else:
             raise ValueError("Formato de archivo no soportado. Solo se admiten .csv, .xlsx y .xls")
 
@@ -253,14 +252,9 @@ def process_file(file_path):
         ]
         df = df[column_order]
 
-        # Generar ruta de salida en el mismo directorio del archivo original
-        original_dir = os.path.dirname(file_path)
-        original_name = os.path.splitext(os.path.basename(file_path))[0]
-        output_filename = f"{original_name}_PROCESADO.xlsx"
-        output_path = os.path.join(original_dir, output_filename)
-
-        # Guardar el archivo procesado
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        # Armar el archivo procesado
+        output_buffer = BytesIO()
+        with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
             df.to_excel(writer, sheet_name='Inventario Procesado', index=False)
 
             # Ajustar el ancho de las columnas
@@ -277,7 +271,7 @@ def process_file(file_path):
                 adjusted_width = min(max_length + 2, 50)
                 worksheet.column_dimensions[column_letter].width = adjusted_width
 
-        return output_path
+        return output_buffer.getvalue()
 
     except Exception as e:
         raise Exception(f"Error al procesar el archivo de inventario: {str(e)}")
\ No newline at end of file
@@ -2,6 +2,8 @@ import os
 import pandas as pd
 import tempfile
 
+from processing import memory_io
+
 def process_file(filepath, original_filename=None):
     """
     Procesa un archivo de lista de precios extrayendo información de artículos
@@ -13,27 +15,45 @@ def process_file(filepath, original_filename=None):
     Returns:
         str: Ruta del archivo procesado
     """
-    try:
-        print(f"🚀 Iniciando procesamiento de: {filepath}")
+    # Verificar que el archivo existe
+    if not os.path.exists(filepath):
+        raise RuntimeError(f"El archivo no existe: {filepath}")
+
+    # Nombre del archivo de salida usando el nombre original
+    original_name = os.path.splitext(original_filename or os.path.basename(filepath))[0]
+    output_path = os.path.join(tempfile.gettempdir(), f"{original_name}_PROCESADO.xlsx")
+    memory_io.run_on_path(process_bytes, filepath, output_path)
+    print(f"💾 Archivo guardado en: {output_path}")
+    return output_path
+
+def process_bytes(data, filename):
+    """
+    Procesa una lista de precios en memoria
+    
+    Args:
+        data (bytes): Contenido del archivo
+        filename (str): Nombre original del archivo (decide el formato)
         
-        # Verificar que el archivo existe
-        if not os.path.exists(filepath):
-            raise RuntimeError(f"El archivo no existe: {filepath}")
+    Returns:
+        DataFrame: Artículos extraídos
+    """
+    try:
+        print(f"🚀 Iniciando procesamiento de: {filename}")
         
         # Leer el archivo según su extensión
-        ext = os.path.splitext(filepath)[1].lower()
+        ext = memory_io.extension(filename)
         print(f"📄 Extensión detectada: {ext}")
         
         if ext == ".csv":
             print("📖 Leyendo archivo CSV...")
-            df = pd.read_csv(filepath, header=None, encoding='utf-8')
+            df = pd.read_csv(memory_io.buffer(data), header=None, encoding='utf-8')
         elif ext in [".xls", ".xlsx"]:
             print(f"📖 Leyendo archivo Excel ({ext})...")
             # Especificar engine para compatibilidad
             if ext == ".xls":
-                df = pd.read_excel(filepath, header=None, engine='xlrd')
+                df = pd.read_excel(memory_io.buffer(data), header=None, engine='xlrd')
             else:
-                df = pd.read_excel(filepath, header=None, engine='openpyxl')
+                df = pd.read_excel(memory_io.buffer(data), header=None, engine='openpyxl')
         else:
             raise RuntimeError(f"Formato de archivo no soportado: {ext}")
         
@@ -119,29 +139,10 @@ def process_file(filepath, original_filename=None):
         df_resultado = pd.DataFrame(output_rows, columns=columnas_salida)
         print(f"📋 DataFrame creado con {len(df_resultado)} filas")
 
-        # Generar nombre del archivo de salida usando el nombre original
-        if original_filename:
-            # Usar el nombre original proporcionado
-            original_name = os.path.splitext(original_filename)[0]
-        else:
-            # Usar el nombre del archivo actual
-            original_name = os.path.splitext(os.path.basename(filepath))[0]
-            
-        output_filename = f"{original_name}_PROCESADO.xlsx"
-        output_path = os.path.join(tempfile.gettempdir(), output_filename)
-
-        # Guardar el archivo procesado
-        df_resultado.to_excel(output_path, index=False)
-        print(f"💾 Archivo guardado en: {output_path}")
-        
-        # Verificar que el archivo se creó correctamente
-        if not os.path.exists(output_path):
-            raise RuntimeError(f"No se pudo crear el archivo de salida: {output_path}")
-        
-        return output_path
+        return df_resultado
 
     except Exception as e:
-        print(f"❌ Error en process_file: {str(e)}")
+        print(f"❌ Error en process_bytes: {str(e)}")
         print(f"❌ Tipo de error: {type(e).__name__}")
         import traceback
         print(f"❌ Traceback: {traceback.format_exc()}")
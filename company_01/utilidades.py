@@ -1,6 +1,9 @@
 import os
 import pandas as pd
 import re
+from io import BytesIO
+
+from processing import memory_io
 
 def process_file(filepath):
     """
@@ -13,18 +16,40 @@ def process_file(filepath):
     Returns:
         str: Ruta del archivo procesado generado
         
+    Raises:
+        RuntimeError: Si hay error en el procesamiento
+    """
+    # Generar ruta de salida con el sufijo _PROCESADO
+    original_name = os.path.splitext(os.path.basename(filepath))[0]
+    output_path = os.path.join(os.path.dirname(filepath), f"{original_name}_PROCESADO.xlsx")
+    memory_io.run_on_path(process_bytes, filepath, output_path)
+    print(f"💾 Archivo guardado en: {output_path}")
+    return output_path
+
+
+def process_bytes(data, filename):
+    """
+    Versión en memoria de `process_file`
+    
+    Args:
+        data (bytes): Contenido del archivo
+        filename (str): Nombre original del archivo (decide el formato)
+        
+    Returns:
+        bytes: xlsx del reporte, con formato
+        
     Raises:
         RuntimeError: Si hay error en el procesamiento
     """
     try:
-        print(f"🔄 Procesando archivo de utilidades: {filepath}")
+        print(f"🔄 Procesando archivo de utilidades: {filename}")
         
         # Determinar extensión y leer archivo
-        ext = os.path.splitext(filepath)[1].lower()
+        ext = memory_io.extension(filename)
         if ext == ".csv":
-            df = pd.read_csv(filepath, header=None)
+            df = pd.read_csv(memory_io.buffer(data), header=None)
         elif ext in [".xls", ".xlsx"]:
-            df = pd.read_excel(filepath, header=None)
+            df = pd.read_excel(memory_io.buffer(data), header=None)
         else:
             raise ValueError(f"Formato de archivo no soportado: {ext}")
 
@@ -100,14 +125,9 @@ def process_file(filepath):
         # Crear DataFrame resultado
         df_resultado = pd.DataFrame(output_rows, columns=columnas)
 
-        # Generar ruta de salida con el sufijo _PROCESADO
-        original_dir = os.path.dirname(filepath)
-        original_name = os.path.splitext(os.path.basename(filepath))[0]
-        output_filename = f"{original_name}_PROCESADO.xlsx"
-        output_path = os.path.join(original_dir, output_filename)
-
-        # Guardar archivo Excel con formato específico
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        # Armar el archivo Excel con formato específico
+        output_buffer = BytesIO()
+        with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
             df_resultado.to_excel(writer, index=False, sheet_name='Utilidades_Procesado')
             
             # Obtener la hoja de trabajo para aplicar formato
@@ -126,11 +146,10 @@ def process_file(filepath):
                 adjusted_width = min(max_length + 2, 50)
                 worksheet.column_dimensions[column_letter].width = adjusted_width
 
-        print(f"✅ Archivo procesado exitosamente: {output_filename}")
+        print(f"✅ Archivo procesado exitosamente: {filename}")
         print(f"📈 Total de registros procesados: {filas_procesadas}")
-        print(f"💾 Archivo guardado en: {output_path}")
         
-        return output_path
+        return output_buffer.getvalue()
 
     except Exception as e:
         error_msg = f"Error procesando archivo de utilidades: {str(e)}"
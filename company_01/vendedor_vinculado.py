@@ -1,8 +1,47 @@
 import pandas as pd
 import os
+import tempfile
 from datetime import datetime
+from io import BytesIO
 import numpy as np
 
+from linking.loader import load_inputs
+from linking.output import fit_titles, write_with_titles
+from linking.token_index import TokenIndex
+
+# Opciones de lectura por archivo: ignorar la línea 1 (empezar desde línea 2)
+INPUT_OPTIONS = [
+    {"header": None, "skiprows": 1},
+    {"header": None, "skiprows": 1},
+    {"header": None, "skiprows": 1},
+]
+
+# Primera palabra repetida en la columna H del archivo 3: se toma la primera fila
+TOKEN_POLICY = "first"
+# Comparar primeras palabras sin acentos ni signos de puntuación ("JOSÉ," = "JOSE")
+NORMALIZE_TOKENS = False
+
+def output_filename():
+    return f"Diario de Ventas x Vendedor - Vinculado_{datetime.now().strftime('%d_%m_%Y_%H%M%S')}.xlsx"
+
+def process_buffers(inputs: list) -> tuple:
+    """
+    Vinculación triple en memoria
+    
+    Args:
+        inputs: Lista de (nombre, bytes) de los 3 archivos
+        
+    Returns:
+        tuple: (bytes del xlsx, nombre del archivo de salida)
+    """
+    resultado_final, titulos_finales = vincular(inputs)
+    try:
+        output = BytesIO()
+        write_with_titles(resultado_final, titulos_finales, output)
+        return output.getvalue(), output_filename()
+    except Exception as e:
+        raise Exception(f"Error procesando vinculación triple: {str(e)}")
+
 def process_files(input_files: list) -> str:
     """
     Procesar 3 archivos para vinculación triple
@@ -13,45 +52,50 @@ def process_files(input_files: list) -> str:
     Returns:
         str: Ruta del archivo procesado
     """
+    resultado_final, titulos_finales = vincular(input_files)
+    try:
+        # Directorio temporal: en la cola es el del trabajo y se borra al terminar
+        output_path = os.path.join(tempfile.gettempdir(), output_filename())
+        
+        print(f"💾 Guardando archivo en: {output_path}")
+        
+        # Guardar archivo final manteniendo los títulos descriptivos en la fila 1
+        write_with_titles(resultado_final, titulos_finales, output_path)
+        
+        # Verificar que el archivo se creó correctamente
+        if os.path.exists(output_path):
+            file_size = os.path.getsize(output_path)
+            print(f"✅ Archivo creado exitosamente: {output_path} ({file_size} bytes)")
+        else:
+            raise Exception("El archivo no se pudo crear")
+        
+        return output_path
+        
+    except Exception as e:
+        print(f"❌ Error en vinculación triple: {str(e)}")
+        raise Exception(f"Error procesando vinculación triple: {str(e)}")
+
+def vincular(input_files: list) -> tuple:
+    """
+    Vincular los 3 archivos (rutas o (nombre, bytes), ver linking.loader)
+    
+    Returns:
+        tuple: (DataFrame vinculado, títulos de la fila 1)
+    """
     try:
         if len(input_files) != 3:
             raise Exception(f"Se requieren exactamente 3 archivos, se recibieron {len(input_files)}")
         
         print(f"🔗 Procesando vinculación triple con {len(input_files)} archivos...")
         
-        # Leer todos los archivos
-        dataframes = []
-        for i, input_path in enumerate(input_files):
-            print(f"📖 Leyendo archivo {i+1}: {input_path}")
-            try:
-                if input_path.endswith('.csv'):
-                    df = pd.read_csv(input_path, header=None)
-                else:
-                    df = pd.read_excel(input_path, header=None)
-                
-                # CORRECCIÓN: Ignorar la primera línea (línea 1) - empezar desde línea 2
-                if len(df) > 1:
-                    df = df.iloc[1:].reset_index(drop=True)  # Saltar primera fila y resetear índices
-                    print(f"   📋 Primera línea ignorada, procesando desde línea 2")
-                else:
-                    print(f"   ⚠️ Archivo {i+1} tiene solo 1 línea, no se puede ignorar la primera")
-                
-                # Limpiar datos vacíos
-                df = df.dropna(how='all')  # Eliminar filas completamente vacías
-                df = df.fillna('')  # Rellenar NaN con strings vacíos
-                
-                dataframes.append(df)
-                print(f"   ✅ Archivo {i+1} leído exitosamente: {df.shape[0]} filas, {df.shape[1]} columnas (después de ignorar línea 1)")
-                
-                # Debug: mostrar primeras filas (que ahora son las líneas 2, 3, 4 del archivo original)
-                print(f"   📋 Primeras 3 filas del archivo {i+1} (líneas 2-4 del archivo original):")
-                for idx in range(min(3, len(df))):
-                    row_data = [str(df.iloc[idx, j])[:20] if j < df.shape[1] else '' for j in range(min(6, df.shape[1]))]
-                    print(f"      Fila {idx+1}: {row_data}")
-                    
-            except Exception as e:
-                print(f"   ❌ Error leyendo archivo {i+1}: {str(e)}")
-                raise Exception(f"Error leyendo archivo {i+1}: {str(e)}")
+        # Leer todos los archivos (en paralelo); se ignora la línea 1 de cada uno
+        dataframes = load_inputs(input_files, INPUT_OPTIONS)
+        
+        for i, df in enumerate(dataframes):
+            # Limpiar datos vacíos
+            df = df.dropna(how='all')  # Eliminar filas completamente vacías
+            df = df.fillna('')  # Rellenar NaN con strings vacíos
+            dataframes[i] = df
         
         if len(dataframes) != 3:
             raise Exception(f"Error: Solo se pudieron leer {len(dataframes)} archivos de 3 requeridos")
@@ -119,50 +163,26 @@ def process_files(input_files: list) -> str:
             for idx in range(min(5, len(archivo1_data))):
                 print(f"      '{archivo1_data.iloc[idx]['key_search']}'")
         
-        # PASO 3: Extraer primera palabra de columna B del archivo 2 y buscar en archivo 3
+        # PASO 3: Primera palabra de columna B del archivo 2 buscada en la columna H del archivo 3
         print("📋 Paso 3: Procesando vinculación con archivo 3")
         
-        def extraer_primera_palabra(texto):
-            try:
-                if pd.isna(texto) or str(texto).strip() == '':
-                    return ''
-                return str(texto).strip().split()[0].upper()
-            except:
-                return ''
-        
-        # Extraer primera palabra de columna B del resultado del paso 2
-        resultado_paso2['primera_palabra_b2'] = resultado_paso2['A2_ColB'].apply(extraer_primera_palabra)
-        
-        print(f"   📋 Primeras palabras extraídas de columna B archivo 2:")
-        palabras_unicas = resultado_paso2['primera_palabra_b2'].unique()[:5]
-        for palabra in palabras_unicas:
-            print(f"      '{palabra}'")
-        
         # Procesar archivo 3
         if archivo3.shape[1] >= 8:
-            # Preparar archivo 3 - columnas A-G y primera palabra de columna H
-            archivo3_data = pd.DataFrame()
-            for i in range(7):  # Columnas A-G
-                col_name = f'A3_Col{chr(65+i)}'  # A3_ColA, A3_ColB, etc.
-                archivo3_data[col_name] = archivo3.iloc[:, i].astype(str)
-            
-            # Extraer primera palabra de columna H
-            archivo3_data['primera_palabra_h3'] = archivo3.iloc[:, 7].apply(extraer_primera_palabra)
+            # Preparar archivo 3 - columnas A-G, indexadas por la primera palabra de columna H
+            archivo3_data = archivo3.iloc[:, :7].astype(str)
+            archivo3_data.columns = [f'A3_Col{chr(65+i)}' for i in range(7)]  # A3_ColA, A3_ColB, etc.
             
             print(f"   ✅ Archivo 3 - Columnas A-G extraídas: {archivo3_data.shape[0]} filas")
-            print(f"   📋 Primeras palabras de columna H archivo 3:")
-            palabras_h3 = archivo3_data['primera_palabra_h3'].unique()[:5]
-            for palabra in palabras_h3:
-                print(f"      '{palabra}'")
             
-            # Realizar merge final
-            resultado_final = resultado_paso2.merge(
-                archivo3_data,
-                left_on='primera_palabra_b2',
-                right_on='primera_palabra_h3',
-                how='left'  # Mantener todos los registros del paso anterior
+            indice_h3 = TokenIndex(
+                archivo3_data, archivo3.iloc[:, 7],
+                policy=TOKEN_POLICY, normalize=NORMALIZE_TOKENS, name="archivo3"
             )
             
+            # Una fila de archivo 3 (o vacía) por cada registro del paso anterior
+            coincidencias = indice_h3.lookup(resultado_paso2['A2_ColB'])
+            resultado_final = pd.concat([resultado_paso2.reset_index(drop=True), coincidencias], axis=1)
+            
             print(f"   ✅ Vinculación con archivo 3 completada: {resultado_final.shape[0]} registros")
             
         else:
@@ -173,7 +193,7 @@ def process_files(input_files: list) -> str:
         print("📋 Paso 4: Organizando resultado final")
         
         # Eliminar columnas de búsqueda temporales
-        columnas_a_eliminar = ['key_search', 'primera_palabra_b2', 'primera_palabra_h3']
+        columnas_a_eliminar = ['key_search']
         for col in columnas_a_eliminar:
             if col in resultado_final.columns:
                 resultado_final = resultado_final.drop(col, axis=1)
@@ -214,10 +234,7 @@ def process_files(input_files: list) -> str:
         
         # Ajustar títulos al número exacto de columnas
         num_columnas = resultado_final.shape[1]
-        if len(titulos_finales) > num_columnas:
-            titulos_finales = titulos_finales[:num_columnas]
-        elif len(titulos_finales) < num_columnas:
-            titulos_finales.extend([f'Columna_Extra_{i}' for i in range(len(titulos_finales), num_columnas)])
+        titulos_finales = fit_titles(titulos_finales, num_columnas, filler='Columna_Extra_{}')
         
         print(f"   ✅ Títulos descriptivos creados: {len(titulos_finales)} títulos para {num_columnas} columnas")
         print(f"   📋 IMPORTANTE: Los títulos descriptivos se mantienen en el archivo final")
@@ -228,55 +245,23 @@ def process_files(input_files: list) -> str:
         if resultado_final.empty:
             raise Exception("No se generaron datos vinculados. Verifique que los archivos tengan datos coincidentes.")
         
-        # Convertir datos a lista de listas
-        datos_vinculados = resultado_final.values.tolist()
-        
-        # IMPORTANTE: Crear estructura final manteniendo los títulos descriptivos
         # Los títulos descriptivos van en la primera fila, seguidos de los datos
-        estructura_final = [titulos_finales] + datos_vinculados
-        
-        # Crear DataFrame final
-        df_final = pd.DataFrame(estructura_final)
-        
-        print(f"   ✅ Estructura final creada:")
-        print(f"   📊 Total: {df_final.shape[0]} filas × {df_final.shape[1]} columnas")
-        print(f"   📊 Fila 1: Títulos descriptivos (MANTENIDOS)")
-        print(f"   📊 Filas 2-{df_final.shape[0]}: {len(datos_vinculados)} filas de datos vinculados")
+        print(f"   📊 Total: {resultado_final.shape[0] + 1} filas × {num_columnas} columnas")
         print(f"   📋 NOTA: Se ignoraron las líneas 1 de los archivos originales, pero se mantuvieron los títulos descriptivos")
         
         # Mostrar muestra de datos finales
         print(f"   📋 Muestra de datos finales (primeras 2 filas de datos):")
-        for idx in range(min(2, len(datos_vinculados))):
-            fila_muestra = [str(val)[:15] for val in datos_vinculados[idx][:6]]  # Primeras 6 columnas
+        for idx in range(min(2, len(resultado_final))):
+            fila_muestra = [str(val)[:15] for val in resultado_final.iloc[idx, :6]]  # Primeras 6 columnas
             print(f"      Fila datos {idx+1}: {fila_muestra}")
         
-        # Generar archivo de salida
-        output_filename = f"Diario de Ventas x Vendedor - Vinculado_{datetime.now().strftime('%d_%m_%Y_%H%M%S')}.xlsx"
-        output_path = os.path.join("downloads", output_filename)
-        
-        # Crear directorio de salida si no existe
-        os.makedirs("downloads", exist_ok=True)
-        
-        print(f"💾 Guardando archivo en: {output_path}")
-        
-        # Guardar archivo final (SIN header=False para mantener los títulos descriptivos)
-        df_final.to_excel(output_path, index=False, header=False, engine='openpyxl')
-        
-        # Verificar que el archivo se creó correctamente
-        if os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            print(f"✅ Archivo creado exitosamente: {output_path} ({file_size} bytes)")
-        else:
-            raise Exception("El archivo no se pudo crear")
-        
         print(f"✅ Vinculación triple completada exitosamente!")
         print(f"📋 Estructura: Archivo 2 (A-F) → Archivo 1 (A,C-G) → Archivo 3 (A-G)")
         print(f"📊 Lógica de vinculación: Archivo2_ColC ↔ Archivo1_ColA, luego Archivo2_ColB(1ª palabra) ↔ Archivo3_ColH(1ª palabra)")
         print(f"📊 Procesamiento: Se ignoró línea 1 de cada archivo, se mantuvieron títulos descriptivos")
-        print(f"📊 Datos procesados: {len(datos_vinculados)} filas vinculadas")
-        print(f"💾 Archivo guardado: {output_path}")
+        print(f"📊 Datos procesados: {len(resultado_final)} filas vinculadas")
         
-        return output_path
+        return resultado_final, titulos_finales
         
     except Exception as e:
         print(f"❌ Error en vinculación triple: {str(e)}")
@@ -4,6 +4,8 @@ import xlrd
 import os
 import csv
 from datetime import datetime
+from processing import memory_io
+from processing.csv_io import read_csv_bytes
 from io import BytesIO
 import re
 
@@ -151,22 +153,11 @@ def is_total_vendedor_row(value):
     except Exception:
         return False
 
-def process_csv_file(file_path):
+def process_csv_file(data, filename=None):
     """Procesa archivos CSV buscando vendedores y sus artículos"""
     try:
-        # Intentar leer el CSV con diferentes encodings
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, encoding=encoding, header=None)
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if df is None:
-            raise ValueError("No se pudo leer el archivo CSV con ninguna codificación soportada")
+        # Detectar codificación y delimitador y leer el CSV una sola vez
+        df = read_csv_bytes(data, filename, header=None)
         
         print("PASO 1: Procesando vendedores y artículos...")
         processed_data = []
@@ -237,17 +228,17 @@ def process_csv_file(file_path):
     except Exception as e:
         raise Exception(f"Error al procesar archivo CSV: {str(e)}")
 
-def process_excel_file(file_path, file_extension):
+def process_excel_file(data, file_extension):
     """Procesa archivos Excel (.xls y .xlsx) buscando vendedores y sus artículos"""
     try:
         if file_extension == '.xlsx':
-            workbook = openpyxl.load_workbook(file_path, data_only=True)
+            workbook = openpyxl.load_workbook(memory_io.buffer(data), data_only=True)
             sheet = workbook.active
             max_row = sheet.max_row
             max_col = sheet.max_column
             is_xlsx = True
         elif file_extension == '.xls':
-            workbook = xlrd.open_workbook(file_path)
+            workbook = xlrd.open_workbook(file_contents=data)
             sheet = workbook.sheet_by_index(0)
             max_row = sheet.nrows
             max_col = sheet.ncols
@@ -335,6 +326,11 @@ def process_excel_file(file_path, file_extension):
     except Exception as e:
         raise Exception(f"Error al procesar archivo Excel: {str(e)}")
 
+def output_filename(filename):
+    """Nombre del archivo de salida a partir del nombre original"""
+    base_filename = os.path.splitext(os.path.basename(filename))[0]
+    return f"{base_filename}_PROCESADO.xlsx"
+
 def process_file(file_path, return_bytes=False):
     """
     Función principal que procesa archivos CSV, XLS y XLSX de vendedores
@@ -347,13 +343,32 @@ def process_file(file_path, return_bytes=False):
         Si return_bytes=True: tupla (bytes_data, filename)
         Si return_bytes=False: ruta del archivo guardado
     """
+    if return_bytes:
+        # Para aplicaciones web: devolver como bytes
+        data = process_bytes(memory_io.read_path(file_path), os.path.basename(file_path))
+        return data, output_filename(file_path)
+    # Para uso local: guardar archivo
+    output_path = os.path.join(os.path.dirname(file_path), output_filename(file_path))
+    return memory_io.run_on_path(process_bytes, file_path, output_path)
+
+def process_bytes(data, filename):
+    """
+    Procesa el contenido de un archivo de vendedores en memoria
+    
+    Args:
+        data: Bytes del archivo
+        filename: Nombre original del archivo (decide el formato)
+    
+    Returns:
+        Bytes del xlsx procesado
+    """
     try:
-        file_extension = os.path.splitext(file_path)[1].lower()
+        file_extension = memory_io.extension(filename)
 
         if file_extension == '.csv':
-            processed_data = process_csv_file(file_path)
+            processed_data = process_csv_file(data, filename)
         elif file_extension in ['.xlsx', '.xls']:
-            processed_data = process_excel_file(file_path, file_extension)
+            processed_data = process_excel_file(data, file_extension)
         else:
             raise ValueError("Formato de archivo no soportado. Solo se admiten .csv, .xlsx y .xls")
 
@@ -381,55 +396,26 @@ def process_file(file_path, return_bytes=False):
         ]
         df = df[column_order]
 
-        # Generar nombre del archivo de salida
-        base_filename = os.path.splitext(os.path.basename(file_path))[0]
-        output_filename = f"{base_filename}_PROCESADO.xlsx"
-
-        if return_bytes:
-            # Para aplicaciones web: devolver como bytes
-            output_buffer = BytesIO()
-            with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
-                # IMPORTANTE: Exportar con string_data=True para mantener formato de string
-                df.to_excel(writer, sheet_name='Vendedores Procesados', index=False)
-                
-                # Ajustar el ancho de las columnas
-                worksheet = writer.sheets['Vendedores Procesados']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
+        # Generar archivo en memoria
+        output_buffer = BytesIO()
+        with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='Vendedores Procesados', index=False)
             
-            output_buffer.seek(0)
-            return output_buffer.getvalue(), output_filename
-        else:
-            # Para uso local: guardar archivo
-            output_path = os.path.join(os.path.dirname(file_path), output_filename)
-            
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Vendedores Procesados', index=False)
-
-                # Ajustar el ancho de las columnas
-                worksheet = writer.sheets['Vendedores Procesados']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-
-            return output_path
+            # Ajustar el ancho de las columnas
+            worksheet = writer.sheets['Vendedores Procesados']
+            for column in worksheet.columns:
+                max_length = 0
+                column_letter = column[0].column_letter
+                for cell in column:
+                    try:
+                        if len(str(cell.value)) > max_length:
+                            max_length = len(str(cell.value))
+                    except:
+                        pass
+                adjusted_width = min(max_length + 2, 50)
+                worksheet.column_dimensions[column_letter].width = adjusted_width
+        
+        return output_buffer.getvalue()
 
     except Exception as e:
         raise Exception(f"Error al procesar el archivo de vendedores: {str(e)}")
@@ -445,73 +431,8 @@ def process_vendedores_data_for_webapp(file_bytes, original_filename):
     Returns:
         Tupla (bytes_data, output_filename) del archivo procesado
     """
-    import tempfile
-    
     try:
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(original_filename)[1]) as temp_file:
-            temp_file.write(file_bytes)
-            temp_file_path = temp_file.name
-        
-        try:
-            # CORRECCIÓN: Usar el nombre original del archivo para generar el nombre de salida
-            base_filename = os.path.splitext(original_filename)[0]
-            output_filename = f"{base_filename}_PROCESADO.xlsx"
-            
-            # Procesar el archivo temporal usando la lógica existente
-            file_extension = os.path.splitext(original_filename)[1].lower()
-
-            if file_extension == '.csv':
-                processed_data = process_csv_file(temp_file_path)
-            elif file_extension in ['.xlsx', '.xls']:
-                processed_data = process_excel_file(temp_file_path, file_extension)
-            else:
-                raise ValueError("Formato de archivo no soportado. Solo se admiten .csv, .xlsx y .xls")
-
-            if not processed_data:
-                raise ValueError("No se encontraron datos válidos en el archivo")
-
-            # Crear DataFrame con los datos procesados
-            # IMPORTANTE: dtype=str para asegurar que todas las columnas sean strings
-            df = pd.DataFrame(processed_data, dtype=str)
-
-            # Asegurar el orden correcto de las columnas
-            column_order = [
-                'ID Vendedor',
-                'Nombre Vendedor',
-                'ID Articulo',
-                'Descripcion Articulo',
-                'Cantidad',
-                'Monto S-IVA'
-            ]
-            df = df[column_order]
-
-            # Generar archivo en memoria
-            output_buffer = BytesIO()
-            with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Vendedores Procesados', index=False)
-                
-                # Ajustar el ancho de las columnas
-                worksheet = writer.sheets['Vendedores Procesados']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            output_buffer.seek(0)
-            return output_buffer.getvalue(), output_filename
-            
-        finally:
-            # Limpiar archivo temporal
-            os.unlink(temp_file_path)
-            
+        return process_bytes(file_bytes, original_filename), output_filename(original_filename)
     except Exception as e:
         raise Exception(f"Error al procesar archivo para aplicación web: {str(e)}")
 
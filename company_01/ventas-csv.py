@@ -2,6 +2,8 @@ import pandas as pd
 import os
 import re
 from io import BytesIO
+from processing import memory_io
+from processing.csv_io import read_csv_bytes
 
 def clean_numeric_value(value):
     """Convierte un valor numérico a float con 2 decimales, maneja formato con comas"""
@@ -86,7 +88,7 @@ def find_value_after_marker(row_values, marker):
     except Exception:
         return None, None
 
-def process_csv_diario_ventas(file_path):
+def process_csv_diario_ventas(data, filename=None):
     """
     Procesa archivos CSV con formato 'Diario de Ventas Detallado'
     """
@@ -95,20 +97,8 @@ def process_csv_diario_ventas(file_path):
         print("PROCESANDO CSV DIARIO DE VENTAS")
         print("="*80)
         
-        # Leer CSV sin header
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, encoding=encoding, header=None)
-                print(f"✓ Archivo leído con encoding: {encoding}")
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if df is None:
-            raise ValueError("No se pudo leer el archivo CSV con ninguna codificación soportada")
+        # Leer CSV sin header (codificación y delimitador detectados una sola vez)
+        df = read_csv_bytes(data, filename, header=None)
         
         processed_data = []
         
@@ -198,6 +188,10 @@ def process_csv_diario_ventas(file_path):
     except Exception as e:
         raise Exception(f"Error al procesar CSV Diario de Ventas: {str(e)}")
 
+def output_filename(filename):
+    """Nombre del archivo de salida usando el nombre original"""
+    return f"{os.path.splitext(os.path.basename(filename))[0]}_PROCESADO.xlsx"
+
 def process_file(filepath, original_filename=None):
     """
     Procesa un archivo CSV de ventas diarias
@@ -209,15 +203,31 @@ def process_file(filepath, original_filename=None):
     Returns:
         str: Ruta del archivo procesado
     """
-    try:
-        print(f"🚀 Iniciando procesamiento de: {filepath}")
+    # Verificar que el archivo existe
+    if not os.path.exists(filepath):
+        raise RuntimeError(f"El archivo no existe: {filepath}")
+    
+    output_path = os.path.join(os.path.dirname(filepath), output_filename(original_filename or filepath))
+    memory_io.run_on_path(process_bytes, filepath, output_path)
+    print(f"💾 Archivo guardado en: {output_path}")
+    return output_path
+
+def process_bytes(data, filename):
+    """
+    Procesa en memoria el contenido de un CSV de ventas diarias
+    
+    Args:
+        data (bytes): Contenido del archivo
+        filename (str): Nombre original del archivo
         
-        # Verificar que el archivo existe
-        if not os.path.exists(filepath):
-            raise RuntimeError(f"El archivo no existe: {filepath}")
+    Returns:
+        bytes: xlsx procesado
+    """
+    try:
+        print(f"🚀 Iniciando procesamiento de: {filename}")
         
         # Procesar el archivo CSV
-        processed_data = process_csv_diario_ventas(filepath)
+        processed_data = process_csv_diario_ventas(data, filename)
         
         if not processed_data:
             raise RuntimeError("No se encontraron datos válidos en el archivo")
@@ -251,19 +261,9 @@ def process_file(filepath, original_filename=None):
         ]
         df = df[column_order]
         
-        # Generar nombre del archivo de salida usando el nombre original
-        if original_filename:
-            # Usar el nombre original proporcionado
-            original_name = os.path.splitext(original_filename)[0]
-        else:
-            # Usar el nombre del archivo actual
-            original_name = os.path.splitext(os.path.basename(filepath))[0]
-            
-        output_filename = f"{original_name}_PROCESADO.xlsx"
-        output_path = os.path.join(os.path.dirname(filepath), output_filename)
-        
-        # Guardar el archivo procesado
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        # Generar archivo en memoria
+        output_buffer = BytesIO()
+        with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
             df.to_excel(writer, sheet_name='Ventas Procesadas', index=False)
             
             # Ajustar ancho de columnas
@@ -280,16 +280,10 @@ def process_file(filepath, original_filename=None):
                 adjusted_width = min(max_length + 2, 50)
                 worksheet.column_dimensions[column_letter].width = adjusted_width
         
-        print(f"💾 Archivo guardado en: {output_path}")
-        
-        # Verificar que el archivo se creó correctamente
-        if not os.path.exists(output_path):
-            raise RuntimeError(f"No se pudo crear el archivo de salida: {output_path}")
-        
-        return output_path
+        return output_buffer.getvalue()
 
     except Exception as e:
-        print(f"❌ Error en process_file: {str(e)}")
+        print(f"❌ Error en process_bytes: {str(e)}")
         print(f"❌ Tipo de error: {type(e).__name__}")
         import traceback
         print(f"❌ Traceback: {traceback.format_exc()}")
@@ -300,33 +294,8 @@ def process_sales_data_for_webapp(file_bytes, original_filename):
     """
     Función específica para aplicaciones web
     """
-    import tempfile
-    
     try:
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as temp_file:
-            temp_file.write(file_bytes)
-            temp_file_path = temp_file.name
-        
-        try:
-            # Procesar el archivo usando la función principal
-            output_path = process_file(temp_file_path, original_filename)
-            
-            # Leer el archivo procesado
-            with open(output_path, 'rb') as f:
-                processed_bytes = f.read()
-            
-            output_filename = os.path.basename(output_path)
-            
-            return processed_bytes, output_filename
-            
-        finally:
-            # Limpiar archivos temporales
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-            
+        return process_bytes(file_bytes, original_filename), output_filename(original_filename)
     except Exception as e:
         raise Exception(f"Error al procesar archivo para aplicación web: {str(e)}")
 
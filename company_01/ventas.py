@@ -4,6 +4,8 @@ import xlrd
 import os
 import csv
 from datetime import datetime
+from processing.csv_io import read_csv_bytes
+from processing import incremental, memory_io
 from io import BytesIO
 import re
 
@@ -187,33 +189,26 @@ def has_client_pattern(value):
     except Exception:
         return False
 
-def process_csv_file(file_path):
+def process_csv_file(data, filename=None):
     """Procesa archivos CSV con la nueva lógica especificada"""
     try:
-        # Intentar leer el CSV con diferentes encodings
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, encoding=encoding, header=None)
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if df is None:
-            raise ValueError("No se pudo leer el archivo CSV con ninguna codificación soportada")
+        # Detectar codificación y delimitador y leer el CSV una sola vez
+        df = read_csv_bytes(data, filename, header=None)
         
         print("PROCESANDO ARCHIVO CSV - LEYENDO TODOS LOS ELEMENTOS DE COLUMNA E...")
         
-        processed_data = []
-        current_row = 0
+        # Exportación acumulativa: retomar desde el prefijo ya procesado en la ejecución anterior
+        inc = incremental.start(
+            incremental.frame_row_hashes(df),
+            incremental.source_version(__file__, "csv", list(df.dtypes.astype(str)))
+        )
+        current_row, processed_data, (current_fecha, current_client_data) = inc.resume(("", None))
         max_rows = len(df)
         print(f"DEBUGGING: Total de filas en el archivo: {max_rows}")
-        current_fecha = ""
-        current_client_data = None
         
         while current_row < max_rows:
+            inc.checkpoint(current_row, processed_data, (current_fecha, current_client_data))
+            
             # Obtener valores de las columnas principales
             col_a_value = df.iloc[current_row, 0] if len(df.columns) > 0 else None
             col_b_value = df.iloc[current_row, 1] if len(df.columns) > 1 else None
@@ -323,6 +318,8 @@ def process_csv_file(file_path):
         print(f"✅ PROCESAMIENTO COMPLETADO: {len(processed_data)} registros procesados")
         print(f"{'='*80}")
         
+        inc.save(processed_data)
+        
         if not processed_data:
             raise ValueError("No se encontraron datos válidos en el archivo")
         
@@ -331,24 +328,22 @@ def process_csv_file(file_path):
     except Exception as e:
         raise Exception(f"Error al procesar archivo CSV: {str(e)}")
 
-def process_excel_file(file_path, file_extension):
+def process_excel_file(data, file_extension):
     """Procesa archivos Excel (.xls y .xlsx) con la nueva lógica especificada"""
     try:
         if file_extension == '.xlsx':
-            workbook = openpyxl.load_workbook(file_path, data_only=True)
+            workbook = openpyxl.load_workbook(memory_io.buffer(data), data_only=True)
             sheet = workbook.active
             max_row = sheet.max_row
             is_xlsx = True
         elif file_extension == '.xls':
-            workbook = xlrd.open_workbook(file_path)
+            workbook = xlrd.open_workbook(file_contents=data)
             sheet = workbook.sheet_by_index(0)
             max_row = sheet.nrows
             is_xlsx = False
         else:
             raise ValueError("Formato de archivo no soportado")
 
-        processed_data = []
-
         def get_cell_value(row, col):
             try:
                 if is_xlsx:
@@ -363,11 +358,18 @@ def process_excel_file(file_path, file_extension):
         print("PROCESANDO ARCHIVO EXCEL - LEYENDO TODOS LOS ELEMENTOS DE COLUMNA E...")
         print(f"DEBUGGING: Total de filas en el archivo: {max_row}")
         
-        current_row = 1
-        current_fecha = ""
-        current_client_data = None
+        # Exportación acumulativa: retomar desde el prefijo ya procesado en la ejecución anterior
+        if is_xlsx:
+            sheet_rows = sheet.iter_rows(values_only=True)
+        else:
+            sheet_rows = (sheet.row_values(r) for r in range(max_row))
+        inc = incremental.start(incremental.rows_hashes(sheet_rows), incremental.source_version(__file__, file_extension))
+        start_row, processed_data, (current_fecha, current_client_data) = inc.resume(("", None))
+        current_row = start_row + 1  # filas de Excel desde 1
         
         while current_row <= max_row:
+            inc.checkpoint(current_row - 1, processed_data, (current_fecha, current_client_data))
+            
             # Obtener valores de las columnas principales
             col_a_value = get_cell_value(current_row, 1)  # Columna A
             col_b_value = get_cell_value(current_row, 2)  # Columna B
@@ -477,6 +479,8 @@ def process_excel_file(file_path, file_extension):
         print(f"✅ PROCESAMIENTO COMPLETADO: {len(processed_data)} registros procesados")
         print(f"{'='*80}")
 
+        inc.save(processed_data)
+
         if not processed_data:
             raise ValueError("No se encontraron datos válidos en el archivo")
 
@@ -485,6 +489,11 @@ def process_excel_file(file_path, file_extension):
     except Exception as e:
         raise Exception(f"Error al procesar archivo Excel: {str(e)}")
 
+def output_filename(filename):
+    """Nombre del archivo de salida a partir del nombre original"""
+    base_filename = sanitize_filename(os.path.splitext(os.path.basename(filename))[0])
+    return f"{base_filename}_PROCESADO.xlsx"
+
 def process_file(file_path, return_bytes=False):
     """
     Función principal que procesa archivos CSV, XLS y XLSX de ventas con la nueva lógica
@@ -497,13 +506,32 @@ def process_file(file_path, return_bytes=False):
         Si return_bytes=True: tupla (bytes_data, filename)
         Si return_bytes=False: ruta del archivo guardado
     """
+    if return_bytes:
+        # Para aplicaciones web: devolver como bytes
+        data = process_bytes(memory_io.read_path(file_path), os.path.basename(file_path))
+        return data, output_filename(file_path)
+    # Para uso local: guardar archivo
+    output_path = os.path.join(os.path.dirname(file_path), output_filename(file_path))
+    return memory_io.run_on_path(process_bytes, file_path, output_path)
+
+def process_bytes(data, filename):
+    """
+    Procesa el contenido de un archivo de ventas en memoria
+    
+    Args:
+        data: Bytes del archivo
+        filename: Nombre original del archivo (decide el formato)
+    
+    Returns:
+        Bytes del xlsx procesado
+    """
     try:
-        file_extension = os.path.splitext(file_path)[1].lower()
+        file_extension = memory_io.extension(filename)
 
         if file_extension == '.csv':
-            processed_data = process_csv_file(file_path)
+            processed_data = process_csv_file(data, filename)
         elif file_extension in ['.xlsx', '.xls']:
-            processed_data = process_excel_file(file_path, file_extension)
+            processed_data = process_excel_file(data, file_extension)
         else:
             raise ValueError("Formato de archivo no soportado. Solo se admiten .csv, .xlsx y .xls")
 
@@ -543,54 +571,26 @@ def process_file(file_path, return_bytes=False):
         ]
         df = df[column_order]
 
-        # Generar nombre del archivo de salida
-        base_filename = sanitize_filename(os.path.splitext(os.path.basename(file_path))[0])
-        output_filename = f"{base_filename}_PROCESADO.xlsx"
-
-        if return_bytes:
-            # Para aplicaciones web: devolver como bytes
-            output_buffer = BytesIO()
-            with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Ventas Procesadas', index=False)
-                
-                # Ajustar el ancho de las columnas
-                worksheet = writer.sheets['Ventas Procesadas']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
+        # Generar archivo en memoria
+        output_buffer = BytesIO()
+        with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='Ventas Procesadas', index=False)
             
-            output_buffer.seek(0)
-            return output_buffer.getvalue(), output_filename
-        else:
-            # Para uso local: guardar archivo
-            output_path = os.path.join(os.path.dirname(file_path), output_filename)
-            
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Ventas Procesadas', index=False)
-
-                # Ajustar el ancho de las columnas
-                worksheet = writer.sheets['Ventas Procesadas']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-
-            return output_path
+            # Ajustar el ancho de las columnas
+            worksheet = writer.sheets['Ventas Procesadas']
+            for column in worksheet.columns:
+                max_length = 0
+                column_letter = column[0].column_letter
+                for cell in column:
+                    try:
+                        if len(str(cell.value)) > max_length:
+                            max_length = len(str(cell.value))
+                    except:
+                        pass
+                adjusted_width = min(max_length + 2, 50)
+                worksheet.column_dimensions[column_letter].width = adjusted_width
+        
+        return output_buffer.getvalue()
 
     except Exception as e:
         raise Exception(f"Error al procesar el archivo de ventas: {str(e)}")
@@ -606,85 +606,8 @@ def process_sales_data_for_webapp(file_bytes, original_filename):
     Returns:
         Tupla (bytes_data, output_filename) del archivo procesado
     """
-    import tempfile
-    
     try:
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(original_filename)[1]) as temp_file:
-            temp_file.write(file_bytes)
-            temp_file_path = temp_file.name
-        
-        try:
-            # Usar el nombre original del archivo para generar el nombre de salida
-            base_filename = sanitize_filename(os.path.splitext(original_filename)[0])
-            output_filename = f"{base_filename}_PROCESADO.xlsx"
-            
-            # Procesar el archivo temporal
-            file_extension = os.path.splitext(original_filename)[1].lower()
-
-            if file_extension == '.csv':
-                processed_data = process_csv_file(temp_file_path)
-            elif file_extension in ['.xlsx', '.xls']:
-                processed_data = process_excel_file(temp_file_path, file_extension)
-            else:
-                raise ValueError("Formato de archivo no soportado. Solo se admiten .csv, .xlsx y .xls")
-
-            if not processed_data:
-                raise ValueError("No se encontraron datos válidos en el archivo")
-
-            # Crear DataFrame con los datos procesados
-            df = pd.DataFrame(processed_data)
-
-            # Asegurar el orden correcto de las columnas
-            column_order = [
-                'ID del Cliente',
-                'Razon Social',
-                'Tipo de Documento',
-                'Serie del Documento',
-                'ID del Documento',
-                'Fecha',
-                'Exento',
-                'Total Neto sin IVA',
-                'IVA Total del Documento',
-                'Total del Documento con IVA Incluido',
-                'Red',
-                'ID de Articulo',
-                'Detalle de Articulo',
-                'Cantidad Comprada',
-                'Precio Unitario',
-                'Descuento 1 (%)',
-                'Descuento 2 (%)',
-                'Descuento 3 (%)',
-                'Total con Descuentos'
-            ]
-            df = df[column_order]
-
-            # Generar archivo en memoria
-            output_buffer = BytesIO()
-            with pd.ExcelWriter(output_buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Ventas Procesadas', index=False)
-                
-                # Ajustar el ancho de las columnas
-                worksheet = writer.sheets['Ventas Procesadas']
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            output_buffer.seek(0)
-            return output_buffer.getvalue(), output_filename
-            
-        finally:
-            # Limpiar archivo temporal
-            os.unlink(temp_file_path)
-            
+        return process_bytes(file_bytes, original_filename), output_filename(original_filename)
     except Exception as e:
         raise Exception(f"Error al procesar archivo para aplicación web: {str(e)}")
 
@@ -1,9 +1,16 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import asyncio
 import os
+import time
 from urllib.parse import quote_plus
 
+import metrics
+
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -18,6 +25,40 @@ else:
 if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg2://", 1)
 
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+# Pool configuration (PostgreSQL). DB_POOL_PRE_PING=false drops the ping round-trip
+# before every checkout and relies on pool_recycle plus disconnect invalidation instead.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# Checkout waits above this threshold are logged
+POOL_SLOW_CHECKOUT_MS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_MS", "100"))
+
+POOL_OPTIONS = {
+    "pool_size": POOL_SIZE,
+    "max_overflow": POOL_MAX_OVERFLOW,
+    "pool_timeout": POOL_TIMEOUT,
+    "pool_recycle": POOL_RECYCLE,
+    "pool_pre_ping": POOL_PRE_PING,
+}
+
+# The sync engine only serves legacy paths (job queue threads, migrations), so it gets
+# its own, smaller pool instead of a second copy of the request pool.
+SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", "2"))
+SYNC_POOL_MAX_OVERFLOW = int(os.getenv("DB_SYNC_MAX_OVERFLOW", "3"))
+SYNC_POOL_OPTIONS = dict(POOL_OPTIONS, pool_size=SYNC_POOL_SIZE, max_overflow=SYNC_POOL_MAX_OVERFLOW)
+
+# Connection budget: each process can hold both pools at their maximum, and every
+# gunicorn worker is a process. DB_MAX_CONNECTIONS (e.g. Postgres max_connections minus
+# what other clients need) makes startup warn when the deployment can exceed it.
+MAX_CONNECTIONS_PER_PROCESS = POOL_SIZE + POOL_MAX_OVERFLOW + SYNC_POOL_SIZE + SYNC_POOL_MAX_OVERFLOW
+WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+
 # Create engine with appropriate settings
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
@@ -29,15 +70,53 @@ else:
     engine = create_engine(
         DATABASE_URL,
         echo=False,  # Set to True for SQL debugging
-        pool_pre_ping=True,
-        pool_recycle=300,
+        **SYNC_POOL_OPTIONS,
         connect_args={
             "sslmode": "require",
             "connect_timeout": 10,
         } if "railway" in DATABASE_URL else {}
     )
 
+def get_async_database_url(url):
+    """Translate the sync database URL to its async driver (asyncpg / aiosqlite)"""
+    url = make_url(url)
+    if url.drivername.startswith("sqlite"):
+        return url.set(drivername="sqlite+aiosqlite"), {}
+
+    # asyncpg does not understand libpq's sslmode, it takes an ssl argument instead
+    connect_args = {}
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        url = url.difference_update_query(["sslmode"])
+        connect_args["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg"), connect_args
+
+ASYNC_DATABASE_URL, _async_connect_args = get_async_database_url(DATABASE_URL)
+
+# Async engine used by the request handlers
+if DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=False
+    )
+else:
+    if "railway" in DATABASE_URL:
+        _async_connect_args.setdefault("ssl", "require")
+        _async_connect_args["timeout"] = 10
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=False,
+        **POOL_OPTIONS,
+        connect_args=_async_connect_args
+    )
+    if DB_MAX_CONNECTIONS and MAX_CONNECTIONS_PER_PROCESS * WEB_WORKERS > DB_MAX_CONNECTIONS:
+        print(f"⚠️ DB pools can open {MAX_CONNECTIONS_PER_PROCESS * WEB_WORKERS} connections "
+              f"({MAX_CONNECTIONS_PER_PROCESS} per process x {WEB_WORKERS} workers), "
+              f"above DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS}")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes must stay readable after commit without an implicit (sync) refresh
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -48,11 +127,91 @@ def get_db():
     finally:
         db.close()
 
-def check_db_health():
+def _pool_stat(name, pool_engine=None):
+    method = getattr((pool_engine or async_engine).pool, name, None)
+    return method() if callable(method) else None
+
+pool_checkout_wait = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection"
+)
+pool_checkout_timeouts = metrics.counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT"
+)
+metrics.gauge("db_pool_size", "Configured pool size", fn=lambda: _pool_stat("size") or 0)
+metrics.gauge("db_pool_checked_out", "Connections currently checked out", fn=lambda: _pool_stat("checkedout") or 0)
+metrics.gauge("db_pool_checked_in", "Idle connections in the pool", fn=lambda: _pool_stat("checkedin") or 0)
+metrics.gauge("db_pool_overflow", "Connections opened above pool_size", fn=lambda: max(_pool_stat("overflow") or 0, 0))
+
+def get_pool_stats():
+    """Snapshot of the DB pools (async pool plus the sync one) for /health and logs"""
+    return {
+        "pool_class": type(async_engine.pool).__name__,
+        "size": _pool_stat("size"),
+        "checked_out": _pool_stat("checkedout"),
+        "checked_in": _pool_stat("checkedin"),
+        # QueuePool reports overflow as negative while the base pool is not full
+        "overflow": max(_pool_stat("overflow") or 0, 0),
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "timeout": POOL_TIMEOUT,
+        "pre_ping": POOL_PRE_PING,
+        "checkout_wait": pool_checkout_wait.summary(),
+        "checkout_timeouts": pool_checkout_timeouts.value(),
+        "sync_pool": {
+            "size": _pool_stat("size", engine),
+            "checked_out": _pool_stat("checkedout", engine),
+            "max_overflow": SYNC_POOL_MAX_OVERFLOW,
+        },
+        "max_connections_per_process": MAX_CONNECTIONS_PER_PROCESS,
+        "max_connections_total": MAX_CONNECTIONS_PER_PROCESS * WEB_WORKERS,
+    }
+
+# Startup initializes the schema in the background; handlers wait for it up to this long
+DB_READY_TIMEOUT = float(os.getenv("DB_READY_TIMEOUT", "30"))
+_db_ready = asyncio.Event()
+
+def mark_db_ready():
+    """Let request handlers through (also called when init failed: degraded mode)"""
+    _db_ready.set()
+
+def is_db_ready():
+    return _db_ready.is_set()
+
+async def wait_db_ready(timeout=DB_READY_TIMEOUT):
+    """Wait for startup initialization; returns False on timeout"""
+    if _db_ready.is_set():
+        return True
+    try:
+        await asyncio.wait_for(_db_ready.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+async def get_async_db():
+    """Dependency to get an async database session for request handlers"""
+    if not await wait_db_ready():
+        from fastapi import HTTPException
+        raise HTTPException(status_code=503, detail="La base de datos se está inicializando, intente nuevamente")
+    async with AsyncSessionLocal() as db:
+        # Check out the connection up front so the wait for the pool can be measured
+        start = time.perf_counter()
+        try:
+            await db.connection()
+        except sa_exc.TimeoutError:
+            pool_checkout_timeouts.inc()
+            print(f"❌ DB pool exhausted after {POOL_TIMEOUT}s: {get_pool_stats()}")
+            raise
+        wait = time.perf_counter() - start
+        pool_checkout_wait.observe(wait)
+        if wait * 1000 > POOL_SLOW_CHECKOUT_MS:
+            print(f"⚠️ Slow DB pool checkout: {wait * 1000:.0f} ms "
+                  f"(checked out: {_pool_stat('checkedout')}, overflow: {_pool_stat('overflow')})")
+        yield db
+
+async def check_db_health():
     """Check if database is accessible"""
     try:
-        with engine.connect() as connection:
-            connection.execute(text("SELECT 1"))
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
         return True
     except Exception as e:
         print(f"❌ Database health check failed: {str(e)}")
@@ -67,60 +226,10 @@ def init_db():
         try:
             print(f"🔄 Database initialization attempt {retry_count + 1}/{max_retries}")
             
-            # Test connection first
-            with engine.connect() as connection:
-                connection.execute(text("SELECT 1"))
-            print("✅ Database connection successful")
-            
-            # Import models to ensure they're registered
-            from models import User, Company, Tool, ProcessedFile
-            
-            # Create all tables
-            Base.metadata.create_all(bind=engine)
-            print("✅ Database tables created/verified")
-            
-            # Add new columns if they don't exist (for existing databases)
-            try:
-                with engine.connect() as connection:
-                    # Check if guide_pdf columns exist
-                    if DATABASE_URL.startswith("sqlite"):
-                        # SQLite approach
-                        result = connection.execute(text("PRAGMA table_info(tools)"))
-                        columns = [row[1] for row in result.fetchall()]
-                        
-                        if 'guide_pdf' not in columns:
-                            print("🔄 Adding guide_pdf column to tools table...")
-                            connection.execute(text("ALTER TABLE tools ADD COLUMN guide_pdf BLOB"))
-                            connection.commit()
-                            
-                        if 'guide_pdf_filename' not in columns:
-                            print("🔄 Adding guide_pdf_filename column to tools table...")
-                            connection.execute(text("ALTER TABLE tools ADD COLUMN guide_pdf_filename VARCHAR(255)"))
-                            connection.commit()
-                    else:
-                        # PostgreSQL approach
-                        result = connection.execute(text("""
-                            SELECT column_name 
-                            FROM information_schema.columns 
-                            WHERE table_name = 'tools'
-                        """))
-                        columns = [row[0] for row in result.fetchall()]
-                        
-                        if 'guide_pdf' not in columns:
-                            print("🔄 Adding guide_pdf column to tools table...")
-                            connection.execute(text("ALTER TABLE tools ADD COLUMN guide_pdf BYTEA"))
-                            connection.commit()
-                            
-                        if 'guide_pdf_filename' not in columns:
-                            print("🔄 Adding guide_pdf_filename column to tools table...")
-                            connection.execute(text("ALTER TABLE tools ADD COLUMN guide_pdf_filename VARCHAR(255)"))
-                            connection.commit()
-                            
-                    print("✅ Database schema updated successfully")
-                    
-            except Exception as e:
-                print(f"⚠️ Schema update warning: {str(e)} (this is normal for new databases)")
-            
+            # Versioned migrations (migrations/); when the schema is up to date this is
+            # a single SELECT, which also serves as the connection test
+            from migrations.runner import run_migrations
+            run_migrations(engine)
             return True
             
         except Exception as e:
@@ -131,7 +240,10 @@ def init_db():
                 print(f"❌ Database initialization failed after {max_retries} attempts")
                 return False
             
-            import time
             time.sleep(2 ** retry_count)  # Exponential backoff
     
     return False
+
+async def init_db_async():
+    """init_db in a worker thread, so the event loop keeps serving while it connects and retries"""
+    return await asyncio.to_thread(init_db)
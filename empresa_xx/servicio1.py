@@ -4,6 +4,7 @@ import xlrd
 import os
 import csv
 from datetime import datetime
+from processing.csv_io import read_csv_file
 
 def get_column_letter(col_num):
     """Genera letras de columna para Excel (A, B, C, ..., AA, AB, etc.)"""
@@ -48,19 +49,8 @@ def clean_value(value, data_type='string'):
 def process_csv_file(file_path):
     """Procesa archivos CSV - asume que los datos están en un formato tabular simple"""
     try:
-        # Intentar leer el CSV con diferentes encodings
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        df = None
-        
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, encoding=encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if df is None:
-            raise ValueError("No se pudo leer el archivo CSV con ninguna codificación soportada")
+        # Detectar codificación y delimitador y leer el CSV una sola vez
+        df = read_csv_file(file_path)
         
         # Si el CSV tiene el formato esperado con proveedores, procesarlo
         # Si no, intentar mapear columnas conocidas
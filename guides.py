@@ -0,0 +1,67 @@
+"""
+Entrega de los PDF de guía de las herramientas.
+
+Los PDF viven en la tabla `tool_guides` con su tamaño y hash. Las consultas de
+metadatos nunca cargan los bytes (la columna `data` es diferida) y las respuestas
+usan el hash como ETag: una URL versionada con `?v=<sha256>` se sirve como inmutable,
+y sin versión se revalida con 304.
+"""
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from models import ToolGuide
+
+IMMUTABLE_CACHE = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE = "private, no-cache"
+
+
+async def get_guide_info(db: AsyncSession, tool_id: int):
+    """Metadatos de la guía (sin el PDF), o None si la herramienta no tiene"""
+    return await db.scalar(select(ToolGuide).where(ToolGuide.tool_id == tool_id))
+
+
+async def load_guide(db: AsyncSession, tool_id: int):
+    """Guía con el contenido del PDF cargado"""
+    return await db.scalar(
+        select(ToolGuide).where(ToolGuide.tool_id == tool_id).options(undefer(ToolGuide.data))
+    )
+
+
+def guide_etag(guide):
+    return f'"{guide.sha256}"'
+
+
+def versioned_url(path, guide):
+    return f"{path}?v={guide.sha256}"
+
+
+def not_modified(request: Request, guide):
+    """True si el cliente ya tiene esta versión del PDF"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return guide_etag(guide) in candidates or "*" in candidates
+
+
+def cache_headers(request: Request, guide):
+    # Solo una URL que fija el hash puede cachearse como inmutable
+    versioned = request.query_params.get("v") == guide.sha256
+    return {
+        "ETag": guide_etag(guide),
+        "Cache-Control": IMMUTABLE_CACHE if versioned else REVALIDATE_CACHE,
+    }
+
+
+def not_modified_response(request: Request, guide):
+    return Response(status_code=304, headers=cache_headers(request, guide))
+
+
+def pdf_response(request: Request, guide, disposition="inline"):
+    """Respuesta con el PDF y sus headers de caché"""
+    headers = cache_headers(request, guide)
+    headers["Content-Disposition"] = f"{disposition}; filename={guide.filename}"
+    return Response(content=guide.data, media_type="application/pdf", headers=headers)
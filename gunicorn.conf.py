@@ -0,0 +1,39 @@
+"""
+Configuración de gunicorn para correr varios workers de uvicorn.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+Por defecto un worker web por CPU, hasta 4 (WEB_CONCURRENCY para fijarlo). Cada worker tiene
+su propio pool de procesamiento; processing.executor reparte los CPU entre ellos
+leyendo WEB_CONCURRENCY, que se exporta acá para que lo hereden los workers. Lo que
+debe ser global entre workers (versión del catálogo, invalidación de cachés,
+migraciones) pasa por shared_state y la base de datos.
+"""
+import os
+
+
+def available_cpus():
+    # En contenedores cpu_count() puede devolver los CPU del host
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Cada worker carga pandas y su pool: más de WEB_CONCURRENCY_MAX por defecto no rinde en memoria
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(available_cpus(), int(os.getenv("WEB_CONCURRENCY_MAX", "4"))))))
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+# Los procesadores pueden tardar: el timeout de gunicorn no debe matar al worker
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Reciclar workers cada tanto acota la memoria que dejan pandas y openpyxl
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Sin preload: cada worker importa la app y arranca su event loop y su pool
+preload_app = False
+accesslog = "-"
+errorlog = "-"
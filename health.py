@@ -0,0 +1,159 @@
+"""
+Chequeos de salud con caché.
+
+`/health` abría una conexión a la base y escribía y borraba un archivo en `uploads/`
+en cada llamada, y el orquestador lo consulta seguido. Ahora hay dos endpoints:
+
+- `/live`: el proceso responde. Sin I/O.
+- `/ready`: la aplicación puede atender (DB, disco, procesadores, cola, arranque).
+  Devuelve el último resultado guardado; una tarea en segundo plano lo refresca cada
+  `READY_CACHE_TTL` segundos, así que los chequeos caros corren a lo sumo una vez por
+  intervalo sin importar cuántas veces se consulte.
+
+`/health` se mantiene por compatibilidad y devuelve el mismo resultado que `/ready`.
+"""
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime
+
+import metrics
+from database import check_db_health, get_pool_stats, is_db_ready
+from processing import executor, jobs, prewarm, scratch
+
+READY_CACHE_TTL = float(os.getenv("READY_CACHE_TTL", "10"))
+# Tiempo máximo del chequeo de DB antes de darla por caída
+READY_DB_TIMEOUT = float(os.getenv("READY_DB_TIMEOUT", "5"))
+# Por debajo de este espacio libre en el disco de uploads la instancia deja de estar lista
+MIN_FREE_DISK_MB = float(os.getenv("MIN_FREE_DISK_MB", "100"))
+DISK_PATH = "uploads"
+
+# Estado del arranque en segundo plano (lo actualiza main.run_startup)
+startup_state = {"status": "starting", "started_at": None, "seconds": None}
+
+_cached = None
+_cached_at = 0.0
+_refresh_lock = asyncio.Lock()
+
+readiness_checks = metrics.counter("readiness_checks_total", "Readiness checks actually executed")
+readiness_check_seconds = metrics.histogram("readiness_check_seconds", "Duration of a readiness check run")
+
+
+def disk_stats(path=DISK_PATH):
+    """Espacio libre y permiso de escritura, sin escribir en el disco"""
+    try:
+        usage = shutil.disk_usage(path)
+    except OSError as e:
+        return {"status": "unhealthy", "message": f"File system error: {str(e)}"}
+    free_mb = usage.free / (1024 * 1024)
+    writable = os.access(path, os.W_OK)
+    healthy = writable and free_mb >= MIN_FREE_DISK_MB
+    return {
+        "status": "healthy" if healthy else "unhealthy",
+        "path": path,
+        "writable": writable,
+        "free_mb": round(free_mb, 1),
+        "total_mb": round(usage.total / (1024 * 1024), 1),
+        "min_free_mb": MIN_FREE_DISK_MB,
+    }
+
+
+async def database_stats():
+    try:
+        db_healthy = await asyncio.wait_for(check_db_health(), READY_DB_TIMEOUT)
+        message = "Database connection successful" if db_healthy else "Database connection failed"
+    except asyncio.TimeoutError:
+        db_healthy, message = False, f"Database check timed out after {READY_DB_TIMEOUT}s"
+    except Exception as e:
+        db_healthy, message = False, f"Database check error: {str(e)}"
+    return {
+        "status": "healthy" if db_healthy else "unhealthy",
+        "message": message,
+        "pool": get_pool_stats(),
+    }
+
+
+async def run_checks():
+    """Ejecutar todos los chequeos y armar el reporte de readiness"""
+    start = time.perf_counter()
+    report = {
+        "service": "ego-project",
+        "version": "1.0.0",
+        "timestamp": datetime.utcnow().isoformat(),
+        "checks": {},
+    }
+    checks = report["checks"]
+    checks["database"] = await database_stats()
+    checks["filesystem"] = disk_stats()
+    # Informativo: el directorio se crea con el primer trabajo
+    checks["scratch"] = disk_stats(scratch.SCRATCH_DIR) if os.path.isdir(scratch.SCRATCH_DIR) else {
+        "status": "not_created", "path": scratch.SCRATCH_DIR
+    }
+    checks["processors"] = prewarm.health()
+    checks["worker_pool"] = executor.pool_stats()
+    try:
+        checks["job_queue"] = await asyncio.to_thread(jobs.queue_stats)
+    except Exception as e:
+        checks["job_queue"] = {"error": str(e)}
+    checks["startup"] = dict(startup_state, database_ready=is_db_ready())
+
+    db_healthy = checks["database"]["status"] == "healthy"
+    fs_healthy = checks["filesystem"]["status"] == "healthy"
+    processors_healthy = checks["processors"]["status"] != "unhealthy"
+
+    if startup_state["status"] == "starting":
+        report["status"] = "starting"
+    elif db_healthy and fs_healthy and processors_healthy:
+        report["status"] = "healthy"
+    elif db_healthy or fs_healthy:
+        report["status"] = "degraded"
+    else:
+        report["status"] = "unhealthy"
+
+    elapsed = time.perf_counter() - start
+    report["check_seconds"] = round(elapsed, 4)
+    readiness_checks.inc()
+    readiness_check_seconds.observe(elapsed)
+    return report
+
+
+async def refresh():
+    """Recalcular el reporte (una sola ejecución a la vez)"""
+    global _cached, _cached_at
+    async with _refresh_lock:
+        _cached = await run_checks()
+        _cached_at = time.monotonic()
+    return _cached
+
+
+async def get_readiness():
+    """
+    Último reporte de readiness
+
+    Si la tarea de refresco no corre o se atrasó (p.ej. antes del primer refresco),
+    se recalcula aquí; los requests concurrentes esperan el mismo recálculo.
+    """
+    if _cached is None or time.monotonic() - _cached_at > READY_CACHE_TTL * 2:
+        if _refresh_lock.locked():
+            async with _refresh_lock:
+                pass
+        if _cached is None or time.monotonic() - _cached_at > READY_CACHE_TTL * 2:
+            await refresh()
+    report = dict(_cached)
+    report["age_seconds"] = round(time.monotonic() - _cached_at, 3)
+    return report
+
+
+def status_code(report):
+    return 200 if report["status"] in ["healthy", "degraded"] else 503
+
+
+async def refresh_loop():
+    """Tarea de fondo: refrescar el reporte cada READY_CACHE_TTL segundos"""
+    while True:
+        try:
+            await refresh()
+        except Exception as e:
+            print(f"⚠️ Readiness refresh failed: {str(e)}")
+        await asyncio.sleep(READY_CACHE_TTL)
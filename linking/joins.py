@@ -0,0 +1,191 @@
+"""
+Motor de cruces (lookups) para herramientas de vinculación.
+
+Reemplaza las cadenas de `merge(how='left')` por búsquedas indexadas sobre una tabla
+base: las claves se normalizan una sola vez por columna, cada lado derecho se reduce
+a una fila por clave según una política declarada, y los valores se traen con un
+`reindex` sobre un índice único, sin copias intermedias ni filas duplicadas.
+
+Políticas para claves repetidas en el lado derecho:
+    first  - primera aparición (como BUSCARV)
+    last   - última aparición
+    sum    - suma de columnas numéricas, primera aparición del resto
+    error  - falla si hay claves repetidas
+
+Las claves vacías nunca coinciden (en un merge, '' del lado izquierdo se cruzaba con
+cualquier fila vacía del derecho).
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from processing import run_metadata
+
+DEDUPE_POLICIES = ("first", "last", "sum", "error")
+
+
+def normalize_keys(values):
+    """Clave de cruce: texto sin espacios en los extremos y en mayúsculas"""
+    return values.fillna('').astype(str).str.strip().str.upper()
+
+
+class JoinSpec:
+    """
+    Un cruce contra la tabla base
+
+    Args:
+        name: nombre para el reporte (p.ej. "archivo2")
+        frame: DataFrame del lado derecho
+        left_key: posición de la columna clave en la tabla base
+        right_key: posición de la columna clave en `frame`
+        columns: posiciones de las columnas de `frame` a traer
+        names: nombres de las columnas resultantes
+        policy: política para claves repetidas (ver DEDUPE_POLICIES)
+        skip_rows: filas iniciales de `frame` a ignorar
+        key_func: normalización de claves (por defecto `normalize_keys`)
+    """
+
+    def __init__(self, name, frame, left_key, right_key, columns, names,
+                 policy="first", skip_rows=0, key_func=normalize_keys):
+        if policy not in DEDUPE_POLICIES:
+            raise ValueError(f"Política de duplicados inválida: {policy}")
+        if len(columns) != len(names):
+            raise ValueError(f"{name}: se esperaban {len(columns)} nombres de columna")
+        self.name = name
+        self.frame = frame
+        self.left_key = left_key
+        self.right_key = right_key
+        self.columns = list(columns)
+        self.names = list(names)
+        self.policy = policy
+        self.skip_rows = skip_rows
+        self.key_func = key_func
+
+
+def dedupe_lookup(values, policy, name=""):
+    """
+    Dejar una fila por clave no vacía en una tabla indexada por clave
+
+    Returns:
+        (tabla con índice único, cantidad de claves que estaban repetidas, filas por
+        clave antes de deduplicar o None si no había repetidas)
+    """
+    values = values[values.index != '']
+
+    duplicated = values.index.duplicated(keep=False)
+    duplicate_keys = int(values.index[duplicated].nunique())
+    key_counts = None
+    if duplicate_keys:
+        key_counts = values.index.value_counts()
+        if policy == "error":
+            raise ValueError(f"{name}: {duplicate_keys} claves repetidas en la columna de cruce")
+        if policy == "sum":
+            numeric = values.select_dtypes("number").columns
+            agg = {col: ("sum" if col in numeric else "first") for col in values.columns}
+            values = values.groupby(level=0, sort=False).agg(agg)
+        else:
+            values = values[~values.index.duplicated(keep=policy)]
+    return values, duplicate_keys, key_counts
+
+
+def merge_rows(key_counts, codes, uniques):
+    """
+    Filas que habría producido un merge left con el lado derecho sin deduplicar
+
+    Sirve para medir el fan-out que evita la política de duplicados: sin claves
+    repetidas es igual a la cantidad de filas de la izquierda.
+    """
+    if key_counts is None:
+        return int(len(codes))
+    per_key = key_counts.reindex(uniques, fill_value=0).to_numpy()
+    return int(np.maximum(per_key, 1)[codes].sum())
+
+
+def take_aligned(lookup, codes, uniques):
+    """
+    Traer de `lookup` una fila por cada clave factorizada (codes, uniques)
+
+    Solo se buscan en el índice los valores distintos; las claves sin coincidencia
+    quedan como fila vacía, igual que en un merge left.
+
+    Returns:
+        (DataFrame con una fila por código, cantidad de filas con coincidencia)
+    """
+    indexer = lookup.index.get_indexer(uniques)[codes]
+    joined = lookup.reset_index(drop=True).reindex(indexer)
+    joined.index = pd.RangeIndex(len(codes))
+    return joined, int((indexer >= 0).sum())
+
+
+def build_lookup(spec):
+    """
+    Tabla de búsqueda del lado derecho: una fila por clave no vacía
+
+    Returns:
+        (DataFrame indexado por clave normalizada, estadísticas, filas por clave
+        repetida o None)
+    """
+    frame = spec.frame.iloc[spec.skip_rows:] if spec.skip_rows else spec.frame
+    keys = spec.key_func(frame.iloc[:, spec.right_key])
+
+    values = frame.iloc[:, spec.columns]
+    values.columns = spec.names
+    values.index = pd.Index(keys.to_numpy(), name="key")
+
+    values, duplicate_keys, key_counts = dedupe_lookup(values, spec.policy, spec.name)
+
+    stats = {
+        "right_rows": int(len(frame)),
+        "right_keys": int(len(values)),
+        "duplicate_keys": duplicate_keys,
+        "policy": spec.policy,
+    }
+    return values, stats, key_counts
+
+
+def multi_join(base, specs, record_as="join_stats"):
+    """
+    Cruzar la tabla base con cada spec y devolver base + columnas traídas
+
+    Las claves de la tabla base se normalizan una vez por columna aunque varios
+    cruces usen la misma. El resultado tiene exactamente las filas de `base`, en el
+    mismo orden. Las tasas de coincidencia, la cardinalidad de claves y el fan-out que
+    habría tenido un merge se registran en el run por cada cruce.
+    """
+    # Claves de la base factorizadas una vez por columna: códigos + valores únicos,
+    # así cada cruce solo busca en su índice los valores distintos
+    left_keys = {}
+    pieces = [base.reset_index(drop=True)]
+    report = []
+
+    for spec in specs:
+        start = time.perf_counter()
+        if spec.left_key not in left_keys:
+            keys = spec.key_func(base.iloc[:, spec.left_key])
+            left_keys[spec.left_key] = pd.factorize(keys.to_numpy())
+        codes, uniques = left_keys[spec.left_key]
+
+        lookup, stats, key_counts = build_lookup(spec)
+        joined, matched = take_aligned(lookup, codes, uniques)
+        total = len(codes)
+        fanout_rows = merge_rows(key_counts, codes, uniques)
+        stats.update({
+            "name": spec.name,
+            "left_rows": total,
+            "left_keys": int(len(uniques)),
+            "matched_rows": matched,
+            "match_rate": round(matched / total, 4) if total else 0.0,
+            "merge_rows": fanout_rows,
+            "fanout": round(fanout_rows / total, 4) if total else 0.0,
+            "seconds": round(time.perf_counter() - start, 4),
+        })
+        report.append(stats)
+        run_metadata.append(record_as, stats)
+        print(f"   🔗 {spec.name}: {matched}/{total} filas con coincidencia "
+              f"({stats['match_rate']:.1%}), {stats['duplicate_keys']} claves repetidas ({spec.policy})")
+
+        pieces.append(joined)
+
+    result = pd.concat(pieces, axis=1)
+    return result, report
@@ -0,0 +1,167 @@
+"""
+Carga de archivos de entrada para herramientas de vinculación.
+
+Las herramientas de vinculación leen varios archivos independientes (4 en
+cruce_ventas, 3 en vendedor_vinculado) y el parseo domina el tiempo total. Este
+módulo los lee en paralelo en un pool de procesos, aplicando las opciones de lectura
+que declara cada herramienta por posición (skiprows, header, sheet_name, usecols), y registra
+cuánto tardó cada uno en los metadatos de la ejecución.
+
+Cada entrada es una ruta o, en la cola, una tupla (nombre, bytes) con el archivo ya en
+memoria (processing/memory_io.py).
+
+Dentro de un worker del pool de procesamiento (los trabajos de la cola) se lee siempre
+en secuencia: un pool anidado multiplicaría los procesos residentes, leería fuera del
+proceso al que processing/limits.py le pone el límite de memoria, y una cancelación o
+un timeout no detendrían a sus workers.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from processing import memory_io, run_metadata
+from processing.csv_io import read_csv_bytes, read_csv_file
+from processing.executor import CPUS_PER_WORKER
+
+LOADER_WORKERS = int(os.getenv("LINKING_LOADER_WORKERS", str(min(4, CPUS_PER_WORKER))))
+LOADER_START_METHOD = os.getenv("PROCESSING_START_METHOD", "spawn")
+# Con entradas chicas el costo de pasar DataFrames entre procesos supera al del parseo
+PARALLEL_MIN_BYTES = int(os.getenv("LINKING_PARALLEL_MIN_BYTES", str(1024 * 1024)))
+
+# Opciones aceptadas por entrada y sus valores por defecto
+DEFAULT_OPTIONS = {"header": None, "skiprows": None, "sheet_name": 0, "usecols": None}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context(LOADER_START_METHOD)
+            _pool = ProcessPoolExecutor(max_workers=LOADER_WORKERS, mp_context=context)
+        return _pool
+
+
+def shutdown_pool(wait=True):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+
+
+def in_pool_worker():
+    """Si este proceso es un worker de un pool (tiene un proceso padre de multiprocessing)"""
+    return multiprocessing.parent_process() is not None
+
+
+def source_size(source):
+    """Bytes de una entrada (ruta o (nombre, bytes)); None si la ruta no existe"""
+    if isinstance(source, tuple):
+        return len(source[1])
+    return os.path.getsize(source) if os.path.exists(source) else None
+
+
+def read_input(source, options=None):
+    """Leer un archivo de entrada (CSV o Excel) con las opciones de la herramienta"""
+    opts = dict(DEFAULT_OPTIONS)
+    opts.update(options or {})
+
+    read_kwargs = {"header": opts["header"]}
+    if opts["skiprows"]:
+        read_kwargs["skiprows"] = opts["skiprows"]
+
+    # usecols: posiciones de columna a conservar (las que no existan se ignoran). Las
+    # columnas conservan su posición original como etiqueta
+    usecols = set(opts["usecols"]) if opts["usecols"] is not None else None
+
+    in_memory = isinstance(source, tuple)
+    filename = source[0] if in_memory else source
+    if memory_io.extension(filename) == ".csv":
+        # pandas no admite usecols invocable en CSV sin encabezado: se filtra después
+        if in_memory:
+            df = read_csv_bytes(source[1], filename, **read_kwargs)
+        else:
+            df = read_csv_file(source, **read_kwargs)
+        if usecols is not None:
+            df = df[[col for col in df.columns if col in usecols]]
+        return df
+    if usecols is not None:
+        read_kwargs["usecols"] = lambda col: col in usecols
+    excel = memory_io.buffer(source[1]) if in_memory else source
+    return pd.read_excel(excel, sheet_name=opts["sheet_name"], **read_kwargs)
+
+
+def _load_in_worker(source, options):
+    """Leer una entrada dentro del worker, devolviendo tiempo y metadatos del run"""
+    start = time.perf_counter()
+    with run_metadata.run_context() as run:
+        df = read_input(source, options)
+    return df, time.perf_counter() - start, run.to_dict()
+
+
+def load_inputs(paths, input_options=None, parallel=None):
+    """
+    Leer todas las entradas y devolver sus DataFrames en el mismo orden
+
+    Args:
+        paths: entradas, rutas o tuplas (nombre, bytes)
+        input_options: lista (por posición) de dicts con opciones de lectura
+        parallel: forzar o evitar el pool; por defecto se usa con 2+ entradas que
+            sumen al menos LINKING_PARALLEL_MIN_BYTES. Nunca dentro de un worker del
+            pool de procesamiento (ver el docstring del módulo)
+
+    Registra en el run actual `input_loads`: bytes, filas, columnas y segundos por entrada.
+    """
+    input_options = list(input_options or [])
+    options = [input_options[i] if i < len(input_options) else {} for i in range(len(paths))]
+    if in_pool_worker():
+        parallel = False
+    elif parallel is None:
+        total_bytes = sum(source_size(path) or 0 for path in paths)
+        parallel = len(paths) > 1 and LOADER_WORKERS > 1 and total_bytes >= PARALLEL_MIN_BYTES
+
+    start = time.perf_counter()
+    if parallel:
+        futures = [get_pool().submit(_load_in_worker, path, opts) for path, opts in zip(paths, options)]
+        results = []
+        for i, future in enumerate(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                raise Exception(f"Error leyendo archivo {i+1}: {str(e)}")
+    else:
+        results = []
+        for i, (path, opts) in enumerate(zip(paths, options)):
+            try:
+                results.append(_load_in_worker(path, opts))
+            except Exception as e:
+                raise Exception(f"Error leyendo archivo {i+1}: {str(e)}")
+    total = time.perf_counter() - start
+
+    dataframes = []
+    for i, (path, (df, seconds, worker_data)) in enumerate(zip(paths, results)):
+        load_info = {
+            "index": i,
+            "bytes": source_size(path),
+            "rows": int(df.shape[0]),
+            "columns": int(df.shape[1]),
+            "load_seconds": round(seconds, 4),
+        }
+        dialects = worker_data.get("csv_dialects")
+        if dialects:
+            load_info["csv_dialect"] = dialects[0]
+        run_metadata.append("input_loads", load_info)
+        print(f"   ✅ Archivo {i+1} leído: {df.shape[0]} filas, {df.shape[1]} columnas ({seconds:.2f}s)")
+        dataframes.append(df)
+
+    mode = "paralelo" if parallel else "secuencial"
+    print(f"📖 {len(paths)} archivos leídos en {total:.2f}s ({mode})")
+    run_metadata.record("input_load_seconds", round(total, 4))
+    return dataframes
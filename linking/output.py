@@ -0,0 +1,49 @@
+"""
+Escritura de resultados de herramientas de vinculación.
+
+Los resultados llevan una fila de títulos propios arriba de los datos. En lugar de
+convertir el DataFrame a lista de listas para anteponer los títulos (lo que crea un
+objeto Python por celda y pierde los tipos), los datos se escriben directamente desde
+el DataFrame a partir de la fila 2 y los títulos se escriben en la fila 1.
+"""
+import time
+
+import pandas as pd
+
+from processing import run_metadata
+
+SHEET_NAME = "Sheet1"
+
+
+def fit_titles(titles, num_columns, filler="Columna_{}"):
+    """Ajustar la lista de títulos al número de columnas (completa o trunca)"""
+    titles = list(titles)
+    if len(titles) < num_columns:
+        return titles + [filler.format(i) for i in range(len(titles), num_columns)]
+    return titles[:num_columns]
+
+
+def write_with_titles(df, titles, output_path, sheet_name=SHEET_NAME):
+    """
+    Escribir `df` en `output_path` (ruta o buffer) con `titles` como primera fila
+
+    La fila de títulos se escribe como texto plano (sin el estilo de encabezado de
+    pandas), igual que cuando los títulos iban como primera fila de datos. Registra en
+    el run las dimensiones de la salida y el tiempo de escritura.
+    """
+    if len(titles) != df.shape[1]:
+        raise ValueError(f"Se esperaban {df.shape[1]} títulos, se recibieron {len(titles)}")
+
+    start = time.perf_counter()
+    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+        df.to_excel(writer, sheet_name=sheet_name, index=False, header=False, startrow=1)
+        worksheet = writer.sheets[sheet_name]
+        for col, title in enumerate(titles, start=1):
+            worksheet.cell(row=1, column=col, value=title)
+
+    run_metadata.record("output", {
+        "rows": int(df.shape[0]),
+        "columns": int(df.shape[1]),
+        "write_seconds": round(time.perf_counter() - start, 4),
+    })
+    return output_path
@@ -0,0 +1,410 @@
+"""
+Herramientas de vinculación declarativas.
+
+En lugar de escribir un módulo Python por herramienta (leer archivos, seleccionar
+columnas, cruzar, renombrar y escribir), una herramienta puede declarar su pipeline en
+`Tool.file_config["pipeline"]`:
+
+    {
+        "inputs": [{"skiprows": 1}, {}, {}],
+        "base": {"input": 0},
+        "joins": [
+            {"name": "archivo2", "input": 1, "left_key": "K", "right_key": "A",
+             "columns": "C:G", "policy": "first"},
+            {"name": "archivo3", "input": 2, "left_key": "B", "right_key": "H",
+             "columns": "A:G", "match": "first_word", "normalize": true}
+        ],
+        "output": {"filename": "Cruce", "titles": ["Cliente", "..."]}
+    }
+
+Inputs: una entrada por archivo, con `skiprows` y `sheet_name` opcionales.
+Base: archivo base (`input`) y columnas a conservar (`columns`, todas si se omite).
+Joins (siempre left, una fila de salida por fila de la base):
+    input, left_key (columna de la base), right_key, columns: columnas por letra
+        ("C", "C:G" o una lista)
+    names: nombres de las columnas traídas (por defecto "<name>_<letra>")
+    policy: claves repetidas, como en `linking.joins` (first/last/sum/error)
+    skip_rows: filas iniciales del archivo a ignorar
+    match: "exact" (clave normalizada) o "first_word" (primera palabra, ver
+        `linking.token_index`), con `normalize` para ignorar acentos y puntuación
+    optional: si el archivo no tiene las columnas o filas necesarias se omite el
+        cruce en lugar de fallar
+Output: `filename` (prefijo del archivo), `titles` y `filler` para completarlos.
+
+`compile_pipeline` valida la especificación y la convierte en un plan: qué columnas
+leer de cada archivo (el resto no se parsea), qué cruces comparten la clave de la base
+y en qué orden se arma la salida. El plan se ejecuta con los lookups indexados de
+`linking.joins` y `linking.token_index`.
+"""
+import io
+import os
+import re
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from linking.joins import DEDUPE_POLICIES, JoinSpec, multi_join
+from linking.loader import load_inputs
+from linking.output import fit_titles, write_with_titles
+from linking.token_index import TokenIndex
+from processing import run_metadata
+
+PIPELINE_KEY = "pipeline"
+MATCH_MODES = ("exact", "first_word")
+INPUT_OPTIONS = ("skiprows", "sheet_name")
+
+_COLUMN_LETTERS = re.compile(r"^[A-Z]{1,3}$")
+
+
+class PipelineError(ValueError):
+    """Especificación de pipeline inválida"""
+
+
+def column_index(ref):
+    """Posición (desde 0) de una columna dada por letra ("A", "AB") o número"""
+    if isinstance(ref, bool):
+        raise PipelineError(f"Columna inválida: {ref!r}")
+    if isinstance(ref, int):
+        if ref < 0:
+            raise PipelineError(f"Columna inválida: {ref!r}")
+        return ref
+    text = str(ref).strip().upper()
+    if not _COLUMN_LETTERS.match(text):
+        raise PipelineError(f"Columna inválida: {ref!r}")
+    index = 0
+    for char in text:
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+
+def column_letter(index):
+    """Letra de Excel para una posición (0 -> "A", 27 -> "AB")"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def column_list(ref):
+    """Posiciones de columnas dadas como "C", "C:G" o lista de referencias"""
+    if isinstance(ref, (list, tuple)):
+        return [column_index(item) for item in ref]
+    if isinstance(ref, str) and ":" in ref:
+        start, end = (column_index(part) for part in ref.split(":", 1))
+        if end < start:
+            raise PipelineError(f"Rango de columnas inválido: {ref!r}")
+        return list(range(start, end + 1))
+    return [column_index(ref)]
+
+
+class PipelineJoin:
+    """Un cruce compilado: posiciones ya resueltas y nombres de salida definitivos"""
+
+    def __init__(self, name, input, left_key, right_key, columns, names,
+                 policy, skip_rows, match, normalize, optional):
+        self.name = name
+        self.input = input
+        self.left_key = left_key
+        self.right_key = right_key
+        self.columns = columns
+        self.names = names
+        self.policy = policy
+        self.skip_rows = skip_rows
+        self.match = match
+        self.normalize = normalize
+        self.optional = optional
+
+    def needed_columns(self):
+        return sorted({self.right_key, *self.columns})
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "input": self.input,
+            "left_key": column_letter(self.left_key),
+            "right_key": column_letter(self.right_key),
+            "columns": [column_letter(col) for col in self.columns],
+            "policy": self.policy,
+            "match": self.match,
+            "normalize": self.normalize,
+            "optional": self.optional,
+        }
+
+
+class Pipeline:
+    """Plan compilado de una herramienta declarativa (ver `compile_pipeline`)"""
+
+    def __init__(self, input_options, base_input, base_columns, joins, output):
+        self.input_options = input_options
+        self.base_input = base_input
+        self.base_columns = base_columns
+        self.joins = joins
+        self.output = output
+
+    @property
+    def total_files(self):
+        return len(self.input_options)
+
+    def describe(self):
+        """Plan en forma de dict (columnas leídas por archivo, cruces y salida)"""
+        return {
+            "inputs": [
+                {"index": i, "usecols": ([column_letter(col) for col in opts["usecols"]]
+                                         if "usecols" in opts else "todas")}
+                for i, opts in enumerate(self.input_options)
+            ],
+            "base": {
+                "input": self.base_input,
+                "columns": ([column_letter(col) for col in self.base_columns]
+                            if self.base_columns is not None else "todas"),
+            },
+            "joins": [join.describe() for join in self.joins],
+            "output": {"filename": self.output["filename"], "titles": len(self.output["titles"])},
+        }
+
+    def _frame_columns(self, frame, positions):
+        """Posiciones en `frame` de las columnas originales `positions` (o None si falta alguna)"""
+        try:
+            return [frame.columns.get_loc(pos) for pos in positions]
+        except KeyError:
+            return None
+
+    def run(self, input_files, output_dir=None):
+        """
+        Ejecutar el pipeline sobre los archivos y devolver la ruta del xlsx generado
+
+        Misma convención que `process_files` de los módulos de vinculación. Sin
+        `output_dir` la salida va al directorio temporal.
+        """
+        resultado, titulos = self._link(input_files)
+        output_dir = output_dir or tempfile.gettempdir()
+        output_path = os.path.join(output_dir, self.output_filename())
+        os.makedirs(output_dir, exist_ok=True)
+
+        print(f"💾 Guardando archivo en: {output_path}")
+        write_with_titles(resultado, titulos, output_path)
+        return output_path
+
+    def run_buffers(self, inputs):
+        """
+        Ejecutar el pipeline en memoria: misma convención que `process_buffers`
+
+        Args:
+            inputs: lista de (nombre, bytes) de las entradas
+
+        Returns:
+            Tupla (bytes del xlsx, nombre de la salida).
+        """
+        resultado, titulos = self._link(inputs)
+        output = io.BytesIO()
+        write_with_titles(resultado, titulos, output)
+        return output.getvalue(), self.output_filename()
+
+    def output_filename(self):
+        return f"{self.output['filename']}_{datetime.now().strftime('%d_%m_%Y_%H%M%S')}.xlsx"
+
+    def _link(self, input_files):
+        """Leer las entradas y cruzarlas; devuelve (DataFrame de salida, títulos)"""
+        if len(input_files) != self.total_files:
+            raise Exception(f"Se requieren exactamente {self.total_files} archivos, se recibieron {len(input_files)}")
+
+        print(f"🔗 Ejecutando pipeline de vinculación con {len(input_files)} archivos...")
+        run_metadata.record("pipeline_plan", self.describe())
+        dataframes = load_inputs(input_files, self.input_options)
+        base = dataframes[self.base_input]
+
+        # Columnas de la base usadas como clave de algún cruce
+        left_positions = {}
+        for join in self.joins:
+            if join.left_key not in left_positions:
+                found = self._frame_columns(base, [join.left_key])
+                if found is None:
+                    raise Exception(f"El archivo {self.base_input + 1} no tiene la columna "
+                                    f"{column_letter(join.left_key)} (clave de {join.name})")
+                left_positions[join.left_key] = found[0]
+
+        exact_specs = []
+        token_joins = []
+        output_names = []
+        for join in self.joins:
+            frame = dataframes[join.input]
+            right_key = self._frame_columns(frame, [join.right_key])
+            columns = self._frame_columns(frame, join.columns)
+            if right_key is None or columns is None or frame.shape[0] <= join.skip_rows:
+                if join.optional:
+                    print(f"   ❌ {join.name}: no tiene suficientes columnas o filas, se omite")
+                    continue
+                raise Exception(f"El archivo {join.input + 1} ({join.name}) no tiene las columnas o filas necesarias")
+
+            if join.match == "first_word":
+                token_joins.append((join, frame, right_key[0], columns))
+            else:
+                exact_specs.append(JoinSpec(
+                    join.name, frame, left_key=left_positions[join.left_key], right_key=right_key[0],
+                    columns=columns, names=join.names, policy=join.policy, skip_rows=join.skip_rows
+                ))
+            output_names.extend(join.names)
+
+        # Cruces exactos en una sola pasada (claves de la base factorizadas una vez por columna)
+        print(f"📋 Cruzando archivo base con {len(exact_specs) + len(token_joins)} archivos")
+        resultado, _ = multi_join(base, exact_specs)
+
+        pieces = [resultado]
+        for join, frame, right_key, columns in token_joins:
+            frame = frame.iloc[join.skip_rows:] if join.skip_rows else frame
+            values = frame.iloc[:, columns]
+            values.columns = join.names
+            index = TokenIndex(values, frame.iloc[:, right_key], policy=join.policy,
+                               normalize=join.normalize, name=join.name)
+            pieces.append(index.lookup(base.iloc[:, left_positions[join.left_key]]))
+        if len(pieces) > 1:
+            resultado = pd.concat(pieces, axis=1)
+
+        # Salida: columnas elegidas de la base + columnas traídas, en el orden declarado
+        if self.base_columns is not None:
+            base_positions = self._frame_columns(base, self.base_columns)
+            if base_positions is None:
+                raise Exception(f"El archivo {self.base_input + 1} no tiene todas las columnas de la base")
+        else:
+            base_positions = list(range(base.shape[1]))
+        resultado = pd.concat(
+            [resultado.iloc[:, base_positions], resultado.loc[:, output_names]], axis=1
+        )
+        print(f"   ✅ Datos cruzados listos: {resultado.shape[0]} filas, {resultado.shape[1]} columnas")
+
+        titulos = fit_titles(self.output["titles"], resultado.shape[1], filler=self.output["filler"])
+        return resultado, titulos
+
+
+def _compile_join(raw, index, total_files, base_input):
+    if not isinstance(raw, dict):
+        raise PipelineError(f"El cruce {index + 1} debe ser un objeto")
+    name = str(raw.get("name") or f"cruce{index + 1}")
+
+    input_index = raw.get("input")
+    if not isinstance(input_index, int) or isinstance(input_index, bool) or not 0 <= input_index < total_files:
+        raise PipelineError(f"{name}: 'input' debe ser un archivo entre 0 y {total_files - 1}")
+    if input_index == base_input:
+        raise PipelineError(f"{name}: no se puede cruzar el archivo base consigo mismo")
+
+    for field in ("left_key", "right_key", "columns"):
+        if raw.get(field) in (None, "", []):
+            raise PipelineError(f"{name}: falta '{field}'")
+    columns = column_list(raw["columns"])
+
+    names = raw.get("names")
+    if names is None:
+        names = [f"{name}_{column_letter(col)}" for col in columns]
+    if len(names) != len(columns):
+        raise PipelineError(f"{name}: se esperaban {len(columns)} nombres de columna")
+
+    policy = raw.get("policy", "first")
+    if policy not in DEDUPE_POLICIES:
+        raise PipelineError(f"{name}: política de duplicados inválida: {policy}")
+    match = raw.get("match", "exact")
+    if match not in MATCH_MODES:
+        raise PipelineError(f"{name}: tipo de coincidencia inválido: {match}")
+    skip_rows = raw.get("skip_rows", 0)
+    if not isinstance(skip_rows, int) or skip_rows < 0:
+        raise PipelineError(f"{name}: 'skip_rows' debe ser un entero >= 0")
+
+    return PipelineJoin(
+        name=name,
+        input=input_index,
+        left_key=column_index(raw["left_key"]),
+        right_key=column_index(raw["right_key"]),
+        columns=columns,
+        names=[str(n) for n in names],
+        policy=policy,
+        skip_rows=skip_rows,
+        match=match,
+        normalize=bool(raw.get("normalize", False)),
+        optional=bool(raw.get("optional", False)),
+    )
+
+
+def compile_pipeline(spec):
+    """
+    Validar una especificación de pipeline y compilarla en un `Pipeline`
+
+    Raises:
+        PipelineError: si la especificación es inválida
+    """
+    if not isinstance(spec, dict):
+        raise PipelineError("El pipeline debe ser un objeto JSON")
+
+    inputs = spec.get("inputs")
+    if not isinstance(inputs, list) or not inputs:
+        raise PipelineError("'inputs' debe ser una lista con una entrada por archivo")
+    total_files = len(inputs)
+
+    input_options = []
+    for i, raw in enumerate(inputs):
+        raw = raw or {}
+        if not isinstance(raw, dict):
+            raise PipelineError(f"La entrada {i + 1} debe ser un objeto")
+        unknown = set(raw) - set(INPUT_OPTIONS)
+        if unknown:
+            raise PipelineError(f"Entrada {i + 1}: opciones no soportadas: {', '.join(sorted(unknown))}")
+        input_options.append({key: raw[key] for key in INPUT_OPTIONS if raw.get(key) is not None})
+
+    base = spec.get("base") or {}
+    base_input = base.get("input", 0)
+    if not isinstance(base_input, int) or isinstance(base_input, bool) or not 0 <= base_input < total_files:
+        raise PipelineError(f"'base.input' debe ser un archivo entre 0 y {total_files - 1}")
+    base_columns = column_list(base["columns"]) if base.get("columns") else None
+
+    raw_joins = spec.get("joins") or []
+    if not isinstance(raw_joins, list):
+        raise PipelineError("'joins' debe ser una lista")
+    joins = [_compile_join(raw, i, total_files, base_input) for i, raw in enumerate(raw_joins)]
+
+    output_names = [name for join in joins for name in join.names]
+    duplicated = sorted({name for name in output_names if output_names.count(name) > 1})
+    if duplicated:
+        raise PipelineError(f"Nombres de columna repetidos: {', '.join(duplicated)}")
+
+    # Columnas a leer por archivo: solo las que usa algún cruce (la base completa si
+    # no declara columnas). Los archivos que no usa ningún paso no se parsean de más.
+    needed = {i: set() for i in range(total_files)}
+    for join in joins:
+        needed[join.input].update(join.needed_columns())
+        needed[base_input].add(join.left_key)
+    if base_columns is not None:
+        needed[base_input].update(base_columns)
+    for i, opts in enumerate(input_options):
+        if i == base_input and base_columns is None:
+            continue
+        opts["usecols"] = sorted(needed[i])
+
+    output = spec.get("output") or {}
+    titles = output.get("titles") or []
+    if not isinstance(titles, list):
+        raise PipelineError("'output.titles' debe ser una lista")
+    filler = str(output.get("filler") or "Columna_{}")
+    try:
+        filler.format(0)
+    except (IndexError, KeyError, ValueError):
+        raise PipelineError("'output.filler' debe tener un único '{}'")
+
+    return Pipeline(
+        input_options=input_options,
+        base_input=base_input,
+        base_columns=base_columns,
+        joins=joins,
+        output={
+            "filename": str(output.get("filename") or "Vinculacion"),
+            "titles": [str(title) for title in titles],
+            "filler": filler,
+        },
+    )
+
+
+def get_pipeline_spec(file_config):
+    """Especificación de pipeline guardada en `Tool.file_config`, si la hay"""
+    if isinstance(file_config, dict):
+        return file_config.get(PIPELINE_KEY)
+    return None
@@ -0,0 +1,86 @@
+"""
+Perfil de ejecución de herramientas de vinculación.
+
+Cuando un cruce tarda o multiplica filas no había forma de ver por qué. Con lo que el
+loader, los cruces y la escritura registran en el run (`input_loads`, `join_stats`,
+`output`, `pipeline_plan`) este módulo arma un resumen por ejecución: filas y bytes por
+entrada, cardinalidad de claves y fan-out por cruce, tiempo por paso y memoria pico.
+El resumen se guarda con el `ProcessedFile` en `input_files_info` y se ve en el panel
+de administración.
+"""
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Umbrales para marcar entradas problemáticas en el perfil
+LOW_MATCH_RATE = 0.5
+HIGH_FANOUT = 1.5
+
+
+def peak_rss_mb():
+    """Memoria pico (RSS) del proceso en MB, o None si no se puede medir"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB, macOS bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _warnings(joins):
+    warnings = []
+    for join in joins:
+        name = join.get("name", "")
+        if join.get("left_rows") and join.get("match_rate", 1) < LOW_MATCH_RATE:
+            warnings.append(f"{name}: solo {join['match_rate']:.0%} de las filas encontró coincidencia")
+        if join.get("fanout", 1) > HIGH_FANOUT:
+            warnings.append(f"{name}: claves repetidas, un merge habría generado "
+                            f"{join['merge_rows']} filas ({join['fanout']:.1f}x)")
+        if join.get("left_rows") and join.get("left_keys") == 1:
+            warnings.append(f"{name}: todas las filas tienen la misma clave")
+    return warnings
+
+
+def build_profile(run_data, elapsed, peak_before=None):
+    """
+    Perfil de una ejecución a partir de lo registrado en el run
+
+    Args:
+        run_data: `RunMetadata.data` de la ejecución
+        elapsed: segundos totales de la herramienta
+        peak_before: `peak_rss_mb()` antes de ejecutar
+    """
+    joins = run_data.get("join_stats", [])
+    output = run_data.get("output", {})
+
+    steps = []
+    load_seconds = run_data.get("input_load_seconds")
+    if load_seconds is not None:
+        steps.append({"step": "lectura de entradas", "seconds": load_seconds})
+    for join in joins:
+        steps.append({"step": f"cruce {join.get('name', '')}", "seconds": join.get("seconds", 0)})
+    if "write_seconds" in output:
+        steps.append({"step": "escritura", "seconds": output["write_seconds"]})
+    accounted = sum(step["seconds"] for step in steps)
+    steps.append({"step": "otros", "seconds": round(max(elapsed - accounted, 0), 4)})
+
+    peak_after = peak_rss_mb()
+    memory = {"peak_rss_mb": peak_after}
+    if peak_before is not None and peak_after is not None:
+        # ru_maxrss es el pico de toda la vida del proceso: si creció, lo fijó esta ejecución
+        memory["peak_growth_mb"] = round(peak_after - peak_before, 1)
+
+    profile = {
+        "total_seconds": round(elapsed, 4),
+        "steps": steps,
+        "joins": joins,
+        "output": output,
+        "memory": memory,
+        "warnings": _warnings(joins),
+    }
+    if "pipeline_plan" in run_data:
+        profile["pipeline"] = run_data["pipeline_plan"]
+    return profile
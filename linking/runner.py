@@ -0,0 +1,106 @@
+"""
+Ejecución de una herramienta de vinculación dentro de un worker.
+
+Lo que antes hacía el handler de `/process-linking` en el event loop (pipeline
+declarativo o módulo con `process_files`, perfil de la ejecución, lectura de la
+salida) corre acá, en el pool de procesamiento, como trabajo de la cola.
+
+Las entradas llegan en memoria: los pipelines y los módulos con `process_buffers` no
+tocan el disco; los módulos que solo exponen `process_files` reciben las entradas
+escritas en el directorio del trabajo (processing/memory_io.py).
+"""
+import importlib.util
+import os
+import time
+
+from linking import pipeline as linking_pipeline
+from linking import profile as linking_profile
+from processing import memory_io
+from processing.run_metadata import run_context
+
+
+class LinkingToolError(ValueError):
+    """La herramienta no se puede ejecutar (pipeline inválido, módulo o función faltante)"""
+
+
+def read_output_file(output_path):
+    """Leer y borrar la salida de un `process_files`; devuelve (bytes, nombre)"""
+    with open(output_path, "rb") as f:
+        data = f.read()
+    try:
+        os.unlink(output_path)
+    except OSError:
+        pass
+    return data, os.path.basename(output_path)
+
+
+def run_linking_job(payload, files):
+    """
+    Ejecutar la herramienta sobre los archivos de entrada
+
+    Args:
+        payload: datos del trabajo (`tool_filename`, `company_id`, `company_folder`,
+            `file_config`, `input_files_info`)
+        files: lista de (nombre, bytes) de las entradas, en orden
+
+    Returns:
+        dict con `data` (bytes del xlsx), `output_name`, `input_files_info`
+        (entradas y plan de la ejecución) e `io` ("memory" o "disk").
+    """
+    input_files_info = [dict(info) for info in payload.get("input_files_info", [])]
+    tool_filename = payload["tool_filename"]
+    company_id = payload["company_id"]
+
+    pipeline_spec = linking_pipeline.get_pipeline_spec(payload.get("file_config"))
+    started = time.perf_counter()
+    peak_before = linking_profile.peak_rss_mb()
+    if pipeline_spec:
+        # Herramienta declarativa: se ejecuta el pipeline guardado en file_config
+        try:
+            pipeline = linking_pipeline.compile_pipeline(pipeline_spec)
+        except linking_pipeline.PipelineError as e:
+            raise LinkingToolError(f"Pipeline de la herramienta inválido: {str(e)}")
+        with run_context(tool=tool_filename, company=company_id) as run:
+            data, output_name = pipeline.run_buffers(files)
+        io = "memory"
+    else:
+        tool_module_path = os.path.join(payload["company_folder"], tool_filename)
+        if not os.path.exists(tool_module_path):
+            raise LinkingToolError("Archivo de herramienta no encontrado")
+
+        # Import the tool module dynamically
+        spec = importlib.util.spec_from_file_location("linking_tool", tool_module_path)
+        tool_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(tool_module)
+
+        if hasattr(tool_module, memory_io.PROCESS_BUFFERS):
+            with run_context(tool=tool_filename, company=company_id) as run:
+                data, output_name = tool_module.process_buffers(files)
+            io = "memory"
+        elif hasattr(tool_module, "process_files"):
+            input_paths = memory_io.write_inputs(files)
+            with run_context(tool=tool_filename, company=company_id) as run:
+                output_path = tool_module.process_files(input_paths)
+            data, output_name = read_output_file(output_path)
+            io = "disk"
+        else:
+            raise LinkingToolError("Función process_files no encontrada en la herramienta")
+
+    # Tiempos de carga por entrada reportados por el loader compartido
+    for load_info in run.data.get("input_loads", []):
+        index = load_info["index"]
+        if index < len(input_files_info):
+            input_files_info[index].update({k: v for k, v in load_info.items() if k != "index"})
+
+    # Plan y perfil de la ejecución (cruces, fan-out, tiempos, memoria)
+    profile = linking_profile.build_profile(run.data, time.perf_counter() - started, peak_before)
+    for warning in profile["warnings"]:
+        print(f"⚠️ {warning}")
+
+    return {
+        "data": data,
+        "output_name": output_name,
+        "input_files_info": {"inputs": input_files_info, "plan": profile},
+        "io": io,
+        "elapsed": time.perf_counter() - started,
+    }
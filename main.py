@@ -1,13 +1,24 @@
 from fastapi import FastAPI, Request, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, Response, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
-from sqlalchemy.orm import Session
-from database import get_db, init_db, check_db_health, engine
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from database import get_async_db, init_db_async, mark_db_ready, engine, async_engine
 from models import User, Company, Tool, ProcessedFile
+from processing import executor, jobs, job_worker, memory_io, prewarm, scratch
+from processing.job_worker import processed_name
+from user_context import get_user_context
+import admission
+import catalog
+import guides
+import health
+import metrics
 import os
-import tempfile
+import asyncio
+import time
 import importlib.util
 import sys
 from datetime import datetime
@@ -112,28 +123,86 @@ def get_process_utilidades():
 from contextlib import asynccontextmanager
 import uvicorn
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup
-    print("🚀 Starting EGO Project...")
+def registered_processors():
+    """
+    (módulo, funciones) de cada procesador registrado, para la precarga: la versión en
+    memoria si el módulo la expone (es la que llama el executor), si no la de rutas
+    """
+    if not MODULE_PREFIX_A:
+        return []
+    processors = [(f"{MODULE_PREFIX_A}.{module}", (memory_io.PROCESS_BYTES, "process_file"))
+                  for module in sorted(set(PROCESSOR_MODULES.values()))]
+    processors += [(f"{MODULE_PREFIX_A}.{module}", (memory_io.PROCESS_BUFFERS, "process_files"))
+                   for module in LINKING_MODULES]
+    return processors
+
+async def run_prewarm():
+    """Importar y validar los procesadores (y precalentar el pool) sin bloquear el event loop"""
+    processors = registered_processors()
+    if not processors:
+        print("⚠️ Prewarm skipped: MODULE_PREFIX_A not set")
+        return
+    loop = asyncio.get_running_loop()
+    report = await loop.run_in_executor(None, prewarm.prewarm_processors, processors)
+    if prewarm.PREWARM_POOL:
+        try:
+            module_paths = [module for module, _ in processors]
+            report["pool"] = await loop.run_in_executor(None, executor.prewarm_pool, module_paths)
+        except Exception as e:
+            report["pool"] = {"error": str(e)}
+    prewarm.set_report(report)
+    prewarm.print_report(report)
+    if report["status"] != "ok" and prewarm.PREWARM_STRICT:
+        raise prewarm.PrewarmError(f"{report['errors']} procesadores no se pudieron cargar")
 
-    # Initialize database with retries
+# (evento de parada, tareas) de los workers de la cola de este proceso
+job_workers = None
+
+async def run_startup():
+    """DB, datos iniciales, workers de la cola y precarga; corre después de que el servidor ya escucha"""
+    global job_workers
+    start = time.perf_counter()
+    health.startup_state["started_at"] = datetime.utcnow().isoformat()
     try:
         print("🔄 Initializing database...")
-        if init_db():
+        if await init_db_async():
             print("✅ Database initialized successfully")
             try:
                 await create_initial_data()
                 print("✅ Initial data created successfully")
             except Exception as e:
                 print(f"⚠️ Initial data creation failed: {str(e)}, but continuing...")
-            print("✅ Application started successfully")
         else:
             print("⚠️ Database initialization failed, but continuing in degraded mode...")
             print("⚠️ Some features may not work properly")
     except Exception as e:
         print(f"⚠️ Startup error: {str(e)}")
         print("⚠️ Application starting in degraded mode...")
+    finally:
+        # También en modo degradado: los handlers fallan rápido en vez de esperar
+        mark_db_ready()
+
+    # Workers de la cola (JOB_WORKERS=0 si los trabajos los ejecutan procesos aparte)
+    if job_worker.JOB_WORKERS > 0:
+        job_workers = job_worker.start_workers(job_worker.JOB_WORKERS)
+
+    # Precargar procesadores (con PREWARM_STRICT se hace antes de escuchar, ver lifespan)
+    if prewarm.PREWARM_PROCESSORS and not prewarm.PREWARM_STRICT:
+        try:
+            await run_prewarm()
+        except Exception as e:
+            print(f"⚠️ Prewarm error: {str(e)}")
+
+    health.startup_state["status"] = "ready"
+    health.startup_state["seconds"] = round(time.perf_counter() - start, 3)
+    print(f"✅ Application started successfully ({health.startup_state['seconds']:.2f}s)")
+    # /ready refleja el fin del arranque sin esperar al próximo refresco
+    await health.refresh()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup
+    print("🚀 Starting EGO Project...")
 
     # Ensure required directories exist
     try:
@@ -143,13 +212,39 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ Directory creation error: {str(e)}")
 
+    # Con PREWARM_STRICT un procesador roto debe impedir el deploy, así que se
+    # precarga antes de aceptar conexiones
+    if prewarm.PREWARM_PROCESSORS and prewarm.PREWARM_STRICT:
+        await run_prewarm()
+
+    # El resto del arranque (DB con reintentos, precarga) no retiene el bind del puerto;
+    # los requests que usan la DB esperan a que termine (DB_READY_TIMEOUT)
+    startup_task = asyncio.create_task(run_startup())
+    # Chequeos de readiness en segundo plano (ver health.py)
+    readiness_task = asyncio.create_task(health.refresh_loop())
+    # Limpieza de temporales huérfanos (ver processing/scratch.py)
+    sweeper_task = asyncio.create_task(scratch.sweep_loop())
+
     yield
 
     # Shutdown
     print("🛑 Shutting down EGO Project...")
+    readiness_task.cancel()
+    sweeper_task.cancel()
+    if not startup_task.done():
+        startup_task.cancel()
+    if job_workers is not None:
+        # Los trabajos que no terminen a tiempo vuelven a la cola al vencer su visibilidad
+        await job_worker.stop_workers(*job_workers)
     try:
         # Close database connections
+        await async_engine.dispose()
         engine.dispose()
+        executor.shutdown_pool(wait=False)
+        # El loader de vinculación se importa con el primer cruce
+        linking_loader = sys.modules.get("linking.loader")
+        if linking_loader is not None:
+            linking_loader.shutdown_pool(wait=False)
         print("✅ Database connections closed")
     except Exception as e:
         print(f"⚠️ Shutdown error: {str(e)}")
@@ -170,14 +265,8 @@ app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
 app.include_router(sso_router, prefix="/sso", tags=["Authentication"])
 app.include_router(admin_router, prefix="/admin", tags=["Administration"])
 
-# Create necessary directories
-os.makedirs("uploads", exist_ok=True)
-os.makedirs("downloads", exist_ok=True)
-os.makedirs("static", exist_ok=True)
-os.makedirs("templates", exist_ok=True)
-
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static files (the directory is created at startup, not at import)
+app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="templates")
@@ -195,14 +284,44 @@ PROCESSORS = {
     "utilidades": lambda: get_process_utilidades()
 }
 
+# Módulo (dentro de MODULE_PREFIX_A) de cada procesador, para importarlo en los workers
+PROCESSOR_MODULES = {
+    "balance-proyectado": "balance_proyectado",
+    "facturacion": "facturacion",
+    "inventario": "inventario",
+    "ventas": "ventas",
+    "ventas-csv": "ventas-csv",
+    "lista-precios": "lista_precios",
+    "vendedores": "vendedores",
+    "utilidades": "utilidades"
+}
+
+# Módulos de herramientas de vinculación (process_buffers / process_files)
+LINKING_MODULES = ["cruce_ventas", "vendedor_vinculado"]
+
+# Mapeo de herramientas de procesamiento a procesadores
+PROCESSING_TOOL_KEYS = {
+    "balance_proyectado.py": "balance-proyectado",
+    "facturacion.py": "facturacion",
+    "inventario.py": "inventario",
+    "ventas.py": "ventas",
+    "ventas-csv.py": "ventas-csv",
+    "lista_precios.py": "lista-precios",
+    "vendedores.py": "vendedores",
+    "utilidades.py": "utilidades"
+}
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+
 async def create_initial_data():
     """Crear datos iniciales en la base de datos"""
-    from database import SessionLocal
+    from database import AsyncSessionLocal
     try:
-        db = SessionLocal()
-        try:
+        async with AsyncSessionLocal() as db:
             # Crear usuario admin por defecto
-            admin_user = db.query(User).filter(User.username == "emiliano_admin").first()
+            admin_user = await db.scalar(select(User).where(User.username == "emiliano_admin"))
             if not admin_user:
                 admin_user = User(
                     username="emiliano_admin",
@@ -211,164 +330,117 @@ async def create_initial_data():
                 )
                 admin_user.set_password("admin123")
                 db.add(admin_user)
-                db.commit()
+                await db.commit()
                 print("✅ Admin user created")
-        finally:
-            db.close()
     except Exception as e:
         print(f"❌ Error creating initial data: {str(e)}")
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint for Railway"""
-    health_status = {
-        "status": "healthy",
-        "service": "ego-project", 
-        "version": "1.0.0",
-        "timestamp": datetime.utcnow().isoformat(),
-        "checks": {}
-    }
+@app.get("/live")
+async def liveness_check():
+    """Liveness: el proceso responde (sin I/O)"""
+    return {"status": "alive"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: último resultado de los chequeos, refrescado en segundo plano"""
     try:
-        # Check database health
-        try:
-            db_healthy = check_db_health()
-            health_status["checks"]["database"] = {
-                "status": "healthy" if db_healthy else "unhealthy",
-                "message": "Database connection successful" if db_healthy else "Database connection failed"
-            }
-        except Exception as e:
-            health_status["checks"]["database"] = {
-                "status": "unhealthy",
-                "message": f"Database check error: {str(e)}"
-            }
-            db_healthy = False
-    
-        # Check file system
-        try:
-            # Test if we can write to uploads directory
-            test_file = "uploads/.health_check"
-            with open(test_file, 'w') as f:
-                f.write("health_check")
-            os.remove(test_file)
-            health_status["checks"]["filesystem"] = {
-                "status": "healthy",
-                "message": "File system accessible"
-            }
-            fs_healthy = True
-        except Exception as e:
-            health_status["checks"]["filesystem"] = {
-                "status": "unhealthy", 
-                "message": f"File system error: {str(e)}"
-            }
-            fs_healthy = False
-    
-        # Overall status
-        if db_healthy and fs_healthy:
-            health_status["status"] = "healthy"
-        elif db_healthy or fs_healthy:
-            health_status["status"] = "degraded"
-        else:
-            health_status["status"] = "unhealthy"
-        
-        # Return appropriate HTTP status
-        status_code = 200 if health_status["status"] in ["healthy", "degraded"] else 503
-    
-        return JSONResponse(
-            content=health_status,
-            status_code=status_code
-        )
-    
+        report = await health.get_readiness()
+        return JSONResponse(content=report, status_code=health.status_code(report))
     except Exception as e:
-        print(f"❌ Health check failed with exception: {str(e)}")
+        print(f"❌ Readiness check failed with exception: {str(e)}")
         return JSONResponse(
             content={
                 "status": "unhealthy",
                 "service": "ego-project",
-                "error": f"Health check exception: {str(e)}",
+                "error": f"Readiness check exception: {str(e)}",
                 "version": "1.0.0",
                 "timestamp": datetime.utcnow().isoformat()
             },
             status_code=503
         )
 
+@app.get("/health")
+async def health_check():
+    """Health check endpoint for Railway (same cached result as /ready)"""
+    return await readiness_check()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/", response_class=HTMLResponse)
 async def dashboard(request: Request):
     """Página principal del dashboard"""
     user = request.session.get("user")
     return templates.TemplateResponse("dashboard.html", {"request": request, "user": user})
 
+TOOL_KEYS = {
+    "balance_proyectado.py": "balance-proyectado",
+    "facturacion.py": "facturacion",
+    "inventario.py": "inventario",
+    "ventas.py": "ventas",
+    "ventas-csv.py": "ventas-csv",
+    "lista_precios.py": "lista-precios",
+    "cruce_ventas.py": "cruce-ventas",
+    "vendedores.py": "vendedores",
+    "vendedor_vinculado.py": "vendedor-vinculado",
+    "utilidades.py": "utilidades"
+}
+
+async def build_user_catalog(user, db: AsyncSession):
+    """Construir el árbol empresa → herramientas visible para el usuario"""
+    query = select(Company).options(selectinload(Company.tools)).order_by(Company.id)
+    if not user.is_admin:
+        query = query.where(Company.id.in_(user.company_ids))
+    companies = (await db.scalars(query)).all()
+
+    companies_data = []
+    for company in companies:
+        tools_data = []
+        for tool in sorted(company.tools, key=lambda t: t.id):
+            # Asegurar que tool_type existe y tiene un valor por defecto
+            tool_type = tool.tool_type if hasattr(tool, 'tool_type') and tool.tool_type else "procesamiento"
+            tool_key = TOOL_KEYS.get(tool.filename, tool.filename.replace('.py', '').replace('_', '-'))
+            tools_data.append({
+                "id": tool.id,
+                "name": tool.name,
+                "filename": tool.filename,
+                "key": tool_key,
+                "tool_type": tool_type
+            })
+
+        companies_data.append({
+            "id": company.id,
+            "name": company.name,
+            "folder_name": company.folder_name,
+            "tools": tools_data
+        })
+
+    return companies_data
+
 @app.get("/api/user/companies")
-async def get_user_companies(request: Request, db: Session = Depends(get_db)):
+async def get_user_companies(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Obtener empresas y herramientas del usuario autenticado"""
     try:
-        user_session = request.session.get("user")
-        if not user_session:
-            raise HTTPException(status_code=401, detail="No autorizado")
-    
-        # Obtener usuario de la base de datos
-        user = db.query(User).filter(User.email == user_session["email"]).first()
-        if not user:
-            # Crear usuario si no existe (desde SSO)
-            user = User(
-                username=user_session.get("name", user_session["email"].split('@')[0]),
-                email=user_session["email"],
-                is_admin=False
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            print(f"✅ New user created: {user.email}")
-    
-        # Verificar permisos
-        if user.is_admin:
-            companies = db.query(Company).all()
-            print(f"👑 Admin user - returning all {len(companies)} companies")
+        user = await get_user_context(request, db)
+        if_none_match = request.headers.get("if-none-match")
+        cache_headers = {"Cache-Control": "private, no-cache", "Vary": "Cookie"}
+
+        cached = catalog.get_cached(user.id)
+        if cached is None:
+            version = catalog.current_version()
+            companies_data = await build_user_catalog(user, db)
+            etag = catalog.store(user.id, version, companies_data)
+            print(f"📤 Catalog built for {user.username}: {len(companies_data)} companies (version {version})")
         else:
-            companies = user.companies
-            print(f"👤 Regular user - {len(companies)} companies assigned")
-    
-        # Mapear datos para el frontend
-        companies_data = []
-        for company in companies:
-            tool_mapping = {
-                "balance_proyectado.py": "balance-proyectado",
-                "facturacion.py": "facturacion", 
-                "inventario.py": "inventario",
-                "ventas.py": "ventas",
-                "ventas-csv.py": "ventas-csv",  # ← Asegúrate que esto esté así
-                "lista_precios.py": "lista-precios",
-                "cruce_ventas.py": "cruce-ventas",
-                "vendedores.py": "vendedores",  
-                "vendedor_vinculado.py": "vendedor-vinculado",
-                "utilidades.py": "utilidades"
-            }
-        
-            tools_data = []
-            for tool in company.tools:
-                # Asegurar que tool_type existe y tiene un valor por defecto
-                tool_type = tool.tool_type if hasattr(tool, 'tool_type') and tool.tool_type else "procesamiento"
-            
-                tool_key = tool_mapping.get(tool.filename, tool.filename.replace('.py', '').replace('_', '-'))
-                tools_data.append({
-                    "id": tool.id,
-                    "name": tool.name,
-                    "filename": tool.filename,
-                    "key": tool_key,
-                    "tool_type": tool_type
-                })
-                
-                print(f"🔧 Tool: {tool.name} (ID: {tool.id}) - Filename: {tool.filename} - Type: {tool_type} - Key: {tool_key}")
-        
-            companies_data.append({
-                "id": company.id,
-                "name": company.name,
-                "folder_name": company.folder_name,
-                "tools": tools_data
-            })
-    
-        print(f"📤 Returning {len(companies_data)} companies to frontend")
-        return companies_data
+            etag, companies_data = cached
+
+        if catalog.etag_matches(if_none_match, etag):
+            catalog.catalog_not_modified.inc()
+            return Response(status_code=304, headers={"ETag": etag, **cache_headers})
+
+        return JSONResponse(content=companies_data, headers={"ETag": etag, **cache_headers})
     
     except HTTPException:
         raise
@@ -377,15 +449,15 @@ async def get_user_companies(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 @app.get("/api/tools/{tool_id}/config")
-async def get_tool_config(tool_id: int, request: Request, db: Session = Depends(get_db)):
+async def get_tool_config(tool_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Obtener configuración de una herramienta de vinculación"""
     try:
-        user_session = request.session.get("user")
-        if not user_session:
-            raise HTTPException(status_code=401, detail="No autorizado")
+        user = await get_user_context(request, db)
     
-        tool = db.query(Tool).filter(Tool.id == tool_id).first()
-        if not tool:
+        tool = await db.scalar(
+            select(Tool).where(Tool.id == tool_id).options(selectinload(Tool.linked_processing_tools))
+        )
+        if not tool or not user.can_access_company(tool.company_id):
             raise HTTPException(status_code=404, detail="Herramienta no encontrada")
     
         tool_type = tool.tool_type if hasattr(tool, 'tool_type') and tool.tool_type else "procesamiento"
@@ -415,22 +487,18 @@ async def get_tool_config(tool_id: int, request: Request, db: Session = Depends(
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 @app.get("/api/tools/{tool_id}/history")
-async def get_tool_history(tool_id: int, request: Request, db: Session = Depends(get_db)): 
+async def get_tool_history(tool_id: int, request: Request, db: AsyncSession = Depends(get_async_db)): 
     """Obtener historial de archivos procesados para una herramienta"""
     try:
-        user_session = request.session.get("user")
-        if not user_session:
-            raise HTTPException(status_code=401, detail="No autorizado")
-    
-        user = db.query(User).filter(User.email == user_session["email"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        user = await get_user_context(request, db)
     
         # Obtener archivos del usuario para esta herramienta
-        files = db.query(ProcessedFile).filter(
-            ProcessedFile.user_id == user.id,
-            ProcessedFile.tool_id == tool_id
-        ).order_by(ProcessedFile.processed_at.desc()).all()
+        files = (await db.scalars(
+            select(ProcessedFile).where(
+                ProcessedFile.user_id == user.id,
+                ProcessedFile.tool_id == tool_id
+            ).order_by(ProcessedFile.processed_at.desc())
+        )).all()
 
         print(f"📋 Found {len(files)} files in history for tool {tool_id} and user {user.username}")
     
@@ -454,22 +522,19 @@ async def get_tool_history(tool_id: int, request: Request, db: Session = Depends
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 @app.get("/api/tools/{tool_id}/processed-files")
-async def get_tool_processed_files(tool_id: int, request: Request, db: Session = Depends(get_db)):
+async def get_tool_processed_files(tool_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Obtener archivos procesados de una herramienta específica para herramientas de vinculación"""
     try:
-        user_session = request.session.get("user")
-        if not user_session:
-            raise HTTPException(status_code=401, detail="No autorizado")
-    
-        user = db.query(User).filter(User.email == user_session["email"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        user = await get_user_context(request, db)
     
         # Obtener archivos procesados de esta herramienta SOLO del usuario actual
-        files = db.query(ProcessedFile).filter(
-            ProcessedFile.tool_id == tool_id,
-            ProcessedFile.user_id == user.id  # Solo archivos del usuario actual
-        ).order_by(ProcessedFile.processed_at.desc()).limit(50).all()
+        files = (await db.scalars(
+            select(ProcessedFile).where(
+                ProcessedFile.tool_id == tool_id,
+                ProcessedFile.user_id == user.id  # Solo archivos del usuario actual
+            ).order_by(ProcessedFile.processed_at.desc()).limit(50)
+            .options(selectinload(ProcessedFile.user))
+        )).all()
     
         files_data = []
         for file in files:
@@ -490,22 +555,18 @@ async def get_tool_processed_files(tool_id: int, request: Request, db: Session =
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 @app.get("/api/files/history/{tool_id}")
-async def get_file_history(tool_id: int, request: Request, db: Session = Depends(get_db)):
+async def get_file_history(tool_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Obtener historial de archivos procesados para una herramienta"""
     try:
-        user_session = request.session.get("user")
-        if not user_session:
-            raise HTTPException(status_code=401, detail="No autorizado")
-    
-        user = db.query(User).filter(User.email == user_session["email"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        user = await get_user_context(request, db)
     
         # Obtener archivos del usuario para esta herramienta
-        files = db.query(ProcessedFile).filter(
-            ProcessedFile.user_id == user.id,
-            ProcessedFile.tool_id == tool_id
-        ).order_by(ProcessedFile.processed_at.desc()).all()
+        files = (await db.scalars(
+            select(ProcessedFile).where(
+                ProcessedFile.user_id == user.id,
+                ProcessedFile.tool_id == tool_id
+            ).order_by(ProcessedFile.processed_at.desc())
+        )).all()
     
         files_data = []
         for file in files:
@@ -527,22 +588,18 @@ async def get_file_history(tool_id: int, request: Request, db: Session = Depends
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
 @app.get("/api/files/download/{file_id}")
-async def download_file(file_id: int, request: Request, db: Session = Depends(get_db)):
+async def download_file(file_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Descargar archivo procesado"""
     try:
-        user_session = request.session.get("user")
-        if not user_session:
-            raise HTTPException(status_code=401, detail="No autorizado")
-    
-        user = db.query(User).filter(User.email == user_session["email"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        user = await get_user_context(request, db)
     
         # Obtener archivo (solo del usuario actual)
-        file_obj = db.query(ProcessedFile).filter(
-            ProcessedFile.id == file_id,
-            ProcessedFile.user_id == user.id
-        ).first()
+        file_obj = await db.scalar(
+            select(ProcessedFile).where(
+                ProcessedFile.id == file_id,
+                ProcessedFile.user_id == user.id
+            )
+        )
 
         if not file_obj:
             print(f"❌ File not found: ID {file_id} for user {user.id}")
@@ -562,162 +619,281 @@ async def download_file(file_id: int, request: Request, db: Session = Depends(ge
         print(f"❌ Error downloading file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
+async def get_processing_tool(tool_id: int, db: AsyncSession):
+    """Herramienta de procesamiento y la key de su procesador"""
+    tool_obj = await db.scalar(select(Tool).where(Tool.id == tool_id))
+    if not tool_obj:
+        raise HTTPException(status_code=404, detail="Herramienta no encontrada")
+
+    tool_type_db = tool_obj.tool_type if hasattr(tool_obj, 'tool_type') and tool_obj.tool_type else "procesamiento"
+    if tool_type_db != "procesamiento":
+        raise HTTPException(status_code=400, detail="Esta herramienta no es de procesamiento")
+
+    tool_key = PROCESSING_TOOL_KEYS.get(tool_obj.filename)
+    if not tool_key or tool_key not in PROCESSOR_MODULES:
+        raise HTTPException(status_code=400, detail=f"Procesador no encontrado para la herramienta '{tool_obj.filename}'. Key: '{tool_key}'")
+
+    return tool_obj, tool_key
+
+JOB_WAIT_TIMEOUT = float(os.getenv("JOB_WAIT_TIMEOUT", "600"))
+
+async def enqueue_job(kind, tool_obj, user, files, payload, job_class="interactive"):
+    """Encolar un trabajo y avisar a los workers de este proceso"""
+    job_id = await asyncio.to_thread(
+        jobs.enqueue, kind, tool_obj.id, user.id, files, payload,
+        job_class=job_class, company_id=tool_obj.company_id
+    )
+    job_worker.wake_workers()
+    return job_id
+
+async def job_response(job, db: AsyncSession, error_prefix: str):
+    """
+    Respuesta de un trabajo esperado por el handler: el xlsx si terminó, el error si
+    falló, o 202 con el id para consultar /api/jobs/{id} si sigue en curso
+    """
+    if job["status"] == "succeeded":
+        processed_file = await db.scalar(select(ProcessedFile).where(ProcessedFile.id == job["processed_file_id"]))
+        return Response(
+            content=processed_file.file_data,
+            media_type=XLSX_MEDIA_TYPE,
+            headers={
+                "Content-Disposition": f"attachment; filename={processed_file.processed_filename}",
+                "X-Job-Id": str(job["id"])
+            }
+        )
+    if job["status"] == "cancelled":
+        raise HTTPException(status_code=409, detail="El procesamiento fue cancelado")
+    if job["status"] == "timed_out":
+        raise HTTPException(status_code=504, detail=f"{error_prefix}: {job['last_error']}")
+    if job["status"] in ("failed", "dead"):
+        raise HTTPException(status_code=500, detail=f"{error_prefix}: {job['last_error']}")
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["id"], "status": job["status"], "status_url": f"/api/jobs/{job['id']}"}
+    )
+
 @app.post("/api/tools/{tool_id}/process")
 async def process_tool_file(
     tool_id: int,
     request: Request,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Procesar archivo con herramienta de procesamiento específica"""
     try:
-        user_session = request.session.get("user")
-        if not user_session:
-            raise HTTPException(status_code=401, detail="No autorizado")
-    
-        user = db.query(User).filter(User.email == user_session["email"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    
-        # Obtener herramienta de la BD
-        tool_obj = db.query(Tool).filter(Tool.id == tool_id).first()
-        if not tool_obj:
-            raise HTTPException(status_code=404, detail="Herramienta no encontrada")
-    
-        tool_type_db = tool_obj.tool_type if hasattr(tool_obj, 'tool_type') and tool_obj.tool_type else "procesamiento"
-        if tool_type_db != "procesamiento":
-            raise HTTPException(status_code=400, detail="Esta herramienta no es de procesamiento")
+        user = await get_user_context(request, db)
+        tool_obj, tool_key = await get_processing_tool(tool_id, db)
     
         # Validar archivo
-        if file.size > 10 * 1024 * 1024:  # 10MB
+        if file.size > MAX_UPLOAD_SIZE:
             raise HTTPException(status_code=400, detail="Archivo demasiado grande (máximo 10MB)")
-    
-        # Mapeo de herramientas a procesadores
-        tool_mapping = {
-            "balance_proyectado.py": "balance-proyectado",
-            "facturacion.py": "facturacion", 
-            "inventario.py": "inventario",
-            "ventas.py": "ventas",
-            "ventas-csv.py": "ventas-csv",  # ← Asegúrate que esto esté así
-            "lista_precios.py": "lista-precios",
-            "vendedores.py": "vendedores",
-            "utilidades.py": "utilidades"
-        }
-    
-        tool_key = tool_mapping.get(tool_obj.filename)
-        print(f"🔍 DEBUG: Tool filename: '{tool_obj.filename}'")
-        print(f"🔍 DEBUG: Mapped tool key: '{tool_key}'")
-        print(f"🔍 DEBUG: Available processors: {list(PROCESSORS.keys())}")
-        
-        if not tool_key or tool_key not in PROCESSORS:
-            raise HTTPException(status_code=400, detail=f"Procesador no encontrado para la herramienta '{tool_obj.filename}'. Key: '{tool_key}'")
+        await admission.admit(db, user, tool_obj.company_id, [file.size or 0])
     
         print(f"🔧 Processing file with tool: {tool_obj.name} (ID: {tool_id}) - Processor: {tool_key}")
     
-        # Generar nombre de archivo procesado basado en el original
-        original_name = os.path.splitext(file.filename)[0]  # Nombre sin extensión
-        processed_filename = f"{original_name}_PROCESADO.xlsx"
-    
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1]}") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-    
-        try:
-            # Procesar archivo with lazy loading
-            processor_func = PROCESSORS[tool_key]
-            print(f"🔍 DEBUG: Processor function: {processor_func}")
-            
-            processor = processor_func()
-            print(f"🔍 DEBUG: Processor result: {processor}")
+        content = await file.read()
+        payload = {
+            "module": PROCESSOR_MODULES[tool_key],
+            "tool_key": tool_key,
+            "company_id": tool_obj.company_id,
+            # Las exportaciones acumulativas reutilizan lo ya procesado por el usuario
+            "incremental": True
+        }
+        job_id = await enqueue_job("process", tool_obj, user, [(file.filename, content)], payload)
+        job = await job_worker.wait_for_job(job_id, JOB_WAIT_TIMEOUT, request)
         
-            if processor is None:
-                raise HTTPException(status_code=500, detail=f"Procesador '{tool_key}' no disponible. Verifique la configuración del módulo.")
+        if job["status"] == "succeeded":
+            print(f"✅ File processed successfully: {file.filename} -> {processed_name(file.filename)} (job {job_id})")
+        return await job_response(job, db, "Error procesando archivo")
         
-            print(f"🔍 DEBUG: Calling processor with: {temp_file_path}")
-            output_path = processor(temp_file_path, file.filename)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error processing file: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error procesando archivo: {str(e)}")
 
-            # Si el processor devuelve tupla → usar solo el primer elemento
-            if isinstance(output_path, tuple):
-                output_path = output_path[0]
+def unique_batch_names(filenames: List[str]) -> List[str]:
+    """Evitar nombres repetidos dentro de un lote (las salidas se nombran por el original)"""
+    seen = {}
+    unique = []
+    for filename in filenames:
+        base, ext = os.path.splitext(filename)
+        count = seen.get(filename.lower(), 0)
+        seen[filename.lower()] = count + 1
+        unique.append(filename if count == 0 else f"{base} ({count + 1}){ext}")
+    return unique
 
-            # Si devuelve bytes (XLSX en memoria) → guardarlo como archivo
-            if isinstance(output_path, (bytes, bytearray)):
-                fd, temp_output_path = tempfile.mkstemp(suffix=".xlsx")
-                os.close(fd)
-                with open(temp_output_path, "wb") as f:
-                    f.write(output_path)
-                output_path = temp_output_path
+def sheet_title(filename: str, used: set) -> str:
+    """Nombre de hoja válido (máx. 31 caracteres, sin repetir) para un archivo del lote"""
+    title = os.path.splitext(filename)[0]
+    for char in '[]:*?/\\':
+        title = title.replace(char, "_")
+    title = title[:31] or "Hoja"
+    candidate, n = title, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate = title[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
 
-            # Convertir siempre a string (por si viene como PathObject)
-            output_path = str(output_path)
+def build_batch_zip(outputs, report) -> bytes:
+    import io
+    import zipfile
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in outputs:
+            zf.writestr(name, data)
+        zf.writestr("resumen_lote.json", json.dumps(report, ensure_ascii=False, indent=2))
+    return buffer.getvalue()
+
+def build_batch_workbook(outputs, report) -> bytes:
+    """Un solo libro con una hoja por archivo procesado y una hoja de resumen"""
+    import io
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    used = set()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        summary = pd.DataFrame([
+            {
+                "Archivo": item["filename"],
+                "Estado": item["status"],
+                "Segundos": item.get("elapsed"),
+                "Error": item.get("error", "")
+            }
+            for item in report["files"]
+        ])
+        summary.to_excel(writer, sheet_name=sheet_title("Resumen", used), index=False)
+        for name, data in outputs:
+            df = pd.read_excel(io.BytesIO(data), sheet_name=0, header=None)
+            df.to_excel(writer, sheet_name=sheet_title(name.replace("_PROCESADO", ""), used), index=False, header=False)
+    return buffer.getvalue()
+
+@app.post("/api/tools/{tool_id}/process-batch")
+async def process_tool_batch(
+    tool_id: int,
+    request: Request,
+    files: List[UploadFile] = File(...),
+    output: str = Form("zip"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Procesar varios archivos con la misma herramienta, en paralelo en el pool de workers"""
+    try:
+        user = await get_user_context(request, db)
+        tool_obj, tool_key = await get_processing_tool(tool_id, db)
+
+        if output not in ("zip", "workbook"):
+            raise HTTPException(status_code=400, detail="Formato de salida inválido (zip o workbook)")
+        if not files:
+            raise HTTPException(status_code=400, detail="No se recibieron archivos")
+        if len(files) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"Demasiados archivos (máximo {BATCH_MAX_FILES})")
+        for file in files:
+            if file.size > MAX_UPLOAD_SIZE:
+                raise HTTPException(status_code=400, detail=f"Archivo demasiado grande (máximo 10MB): {file.filename}")
+        await admission.admit(db, user, tool_obj.company_id, [file.size or 0 for file in files])
+
+        print(f"📦 Batch of {len(files)} files with tool: {tool_obj.name} (ID: {tool_id}) - Processor: {tool_key}")
+
+        filenames = unique_batch_names([file.filename for file in files])
+        contents = [await file.read() for file in files]
+
+        batch_start = datetime.utcnow()
+        # Un trabajo por archivo; sin caché incremental: los archivos de un lote no la comparten
+        payload = {
+            "module": PROCESSOR_MODULES[tool_key],
+            "tool_key": tool_key,
+            "company_id": tool_obj.company_id,
+            "incremental": False
+        }
+        job_ids = [
+            await enqueue_job("process", tool_obj, user, [(filename, content)], payload, job_class="batch")
+            for content, filename in zip(contents, filenames)
+        ]
+        finished = await asyncio.gather(*(job_worker.wait_for_job(job_id, JOB_WAIT_TIMEOUT, request) for job_id in job_ids))
+
+        processed_files = {}
+        file_ids = [job["processed_file_id"] for job in finished if job["status"] == "succeeded"]
+        if file_ids:
+            result = await db.scalars(select(ProcessedFile).where(ProcessedFile.id.in_(file_ids)))
+            processed_files = {processed_file.id: processed_file for processed_file in result}
+
+        report_files = []
+        outputs = []
+        for filename, job in zip(filenames, finished):
+            if job["status"] != "succeeded":
+                status = "error" if job["status"] in jobs.UNSUCCESSFUL_STATUSES else "pending"
+                error = job["last_error"] if status == "error" else f"Sigue en proceso (trabajo {job['id']})"
+                print(f"❌ Batch item not completed: {filename}: {error}")
+                report_files.append({"filename": filename, "status": status, "error": error, "job_id": job["id"]})
+                continue
+
+            processed_file = processed_files[job["processed_file_id"]]
+            outputs.append((processed_file.processed_filename, processed_file.file_data))
+            report_files.append({
+                "filename": filename,
+                "status": "ok",
+                "processed_filename": processed_file.processed_filename,
+                "elapsed": (job["result_info"] or {}).get("elapsed"),
+                "file_size": processed_file.file_size,
+                "job_id": job["id"]
+            })
+
+        report = {
+            "tool": tool_obj.name,
+            "total": len(filenames),
+            "succeeded": len(outputs),
+            "failed": len(filenames) - len(outputs),
+            "wall_seconds": round((datetime.utcnow() - batch_start).total_seconds(), 3),
+            "files": report_files
+        }
+
+        if not outputs:
+            return JSONResponse(status_code=422, content=report)
+
+        print(f"✅ Batch processed: {report['succeeded']}/{report['total']} ok in {report['wall_seconds']}s")
+
+        batch_name = f"{os.path.splitext(tool_obj.filename)[0]}_LOTE_{batch_start.strftime('%Y%m%d_%H%M%S')}"
+        headers = {
+            "X-Batch-Total": str(report["total"]),
+            "X-Batch-Succeeded": str(report["succeeded"]),
+            "X-Batch-Failed": str(report["failed"])
+        }
+        if output == "workbook":
+            content = await asyncio.to_thread(build_batch_workbook, outputs, report)
+            headers["Content-Disposition"] = f"attachment; filename={batch_name}.xlsx"
+            return Response(content=content, media_type=XLSX_MEDIA_TYPE, headers=headers)
+
+        content = await asyncio.to_thread(build_batch_zip, outputs, report)
+        headers["Content-Disposition"] = f"attachment; filename={batch_name}.zip"
+        return Response(content=content, media_type="application/zip", headers=headers)
 
-            print(f"🔍 DEBUG: Processor output path: {output_path}")
-        
-            # Leer archivo procesado
-            with open(output_path, 'rb') as processed_file:
-                processed_data = processed_file.read()
-        
-            # Guardar en base de datos con el nombre consistente
-            processed_file_obj = ProcessedFile(
-                original_filename=file.filename,
-                processed_filename=processed_filename,
-                file_data=processed_data,
-                user_id=user.id,
-                tool_id=tool_obj.id,
-                file_size=len(processed_data)
-            )
-            db.add(processed_file_obj)
-            db.commit()
-        
-            print(f"✅ File processed successfully: {file.filename} -> {processed_filename}")
-        
-            # Limpiar archivos temporales
-            os.unlink(temp_file_path)
-            os.unlink(output_path)
-        
-            return Response(
-                content=processed_data,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f"attachment; filename={processed_filename}"}
-            )
-        
-        except Exception as e:
-            # Limpiar archivo temporal en caso de error
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-            print(f"❌ Error in processor: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            raise e
-        
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error processing file: {str(e)}")
+        print(f"❌ Error processing batch: {str(e)}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error procesando archivo: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error procesando lote: {str(e)}")
 
 @app.post("/api/tools/{tool_id}/process-linking")
 async def process_linking_files(
     tool_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Procesar archivos con herramienta de vinculación"""
     try:
-        user_session = request.session.get("user")
-        if not user_session:
-            raise HTTPException(status_code=401, detail="No autorizado")
-        
-        user = db.query(User).filter(User.email == user_session["email"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        user = await get_user_context(request, db)
         
         # Get tool from database
-        tool_obj = db.query(Tool).filter(Tool.id == tool_id).first()
+        tool_obj = await db.scalar(
+            select(Tool).where(Tool.id == tool_id).options(selectinload(Tool.company))
+        )
         if not tool_obj:
             raise HTTPException(status_code=404, detail="Herramienta no encontrada")
         
@@ -729,116 +905,60 @@ async def process_linking_files(
         form_data = await request.form()
         input_files = []
         input_files_info = []
-        temp_files = []
         
-        try:
-            total_files = tool_obj.total_files if hasattr(tool_obj, 'total_files') and tool_obj.total_files else 2
+        total_files = tool_obj.total_files if hasattr(tool_obj, 'total_files') and tool_obj.total_files else 2
+        
+        for i in range(total_files):
+            # Check for processed file first
+            processed_file_id = form_data.get(f"processed_file_{i}")
+            upload_file = form_data.get(f"upload_file_{i}")
             
-            for i in range(total_files):
-                # Check for processed file first
-                processed_file_id = form_data.get(f"processed_file_{i}")
-                upload_file = form_data.get(f"upload_file_{i}")
-                
-                if processed_file_id:
-                    # Handle processed file
-                    processed_file = db.query(ProcessedFile).filter(
+            if processed_file_id:
+                # Handle processed file
+                processed_file = await db.scalar(
+                    select(ProcessedFile).where(
                         ProcessedFile.id == int(processed_file_id)
-                    ).first()
-                    
-                    if processed_file:
-                        # Create temporary file from processed data
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as temp_file:
-                            temp_file.write(processed_file.file_data)
-                            temp_file_path = temp_file.name
-                            temp_files.append(temp_file_path)
-                        
-                        input_files.append(temp_file_path)
-                        input_files_info.append({
-                            "filename": processed_file.processed_filename,
-                            "source": "processed",
-                            "source_tool": processed_file.tool.name,
-                            "source_user": processed_file.user.username
-                        })
-                        print(f"✅ Added processed file: {processed_file.processed_filename}")
+                    ).options(selectinload(ProcessedFile.tool), selectinload(ProcessedFile.user))
+                )
                 
-                elif upload_file and hasattr(upload_file, 'filename'):
-                    # Handle uploaded file
-                    # Create temporary file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{upload_file.filename.split('.')[-1]}") as temp_file:
-                        content = await upload_file.read()
-                        temp_file.write(content)
-                        temp_file_path = temp_file.name
-                        temp_files.append(temp_file_path)
-                    
-                    input_files.append(temp_file_path)
+                if processed_file:
+                    input_files.append((processed_file.processed_filename, processed_file.file_data))
                     input_files_info.append({
-                        "filename": upload_file.filename,
-                        "source": "upload"
+                        "filename": processed_file.processed_filename,
+                        "source": "processed",
+                        "source_tool": processed_file.tool.name,
+                        "source_user": processed_file.user.username
                     })
-                    print(f"✅ Added uploaded file: {upload_file.filename}")
-            
-            if len(input_files) != total_files:
-                raise HTTPException(status_code=400, detail=f"Se requieren {total_files} archivos, se recibieron {len(input_files)}")
-            
-            # Load and execute the linking tool
-            tool_module_path = os.path.join(tool_obj.company.folder_name, tool_obj.filename)
+                    print(f"✅ Added processed file: {processed_file.processed_filename}")
             
-            if not os.path.exists(tool_module_path):
-                raise HTTPException(status_code=404, detail="Archivo de herramienta no encontrado")
-            
-            # Import the tool module dynamically
-            spec = importlib.util.spec_from_file_location("linking_tool", tool_module_path)
-            tool_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(tool_module)
-            
-            # Execute the linking function
-            if hasattr(tool_module, 'process_files'):
-                output_path = tool_module.process_files(input_files)
-            else:
-                raise HTTPException(status_code=500, detail="Función process_files no encontrada en la herramienta")
-            
-            # Read processed file
-            with open(output_path, 'rb') as processed_file:
-                processed_data = processed_file.read()
-            
-            # Save to database
-            processed_file_obj = ProcessedFile(
-                original_filename=f"vinculacion_{datetime.now().strftime('%Y%m%d_%H%M%S')}_PROCESADO",
-                processed_filename=os.path.basename(output_path),
-                file_data=processed_data,
-                user_id=user.id,
-                tool_id=tool_obj.id,
-                file_size=len(processed_data)
-            )
-            
-            # Add input_files_info if the column exists
-            if hasattr(ProcessedFile, 'input_files_info'):
-                processed_file_obj.input_files_info = input_files_info
-            
-            db.add(processed_file_obj)
-            db.commit()
-            
-            print(f"✅ Linking tool processed successfully: {len(input_files)} files -> {os.path.basename(output_path)}")
-            
-            # Clean up temporary files
-            for temp_file in temp_files:
-                if os.path.exists(temp_file):
-                    os.unlink(temp_file)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
-            
-            return Response(
-                content=processed_data,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f"attachment; filename={os.path.basename(output_path)}"}
-            )
-            
-        except Exception as e:
-            # Clean up temporary files in case of error
-            for temp_file in temp_files:
-                if os.path.exists(temp_file):
-                    os.unlink(temp_file)
-            raise e
+            elif upload_file and hasattr(upload_file, 'filename'):
+                # Handle uploaded file
+                input_files.append((upload_file.filename, await upload_file.read()))
+                input_files_info.append({
+                    "filename": upload_file.filename,
+                    "source": "upload"
+                })
+                print(f"✅ Added uploaded file: {upload_file.filename}")
+        
+        if len(input_files) != total_files:
+            raise HTTPException(status_code=400, detail=f"Se requieren {total_files} archivos, se recibieron {len(input_files)}")
+        await admission.admit(db, user, tool_obj.company_id, [sum(len(data) for _, data in input_files)])
+        
+        # El cruce corre en el pool de procesamiento como trabajo de la cola (linking/runner.py)
+        payload = {
+            "tool_filename": tool_obj.filename,
+            "company_id": tool_obj.company_id,
+            "company_folder": tool_obj.company.folder_name,
+            "file_config": tool_obj.file_config,
+            "input_files_info": input_files_info,
+            "original_filename": f"vinculacion_{datetime.now().strftime('%Y%m%d_%H%M%S')}_PROCESADO"
+        }
+        job_id = await enqueue_job("linking", tool_obj, user, input_files, payload)
+        job = await job_worker.wait_for_job(job_id, JOB_WAIT_TIMEOUT, request)
+        
+        if job["status"] == "succeeded":
+            print(f"✅ Linking tool processed successfully: {len(input_files)} files (job {job_id})")
+        return await job_response(job, db, "Error procesando herramienta de vinculación")
             
     except HTTPException:
         raise
@@ -848,116 +968,111 @@ async def process_linking_files(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error procesando herramienta de vinculación: {str(e)}")
 
-def get_current_user_auth(request: Request, db: Session = Depends(get_db)):
-    """Get current user from session with authentication check"""
-    user_session = request.session.get("user")
-    if not user_session:
-        raise HTTPException(status_code=401, detail="No autorizado")
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Estado de un trabajo de procesamiento (del usuario, o cualquiera para admins)"""
+    user = await get_user_context(request, db)
+    job = await asyncio.to_thread(jobs.get_job, job_id)
+    if not job or (job["user_id"] != user.id and not user.is_admin):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return jobs.job_summary(job)
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Cancelar un trabajo en cola o en curso (del usuario, o cualquiera para admins)"""
+    user = await get_user_context(request, db)
+    job = await asyncio.to_thread(jobs.get_job, job_id)
+    if not job or (job["user_id"] != user.id and not user.is_admin):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if job["status"] in jobs.FINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"El trabajo ya terminó ({job['status']})")
     
-    user = db.query(User).filter(User.email == user_session["email"]).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    await job_worker.cancel_job(job_id)
+    print(f"⏹️ Cancel requested for job {job_id} by {user.email}")
+    return jobs.job_summary(await asyncio.to_thread(jobs.get_job, job_id))
+
+async def get_current_user_auth(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get current user from session with authentication check"""
+    return await get_user_context(request, db)
+
+async def get_accessible_tool_company(tool_id: int, user, db: AsyncSession):
+    """Verificar que la herramienta existe y el usuario tiene acceso a su empresa"""
+    company_id = await db.scalar(select(Tool.company_id).where(Tool.id == tool_id))
+    if company_id is None:
+        raise HTTPException(status_code=404, detail="Herramienta no encontrada")
     
-    return user
+    # Check if user has access to this tool's company
+    if not user.can_access_company(company_id):
+        raise HTTPException(status_code=403, detail="No tienes acceso a esta herramienta")
+    return company_id
 
 @app.get("/api/tools/{tool_id}/has-guide")
 async def check_tool_guide(
     tool_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Check if tool has a PDF guide"""
-    user = get_current_user_auth(request, db)
+    user = await get_current_user_auth(request, db)
     
     try:
-        tool = db.query(Tool).filter(Tool.id == tool_id).first()
-        if not tool:
-            raise HTTPException(status_code=404, detail="Herramienta no encontrada")
-        
-        # Check if user has access to this tool's company
-        if not user.is_admin and tool.company not in user.companies:
-            raise HTTPException(status_code=403, detail="No tienes acceso a esta herramienta")
-        
-        has_guide = bool(tool.guide_pdf) if hasattr(tool, 'guide_pdf') else False
-        filename = tool.guide_pdf_filename if hasattr(tool, 'guide_pdf_filename') and tool.guide_pdf_filename else None
+        await get_accessible_tool_company(tool_id, user, db)
+        guide = await guides.get_guide_info(db, tool_id)
+        if not guide:
+            return {"has_guide": False, "filename": None}
         
         return {
-            "has_guide": has_guide,
-            "filename": filename
+            "has_guide": True,
+            "filename": guide.filename,
+            "size": guide.size,
+            "sha256": guide.sha256,
+            "view_url": guides.versioned_url(f"/api/tools/{tool_id}/view-guide", guide),
+            "download_url": guides.versioned_url(f"/api/tools/{tool_id}/download-guide", guide)
         }
         
     except HTTPException:
-        ře
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
-@app.get("/api/tools/{tool_id}/view-guide")
-async def view_tool_guide(
-    tool_id: int,
-    request: Request,
-    db: Session = Depends(get_db)
-):
-    """View PDF guide for a tool"""
-    user = get_current_user_auth(request, db)
+async def serve_tool_guide(tool_id: int, request: Request, db: AsyncSession, disposition: str):
+    user = await get_current_user_auth(request, db)
     
     try:
-        tool = db.query(Tool).filter(Tool.id == tool_id).first()
-        if not tool:
-            raise HTTPException(status_code=404, detail="Herramienta no encontrada")
+        await get_accessible_tool_company(tool_id, user, db)
         
-        # Check if user has access to this tool's company
-        if not user.is_admin and tool.company not in user.companies:
-            raise HTTPException(status_code=403, detail="No tienes acceso a esta herramienta")
-        
-        if not hasattr(tool, 'guide_pdf') or not tool.guide_pdf:
+        guide = await guides.get_guide_info(db, tool_id)
+        if not guide:
             raise HTTPException(status_code=404, detail="PDF no encontrado")
         
-        filename = tool.guide_pdf_filename if hasattr(tool, 'guide_pdf_filename') and tool.guide_pdf_filename else "guia.pdf"
+        if guides.not_modified(request, guide):
+            return guides.not_modified_response(request, guide)
         
-        return Response(
-            content=tool.guide_pdf,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"inline; filename={filename}"}
-        )
+        guide = await guides.load_guide(db, tool_id)
+        return guides.pdf_response(request, guide, disposition)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
+@app.get("/api/tools/{tool_id}/view-guide")
+async def view_tool_guide(
+    tool_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """View PDF guide for a tool"""
+    return await serve_tool_guide(tool_id, request, db, "inline")
+
 @app.get("/api/tools/{tool_id}/download-guide")
 async def download_tool_guide(
     tool_id: int,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Download PDF guide for a tool"""
-    user = get_current_user_auth(request, db)
-    
-    try:
-        tool = db.query(Tool).filter(Tool.id == tool_id).first()
-        if not tool:
-            raise HTTPException(status_code=404, detail="Herramienta no encontrada")
-        
-        # Check if user has access to this tool's company
-        if not user.is_admin and tool.company not in user.companies:
-            raise HTTPException(status_code=403, detail="No tienes acceso a esta herramienta")
-        
-        if not hasattr(tool, 'guide_pdf') or not tool.guide_pdf:
-            raise HTTPException(status_code=404, detail="PDF no encontrado")
-        
-        filename = tool.guide_pdf_filename if hasattr(tool, 'guide_pdf_filename') and tool.guide_pdf_filename else "guia.pdf"
-        
-        return Response(
-            content=tool.guide_pdf,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+    return await serve_tool_guide(tool_id, request, db, "attachment")
 
 if __name__ == "__main__":
     import uvicorn
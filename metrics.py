@@ -0,0 +1,172 @@
+"""
+Métricas en proceso de la aplicación.
+
+Registro mínimo de contadores, gauges e histogramas que se exponen en formato de
+texto de Prometheus en `/metrics`. Los módulos registran sus métricas a nivel de
+módulo con `counter(...)`, `gauge(...)` o `histogram(...)`; registrar dos veces el
+mismo nombre devuelve la métrica existente.
+"""
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=None):
+    items = list(label_key) + list(extra or [])
+    if not items:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in items)
+    return "{" + body + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge:
+    """Gauge con valor fijado con `set`, o calculado al leer si se pasa `fn`"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn=None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        if self.fn is not None and not labels:
+            return self.fn()
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        if self.fn is not None:
+            try:
+                return [(self.name, (), self.fn())]
+            except Exception:
+                return []
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0, "max": 0.0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["max"] = max(series["max"], value)
+
+    def summary(self, **labels):
+        """count/sum/avg/max de una serie, para incluir en respuestas JSON"""
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if not series:
+                return {"count": 0, "sum": 0.0, "avg": 0.0, "max": 0.0}
+            return {
+                "count": series["count"],
+                "sum": round(series["sum"], 6),
+                "avg": round(series["sum"] / series["count"], 6),
+                "max": round(series["max"], 6),
+            }
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series["counts"]):
+                    out.append((f"{self.name}_bucket", key + (("le", bound),), count))
+                out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series["count"]))
+                out.append((f"{self.name}_sum", key, series["sum"]))
+                out.append((f"{self.name}_count", key, series["count"]))
+        return out
+
+
+def _register(cls, name, help_text, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, help_text, **kwargs)
+            _registry[name] = metric
+        return metric
+
+
+def counter(name, help_text):
+    return _register(Counter, name, help_text)
+
+
+def gauge(name, help_text, fn=None):
+    return _register(Gauge, name, help_text, fn=fn)
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help_text, buckets=buckets)
+
+
+def render():
+    """Todas las métricas registradas en formato de texto de Prometheus"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for sample_name, label_key, value in metric.samples():
+            lines.append(f"{sample_name}{_format_labels(label_key)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,105 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada migración es un módulo `vNNN_descripcion.py` de este paquete con una función
+`upgrade(connection)`; el número es la versión. Las versiones aplicadas se guardan en
+la tabla `schema_version` (una fila por migración), así que un arranque con el esquema
+al día cuesta una sola consulta (`SELECT MAX(version)`).
+
+Cada migración corre en su propia transacción junto con la fila de su versión: si
+falla, no queda a medio aplicar y se reintenta en el próximo arranque. En PostgreSQL
+se toma un advisory lock para que varios workers que arrancan a la vez no apliquen la
+misma migración dos veces; entre los workers de una misma máquina (también con
+SQLite) lo hace un lock de `shared_state`.
+
+Las migraciones deben funcionar en SQLite y PostgreSQL (`connection.dialect.name`
+permite distinguirlos) y ser idempotentes (`IF NOT EXISTS`): la base de una instalación
+vieja puede tener ya parte del esquema, y en SQLite el driver confirma el DDL por su
+cuenta, fuera de la transacción.
+"""
+import importlib
+import pkgutil
+import re
+import time
+
+from sqlalchemy import text
+from sqlalchemy import exc as sa_exc
+
+import migrations
+import shared_state
+
+# Clave arbitraria del advisory lock de PostgreSQL
+ADVISORY_LOCK_KEY = 74100421
+
+_MODULE_NAME = re.compile(r"^v(\d+)_\w+$")
+
+
+def available_migrations():
+    """(versión, nombre, módulo) de cada migración del paquete, en orden"""
+    found = []
+    for module_info in pkgutil.iter_modules(migrations.__path__):
+        match = _MODULE_NAME.match(module_info.name)
+        if match:
+            found.append((int(match.group(1)), module_info.name))
+    found.sort()
+
+    versions = [version for version, _ in found]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Versiones de migración duplicadas: {versions}")
+    return [
+        (version, name, importlib.import_module(f"migrations.{name}"))
+        for version, name in found
+    ]
+
+
+def latest_version():
+    return max((version for version, _, _ in available_migrations()), default=0)
+
+
+def current_version(engine):
+    """Versión aplicada en la base (0 si la tabla schema_version no existe)"""
+    with engine.connect() as connection:
+        try:
+            return connection.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+        except sa_exc.DBAPIError as e:
+            # Conexión caída: que el que llama reintente
+            if e.connection_invalidated:
+                raise
+            return 0
+
+
+def _applied_version(connection):
+    connection.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    return connection.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def run_migrations(engine):
+    """
+    Aplicar las migraciones pendientes
+
+    Returns:
+        Lista de (versión, nombre, segundos) de las migraciones aplicadas.
+    """
+    stored = current_version(engine)
+    pending = [m for m in available_migrations() if m[0] > stored]
+    if not pending:
+        print(f"✅ Database schema up to date (version {stored})")
+        return []
+
+    applied = []
+    with shared_state.process_lock("migrations"):
+        for version, name, module in pending:
+            start = time.perf_counter()
+            with engine.begin() as connection:
+                if connection.dialect.name == "postgresql":
+                    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+                # Otro proceso pudo aplicarla mientras esperábamos el lock
+                if _applied_version(connection) >= version:
+                    continue
+                print(f"🔄 Applying migration {name}...")
+                module.upgrade(connection)
+                connection.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+            seconds = round(time.perf_counter() - start, 3)
+            applied.append((version, name, seconds))
+            print(f"✅ Migration {name} applied in {seconds:.2f}s")
+    return applied
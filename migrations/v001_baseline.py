@@ -0,0 +1,124 @@
+"""
+Esquema base: tablas de la aplicación y guías PDF movidas de tools a tool_guides
+
+Las tablas están congeladas acá tal como eran en esta versión, sin depender de
+models.py: lo que se agregue después a los modelos lo crean sus propias migraciones.
+Los índices de v002 tampoco están (los crea v002).
+"""
+import hashlib
+
+from sqlalchemy import (
+    JSON, Boolean, Column, DateTime, ForeignKey, Integer, LargeBinary, MetaData, String, Table, Text,
+    inspect, text,
+)
+from sqlalchemy.sql import func
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String(100), unique=True, index=True, nullable=False),
+    Column("email", String(255), unique=True, index=True, nullable=False),
+    Column("password_hash", String(255), nullable=True),
+    Column("is_admin", Boolean, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "companies", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255), nullable=False),
+    Column("folder_name", String(100), unique=True, nullable=False),
+    Column("description", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "tools", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String(255), nullable=False),
+    Column("filename", String(255), nullable=False),
+    Column("description", Text, nullable=True),
+    Column("company_id", Integer, ForeignKey("companies.id"), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("tool_type", String(50), nullable=False),
+    Column("total_files", Integer, nullable=True),
+    Column("file_config", JSON, nullable=True),
+)
+
+Table(
+    "tool_guides", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("tool_id", Integer, ForeignKey("tools.id"), unique=True, nullable=False),
+    Column("filename", String(255), nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("sha256", String(64), nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    Column("uploaded_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "processed_files", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("original_filename", String(255), nullable=False),
+    Column("processed_filename", String(255), nullable=False),
+    Column("file_data", LargeBinary, nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("tool_id", Integer, ForeignKey("tools.id"), nullable=False),
+    Column("processed_at", DateTime(timezone=True), server_default=func.now()),
+    Column("file_size", Integer, nullable=False),
+    Column("input_files_info", JSON, nullable=True),
+)
+
+Table(
+    "user_company", metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("company_id", Integer, ForeignKey("companies.id"), primary_key=True),
+)
+
+Table(
+    "linking_tool_processing_tools", metadata,
+    Column("linking_tool_id", Integer, ForeignKey("tools.id"), primary_key=True),
+    Column("processing_tool_id", Integer, ForeignKey("tools.id"), primary_key=True),
+)
+
+
+def migrate_legacy_guides(connection):
+    """Copy tools.guide_pdf into tool_guides (with size and hash) and clear the old column"""
+    columns = {column["name"] for column in inspect(connection).get_columns("tools")}
+    if "guide_pdf" not in columns:
+        return
+
+    rows = connection.execute(text("""
+        SELECT t.id, t.guide_pdf, t.guide_pdf_filename
+        FROM tools t
+        WHERE t.guide_pdf IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM tool_guides g WHERE g.tool_id = t.id)
+    """)).fetchall()
+
+    for tool_id, content, filename in rows:
+        content = bytes(content)
+        connection.execute(
+            text("""
+                INSERT INTO tool_guides (tool_id, filename, size, sha256, data)
+                VALUES (:tool_id, :filename, :size, :sha256, :data)
+            """),
+            {
+                "tool_id": tool_id,
+                "filename": filename or "guia.pdf",
+                "size": len(content),
+                "sha256": hashlib.sha256(content).hexdigest(),
+                "data": content,
+            }
+        )
+
+    if rows:
+        connection.execute(text("UPDATE tools SET guide_pdf = NULL WHERE guide_pdf IS NOT NULL"))
+        print(f"✅ Moved {len(rows)} guide PDFs to tool_guides")
+
+
+def upgrade(connection):
+    # checkfirst: en una instalación vieja solo falta tool_guides
+    metadata.create_all(bind=connection, checkfirst=True)
+    migrate_legacy_guides(connection)
@@ -0,0 +1,26 @@
+"""
+Índices para las consultas frecuentes
+
+- processed_files(user_id, tool_id, processed_at): historial del usuario por herramienta,
+  ordenado por fecha
+- processed_files(tool_id): archivos de una herramienta (vinculación, borrado en cascada)
+- tools(company_id): herramientas de una empresa (catálogo, panel de administración)
+- tablas de asociación: su clave primaria empieza por la primera columna, así que solo
+  falta el índice para buscar por la segunda
+
+Los mismos índices están declarados en models.py (el esquema base de v001 no los tiene).
+"""
+from sqlalchemy import text
+
+INDEXES = [
+    ("ix_processed_files_user_tool_processed_at", "processed_files", "user_id, tool_id, processed_at"),
+    ("ix_processed_files_tool_id", "processed_files", "tool_id"),
+    ("ix_tools_company_id", "tools", "company_id"),
+    ("ix_user_company_company_id", "user_company", "company_id"),
+    ("ix_linking_tool_processing_tools_processing_tool_id", "linking_tool_processing_tools", "processing_tool_id"),
+]
+
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
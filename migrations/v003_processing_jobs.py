@@ -0,0 +1,50 @@
+"""
+Tablas de la cola durable de trabajos de procesamiento
+
+Congeladas tal como eran en esta versión; las columnas posteriores las agregan
+v004-v006.
+"""
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+# Solo para resolver las claves foráneas; las crea v001
+for name in ("tools", "users", "processed_files"):
+    Table(name, metadata, Column("id", Integer, primary_key=True))
+
+processing_jobs = Table(
+    "processing_jobs", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("kind", String(20), nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("tool_id", Integer, ForeignKey("tools.id"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("payload", JSON, nullable=True),
+    Column("priority", Integer, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("max_attempts", Integer, nullable=False),
+    Column("available_at", DateTime, nullable=False),
+    Column("locked_by", String(100), nullable=True),
+    Column("locked_until", DateTime, nullable=True),
+    Column("last_error", Text, nullable=True),
+    Column("result_info", JSON, nullable=True),
+    Column("processed_file_id", Integer, ForeignKey("processed_files.id"), nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("started_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+    Index("ix_processing_jobs_status_available", "status", "available_at"),
+)
+
+processing_job_files = Table(
+    "processing_job_files", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("job_id", Integer, ForeignKey("processing_jobs.id"), nullable=False, index=True),
+    Column("position", Integer, nullable=False),
+    Column("filename", String(255), nullable=False),
+    Column("data", LargeBinary, nullable=False),
+)
+
+
+def upgrade(connection):
+    processing_jobs.create(bind=connection, checkfirst=True)
+    processing_job_files.create(bind=connection, checkfirst=True)
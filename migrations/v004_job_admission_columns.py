@@ -0,0 +1,20 @@
+"""
+Columnas de la cola para el control de admisión (admission.py)
+
+- processing_jobs.company_id: tope de trabajos activos por empresa sin unir con tools
+- processing_jobs.input_bytes: tamaño de las entradas, para estimar la memoria
+  comprometida por los trabajos activos
+"""
+from sqlalchemy import inspect, text
+
+COLUMNS = [
+    ("company_id", "INTEGER REFERENCES companies(id)"),
+    ("input_bytes", "BIGINT NOT NULL DEFAULT 0"),
+]
+
+
+def upgrade(connection):
+    existing = {column["name"] for column in inspect(connection).get_columns("processing_jobs")}
+    for name, definition in COLUMNS:
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE processing_jobs ADD COLUMN {name} {definition}"))
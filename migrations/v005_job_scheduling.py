@@ -0,0 +1,25 @@
+"""
+Columnas de la cola para la planificación por clase y duración estimada
+(processing/jobs.py)
+
+Los trabajos que ya estaban en la cola quedan como interactive con schedule_key 0, es
+decir, antes que cualquier trabajo nuevo.
+"""
+from sqlalchemy import inspect, text
+
+COLUMNS = [
+    ("job_class", "VARCHAR(20) NOT NULL DEFAULT 'interactive'"),
+    ("expected_seconds", "FLOAT"),
+    ("schedule_key", "FLOAT NOT NULL DEFAULT 0"),
+    ("run_seconds", "FLOAT"),
+]
+
+
+def upgrade(connection):
+    existing = {column["name"] for column in inspect(connection).get_columns("processing_jobs")}
+    for name, definition in COLUMNS:
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE processing_jobs ADD COLUMN {name} {definition}"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_processing_jobs_status_schedule ON processing_jobs (status, schedule_key)"
+    ))
@@ -0,0 +1,10 @@
+"""Columna de la cola para pedir la cancelación de un trabajo en curso (processing/jobs.py)"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(connection):
+    existing = {column["name"] for column in inspect(connection).get_columns("processing_jobs")}
+    if "cancel_requested" not in existing:
+        connection.execute(text(
+            "ALTER TABLE processing_jobs ADD COLUMN cancel_requested BOOLEAN NOT NULL DEFAULT FALSE"
+        ))
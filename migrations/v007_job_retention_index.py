@@ -0,0 +1,8 @@
+"""Índice para la limpieza de trabajos terminados (jobs.purge_expired)"""
+from sqlalchemy import text
+
+
+def upgrade(connection):
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_processing_jobs_status_finished ON processing_jobs (status, finished_at)"
+    ))
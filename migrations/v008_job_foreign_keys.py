@@ -0,0 +1,41 @@
+"""
+Acciones ON DELETE de las claves foráneas de la cola
+
+Borrar un usuario borra sus `processed_files` (cascada del ORM); los trabajos que los
+referenciaban hacían fallar el borrado por la clave foránea.
+
+- processing_jobs.user_id: CASCADE (los trabajos del usuario se van con él)
+- processing_jobs.processed_file_id: SET NULL
+- processing_job_files.job_id: CASCADE
+
+SQLite no permite cambiar una clave foránea sin reconstruir la tabla, y la aplicación
+no activa `PRAGMA foreign_keys` en SQLite, así que ahí no se hace nada; `delete_user`
+además borra los trabajos del usuario explícitamente.
+"""
+from sqlalchemy import inspect, text
+
+FOREIGN_KEYS = [
+    ("processing_jobs", "user_id", "users", "CASCADE"),
+    ("processing_jobs", "processed_file_id", "processed_files", "SET NULL"),
+    ("processing_job_files", "job_id", "processing_jobs", "CASCADE"),
+]
+
+
+def upgrade(connection):
+    if connection.dialect.name == "sqlite":
+        return
+    inspector = inspect(connection)
+    for table, column, referred, ondelete in FOREIGN_KEYS:
+        name = f"{table}_{column}_fkey"
+        for fk in inspector.get_foreign_keys(table):
+            if fk["constrained_columns"] != [column]:
+                continue
+            if (fk.get("options") or {}).get("ondelete", "").upper() == ondelete:
+                break
+            name = fk["name"] or name
+            connection.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {name}"))
+            connection.execute(text(
+                f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) "
+                f"REFERENCES {referred} (id) ON DELETE {ondelete}"
+            ))
+            break
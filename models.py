@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, LargeBinary, Table, Text, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, BigInteger, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, LargeBinary, Table, Text, JSON
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from database import Base
 import hashlib
@@ -10,7 +10,8 @@ user_company_association = Table(
     'user_company',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('company_id', Integer, ForeignKey('companies.id'), primary_key=True)
+    Column('company_id', Integer, ForeignKey('companies.id'), primary_key=True),
+    Index('ix_user_company_company_id', 'company_id')
 )
 
 # Tabla de asociación Many-to-Many entre herramientas de vinculación y herramientas de procesamiento
@@ -18,7 +19,8 @@ linking_tool_association = Table(
     'linking_tool_processing_tools',
     Base.metadata,
     Column('linking_tool_id', Integer, ForeignKey('tools.id'), primary_key=True),
-    Column('processing_tool_id', Integer, ForeignKey('tools.id'), primary_key=True)
+    Column('processing_tool_id', Integer, ForeignKey('tools.id'), primary_key=True),
+    Index('ix_linking_tool_processing_tools_processing_tool_id', 'processing_tool_id')
 )
 
 class User(Base):
@@ -75,7 +77,7 @@ class Tool(Base):
     name = Column(String(255), nullable=False)  # Nombre display
     filename = Column(String(255), nullable=False)  # Archivo físico
     description = Column(Text, nullable=True)
-    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Nuevos campos para herramientas de vinculación
@@ -83,12 +85,10 @@ class Tool(Base):
     total_files = Column(Integer, nullable=True)  # Número total de archivos que acepta (2-6)
     file_config = Column(JSON, nullable=True)  # Configuración de archivos: qué posiciones están vinculadas
     
-    # NUEVO: Campo para PDF de guía
-    guide_pdf = Column(LargeBinary, nullable=True)  # PDF de guía almacenado en BD
-    guide_pdf_filename = Column(String(255), nullable=True)  # Nombre original del PDF
-    
     # Relaciones
     company = relationship("Company", back_populates="tools")
+    # PDF de guía en su propia tabla para que las consultas de herramientas no carguen los bytes
+    guide = relationship("ToolGuide", back_populates="tool", uselist=False, cascade="all, delete-orphan")
     processed_files = relationship("ProcessedFile", back_populates="tool", cascade="all, delete-orphan")
     
     # Relación Many-to-Many para herramientas de vinculación
@@ -108,15 +108,39 @@ class Tool(Base):
         back_populates="linked_processing_tools"
     )
 
+class ToolGuide(Base):
+    __tablename__ = "tool_guides"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tool_id = Column(Integer, ForeignKey("tools.id"), unique=True, nullable=False)
+    filename = Column(String(255), nullable=False)  # Nombre original del PDF
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)  # Hash del contenido, usado como ETag y versión de la URL
+    data = deferred(Column(LargeBinary, nullable=False))  # Solo se carga al servir el PDF
+    uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relaciones
+    tool = relationship("Tool", back_populates="guide")
+    
+    def set_content(self, content: bytes):
+        """Guardar el PDF junto con su tamaño y hash"""
+        self.data = content
+        self.size = len(content)
+        self.sha256 = hashlib.sha256(content).hexdigest()
+
 class ProcessedFile(Base):
     __tablename__ = "processed_files"
+    # Índices creados en bases existentes por migrations/v002_performance_indexes.py
+    __table_args__ = (
+        Index("ix_processed_files_user_tool_processed_at", "user_id", "tool_id", "processed_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     original_filename = Column(String(255), nullable=False)
     processed_filename = Column(String(255), nullable=False)
     file_data = Column(LargeBinary, nullable=False)  # Archivo procesado en BD
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    tool_id = Column(Integer, ForeignKey("tools.id"), nullable=False)
+    tool_id = Column(Integer, ForeignKey("tools.id"), nullable=False, index=True)
     processed_at = Column(DateTime(timezone=True), server_default=func.now())
     file_size = Column(Integer, nullable=False)
     
@@ -126,3 +150,58 @@ class ProcessedFile(Base):
     # Relaciones
     user = relationship("User", back_populates="processed_files")
     tool = relationship("Tool", back_populates="processed_files")
+
+class ProcessingJob(Base):
+    """Trabajo de procesamiento en la cola durable (ver processing/jobs.py)"""
+    __tablename__ = "processing_jobs"
+    __table_args__ = (
+        # Búsqueda del próximo trabajo a reclamar
+        Index("ix_processing_jobs_status_available", "status", "available_at"),
+        Index("ix_processing_jobs_status_schedule", "status", "schedule_key"),
+        # Limpieza de trabajos terminados (jobs.purge_expired)
+        Index("ix_processing_jobs_status_finished", "status", "finished_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)  # "process" o "linking"
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed, dead, cancelled, timed_out
+    tool_id = Column(Integer, ForeignKey("tools.id"), nullable=False)
+    # ondelete: borrar un usuario borra sus trabajos (ver migrations/v008_job_foreign_keys.py)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=True)  # Empresa de la herramienta
+    input_bytes = Column(BigInteger, nullable=False, default=0)  # Tamaño de las entradas (control de admisión)
+    payload = Column(JSON, nullable=True)  # Módulo, nombres de archivo y opciones del trabajo
+    priority = Column(Integer, nullable=False, default=0)  # Rango de la clase (0 interactive, 1 batch, 2 admin-reprocess)
+    job_class = Column(String(20), nullable=False, default="interactive")
+    expected_seconds = Column(Float, nullable=True)  # Duración estimada al encolar
+    schedule_key = Column(Float, nullable=False, default=0)  # Menor valor, antes se reclama
+    run_seconds = Column(Float, nullable=True)  # Duración real del intento que terminó bien
+    cancel_requested = Column(Boolean, nullable=False, default=False)  # Lo ve el worker que lo ejecuta
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False)  # Para reintentos con backoff
+    locked_by = Column(String(100), nullable=True)  # Worker que lo está ejecutando
+    locked_until = Column(DateTime, nullable=True)  # Vencido: otro worker puede reclamarlo
+    last_error = Column(Text, nullable=True)
+    result_info = Column(JSON, nullable=True)  # Tiempos y metadatos de la ejecución
+    processed_file_id = Column(Integer, ForeignKey("processed_files.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    # Relaciones
+    files = relationship("ProcessingJobFile", back_populates="job", cascade="all, delete-orphan",
+                         order_by="ProcessingJobFile.position")
+
+class ProcessingJobFile(Base):
+    """Archivo de entrada de un trabajo, guardado en la base para sobrevivir reinicios"""
+    __tablename__ = "processing_job_files"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("processing_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    filename = Column(String(255), nullable=False)
+    data = deferred(Column(LargeBinary, nullable=False))
+    
+    # Relaciones
+    job = relationship("ProcessingJob", back_populates="files")
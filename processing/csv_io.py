@@ -0,0 +1,151 @@
+"""
+Lectura compartida de archivos CSV.
+
+Decodifica el archivo una sola vez y detecta el delimitador a partir de una muestra
+acotada del inicio, en lugar de probar `pd.read_csv` con cada codificación hasta que
+una funcione. Siempre se prueba primero utf-8 estricto sobre el contenido completo.
+Si falla, se elige entre las alternativas de un byte: cp1252 (exportaciones de Excel
+en Windows: €, comillas tipográficas) y latin-1, que decodifica cualquier byte. Las
+dos aceptan casi cualquier archivo, así que la alternativa que usó la herramienta la
+última vez (por herramienta y empresa) se prueba primero: una herramienta cuyos
+archivos no son cp1252 válido sigue en latin-1. El dialecto detectado se registra en
+los metadatos de la ejecución.
+"""
+import codecs
+import csv
+import io
+import os
+import threading
+
+import pandas as pd
+
+from processing import run_metadata
+
+SAMPLE_BYTES = int(os.getenv("CSV_SNIFF_SAMPLE_BYTES", str(64 * 1024)))
+
+# Orden de preferencia: utf-8 es estricta; cp1252 rechaza 5 bytes sin asignar; latin-1
+# decodifica cualquier byte
+FALLBACK_ENCODINGS = ["utf-8", "cp1252", "latin-1"]
+CANDIDATE_DELIMITERS = ",;\t|"
+DEFAULT_DELIMITER = ","
+
+# (herramienta, empresa) -> última codificación alternativa (no utf-8) que funcionó
+_last_encodings = {}
+_last_encodings_lock = threading.Lock()
+
+
+def _run_key():
+    run = run_metadata.current_run()
+    if run is None:
+        return (None, None)
+    return (run.tool, run.company)
+
+
+def get_last_encoding(key):
+    with _last_encodings_lock:
+        return _last_encodings.get(key)
+
+
+def remember_encoding(key, encoding):
+    with _last_encodings_lock:
+        _last_encodings[key] = encoding
+
+
+def candidate_encodings(preferred=None):
+    """
+    Codificaciones alternativas a probar cuando el contenido no es utf-8 válido
+
+    La recordada para la herramienta va primero; el resto en el orden de
+    FALLBACK_ENCODINGS.
+    """
+    candidates = FALLBACK_ENCODINGS[1:]
+    if preferred in candidates:
+        candidates = [preferred] + [encoding for encoding in candidates if encoding != preferred]
+    return candidates
+
+
+def detect_delimiter(sample_text):
+    """Detectar el delimitador entre los candidatos; ',' si no se puede determinar"""
+    if not sample_text.strip():
+        return DEFAULT_DELIMITER
+    # Descartar la última línea de la muestra, que puede estar cortada
+    lines = sample_text.splitlines()
+    if len(lines) > 1:
+        sample_text = "\n".join(lines[:-1])
+    try:
+        return csv.Sniffer().sniff(sample_text, delimiters=CANDIDATE_DELIMITERS).delimiter
+    except csv.Error:
+        return DEFAULT_DELIMITER
+
+
+def decode_csv_bytes(raw, key=None):
+    """
+    Decodificar el contenido completo de un CSV
+
+    Returns:
+        Tupla (texto, dialecto) donde dialecto es un dict con la codificación y el
+        delimitador detectados.
+    """
+    sample = raw[:SAMPLE_BYTES]
+    fallback_used = False
+    # utf-8 estricto sobre todo el contenido: una muestra ASCII no dice nada del resto,
+    # y latin-1 decodifica cualquier byte (un utf-8 leído así queda mal sin error)
+    encoding = "utf-8-sig" if raw.startswith(codecs.BOM_UTF8) else FALLBACK_ENCODINGS[0]
+    try:
+        text = raw.decode(encoding)
+    except UnicodeDecodeError:
+        preferred = get_last_encoding(key)
+        candidates = candidate_encodings(preferred)
+        for encoding in candidates:
+            try:
+                text = raw.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        # La recordada no sirvió para este archivo
+        fallback_used = preferred is not None and encoding != preferred
+        remember_encoding(key, encoding)
+
+    delimiter = detect_delimiter(text[:SAMPLE_BYTES])
+
+    dialect = {
+        "encoding": encoding,
+        "delimiter": delimiter,
+        "sample_bytes": len(sample),
+        "encoding_fallback": fallback_used,
+    }
+    return text, dialect
+
+
+def read_csv_file(file_path, **read_kwargs):
+    """
+    Leer un CSV detectando codificación y delimitador
+
+    Acepta los mismos argumentos que `pd.read_csv`; si se pasa `sep` explícitamente
+    no se intenta detectar el delimitador.
+    """
+    with open(file_path, "rb") as f:
+        raw = f.read()
+    return read_csv_bytes(raw, os.path.basename(file_path), **read_kwargs)
+
+
+def read_csv_bytes(raw, filename=None, **read_kwargs):
+    """`read_csv_file` sobre el contenido ya en memoria (procesadores en memoria)"""
+    key = _run_key()
+    try:
+        text, dialect = decode_csv_bytes(raw, key)
+    except UnicodeDecodeError:
+        raise ValueError("No se pudo leer el archivo CSV con ninguna codificación soportada")
+
+    if "sep" in read_kwargs or "delimiter" in read_kwargs:
+        dialect["delimiter"] = read_kwargs.get("sep", read_kwargs.get("delimiter"))
+    else:
+        read_kwargs["sep"] = dialect["delimiter"]
+
+    df = pd.read_csv(io.StringIO(text), **read_kwargs)
+
+    dialect["filename"] = filename
+    run_metadata.append("csv_dialects", dialect)
+    print(f"📄 CSV detectado: encoding={dialect['encoding']}, delimitador={dialect['delimiter']!r}")
+
+    return df
@@ -0,0 +1,255 @@
+"""
+Ejecución de procesadores en un pool de procesos.
+
+Los procesadores de las empresas son código pandas síncrono y CPU-bound; llamarlos
+desde el handler bloquea el event loop. Este módulo los ejecuta en un
+`ProcessPoolExecutor` compartido: el worker importa el procesador, lo llama dentro de
+un `run_context` y devuelve los bytes del resultado junto con los metadatos de la
+ejecución y el tiempo que tomó.
+
+Los procesadores que exponen `process_bytes` reciben la entrada en memoria y
+devuelven el resultado en memoria (processing/memory_io.py); solo los que exponen
+únicamente `process_file` pasan por el disco.
+"""
+import asyncio
+import functools
+import importlib
+import inspect
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+from processing import memory_io
+from processing.run_metadata import run_context
+
+# Con varios workers web (WEB_CONCURRENCY, ver gunicorn.conf.py) cada uno tiene su
+# propio pool: por defecto se reparten los CPU entre ellos
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+CPUS_PER_WORKER = max(1, (os.cpu_count() or 2) // WEB_CONCURRENCY)
+PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", str(CPUS_PER_WORKER)))
+# spawn evita heredar hilos del servidor (event loop, drivers de BD) al crear workers
+PROCESSING_START_METHOD = os.getenv("PROCESSING_START_METHOD", "spawn")
+
+_pool = None
+_pool_lock = threading.Lock()
+# Trabajos enviados al pool que todavía no terminaron (corriendo + en cola)
+_jobs_in_flight = 0
+_jobs_lock = threading.Lock()
+
+metrics.gauge("processing_jobs_in_flight", "Jobs submitted to the processing pool and not finished",
+              fn=lambda: _jobs_in_flight)
+metrics.gauge("processing_jobs_queued", "Jobs waiting for a free processing worker",
+              fn=lambda: max(_jobs_in_flight - PROCESSING_WORKERS, 0))
+
+
+def get_pool():
+    """Pool de procesos compartido, creado en el primer uso"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context(PROCESSING_START_METHOD)
+            _pool = ProcessPoolExecutor(max_workers=PROCESSING_WORKERS, mp_context=context)
+            print(f"⚙️ Processing pool started with {PROCESSING_WORKERS} workers ({PROCESSING_START_METHOD})")
+        return _pool
+
+
+def shutdown_pool(wait=True, pool=None):
+    """
+    Cerrar el pool compartido, cancelando lo que tenga en cola
+
+    Con `pool` se cierra solo esa instancia (p.ej. la que se rompió): si ya se creó
+    otro pool en su lugar, los trabajos del nuevo no se tocan.
+    """
+    global _pool
+    with _pool_lock:
+        target = pool or _pool
+        if target is None:
+            return
+        if target is _pool:
+            _pool = None
+        target.shutdown(wait=wait, cancel_futures=True)
+
+
+def pool_stats():
+    """Estado del pool para /ready"""
+    in_flight = _jobs_in_flight
+    return {
+        "started": _pool is not None,
+        "workers": PROCESSING_WORKERS,
+        "start_method": PROCESSING_START_METHOD,
+        "jobs_in_flight": in_flight,
+        "jobs_queued": max(in_flight - PROCESSING_WORKERS, 0),
+    }
+
+
+def _track_job(delta):
+    global _jobs_in_flight
+    with _jobs_lock:
+        _jobs_in_flight += delta
+
+
+def warm_worker(module_paths, hold_seconds=0.5):
+    """
+    Importar los procesadores dentro de un worker
+
+    Se queda `hold_seconds` ocupado para que las demás tareas de precarga caigan en
+    otros workers del pool.
+    """
+    start = time.perf_counter()
+    errors = {}
+    for module_path in module_paths:
+        try:
+            importlib.import_module(module_path)
+        except Exception as e:
+            errors[module_path] = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    time.sleep(hold_seconds)
+    return {"pid": os.getpid(), "seconds": elapsed, "errors": errors}
+
+
+def prewarm_pool(module_paths):
+    """Arrancar los workers del pool e importar en ellos los procesadores"""
+    start = time.perf_counter()
+    pool = get_pool()
+    futures = [pool.submit(warm_worker, list(module_paths)) for _ in range(PROCESSING_WORKERS)]
+    results = [future.result() for future in futures]
+    errors = {}
+    for result in results:
+        errors.update(result["errors"])
+    return {
+        "workers_warmed": len({result["pid"] for result in results}),
+        "workers": PROCESSING_WORKERS,
+        "seconds": round(time.perf_counter() - start, 4),
+        "errors": errors,
+    }
+
+
+def load_processor(module_name, function_name="process_file"):
+    """Importar `function_name` desde `<MODULE_PREFIX_A>.<module_name>`"""
+    return getattr(import_processor_module(module_name), function_name)
+
+
+def import_processor_module(module_name):
+    prefix = os.environ.get("MODULE_PREFIX_A")
+    if not prefix:
+        raise ImportError("MODULE_PREFIX_A environment variable not set")
+    return importlib.import_module(f"{prefix}.{module_name}")
+
+
+def resolve_processor(module_name):
+    """
+    Función a llamar del procesador: `process_bytes` si el módulo la expone
+
+    Returns:
+        Tupla (función, io) con io "memory" o "disk" (`process_file`).
+    """
+    module = import_processor_module(module_name)
+    processor = getattr(module, memory_io.PROCESS_BYTES, None)
+    if processor is not None:
+        return processor, "memory"
+    return getattr(module, "process_file"), "disk"
+
+
+def call_processor(processor, input_path, original_filename):
+    """
+    Llamar a un procesador según los parámetros que acepta
+
+    Los procesadores existentes tienen firmas distintas: `(filepath)`,
+    `(filepath, original_filename=None)` o `(file_path, return_bytes=False)`.
+    """
+    params = inspect.signature(processor).parameters
+    if "original_filename" in params:
+        return processor(input_path, original_filename=original_filename)
+    if "return_bytes" in params:
+        return processor(input_path, return_bytes=True)
+    return processor(input_path)
+
+
+def read_output(result):
+    """
+    Normalizar el resultado de un procesador a bytes
+
+    Acepta una ruta (se lee y se elimina), bytes, un DataFrame, o una tupla cuyo primer
+    elemento es cualquiera de los anteriores.
+    """
+    if isinstance(result, tuple):
+        result = result[0]
+    if not isinstance(result, (str, os.PathLike)):
+        return memory_io.output_bytes(result)
+
+    output_path = str(result)
+    with open(output_path, "rb") as f:
+        data = f.read()
+    try:
+        os.unlink(output_path)
+    except OSError:
+        pass
+    return data
+
+
+def run_processor_job(module_name, tool_key, company_id, input_data, original_filename, user_id=None):
+    """
+    Trabajo que corre dentro del worker
+
+    `input_data` son los bytes del archivo subido; solo se escriben en disco (en el
+    directorio temporal del trabajo) si el procesador no expone `process_bytes`.
+    `user_id` identifica la caché incremental de la herramienta (ver
+    `processing.incremental`); sin usuario el procesador parsea todo el archivo.
+
+    Returns:
+        dict con `data` (bytes del xlsx), `metadata` (lo registrado en el run_context),
+        `io` ("memory" o "disk") y `elapsed` (segundos).
+    """
+    start = time.perf_counter()
+    processor, io = resolve_processor(module_name)
+    with run_context(tool=tool_key, company=company_id, filename=original_filename, user=user_id) as run:
+        if io == "memory":
+            result = processor(input_data, original_filename)
+        else:
+            input_path, = memory_io.write_inputs([(original_filename, input_data)])
+            result = call_processor(processor, input_path, original_filename)
+    data = read_output(result)
+    return {
+        "data": data,
+        "metadata": run.to_dict(),
+        "io": io,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def task_cancelled():
+    """Si la tarea actual recibió un cancel() (y no solo uno de los futures que espera)"""
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    # Sin Task.cancelling (Python < 3.11) no se puede distinguir
+    return task is None or cancelling is None or cancelling() > 0
+
+
+async def submit(function, *args):
+    """
+    Ejecutar `function(*args)` en el pool sin bloquear el event loop
+
+    Si un worker del pool muere (por memoria, o lo matamos) el pool queda roto: se
+    cierra esa instancia y el próximo envío crea otro. Los trabajos que estaban en
+    cola en el pool roto terminan con `BrokenProcessPool` (reintentable), también los
+    que el cierre canceló.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    _track_job(1)
+    try:
+        return await loop.run_in_executor(pool, functools.partial(function, *args))
+    except BrokenProcessPool:
+        shutdown_pool(wait=False, pool=pool)
+        raise
+    except asyncio.CancelledError:
+        if task_cancelled():
+            raise
+        # Nadie canceló esta tarea: el pool se cerró con el trabajo en cola
+        raise BrokenProcessPool("El pool de procesamiento se cerró antes de ejecutar el trabajo")
+    finally:
+        _track_job(-1)
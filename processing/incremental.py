@@ -0,0 +1,205 @@
+"""
+Reprocesamiento incremental de exportaciones acumulativas.
+
+Algunas exportaciones (ventas, facturación) son acumulativas: el archivo de hoy es el
+de ayer más filas nuevas al final. Los procesadores de esas herramientas recorren el
+archivo fila a fila con un estado (fecha y cliente actuales, documento en curso), así
+que el resultado de un prefijo idéntico es idéntico.
+
+Este módulo guarda, por herramienta, empresa y usuario, las huellas de los bloques de
+filas del último archivo procesado, los registros que produjo y el estado del parser al
+comienzo de cada bloque. En la siguiente ejecución se busca el prefijo de bloques más
+largo que coincide, se retoman los registros y el estado desde ahí y solo se parsea la
+cola nueva:
+
+    inc = incremental.start(incremental.frame_row_hashes(df), version)
+    start_row, records, state = inc.resume(initial_state)
+    for row in range(start_row, len(df)):
+        inc.checkpoint(row, records, state)   # en cada punto donde se puede retomar
+        ...
+    inc.save(records)
+
+Sin contexto de ejecución con usuario (CLI, lotes) el modo incremental queda desactivado
+y el parser procesa todo el archivo como siempre.
+"""
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from processing import run_metadata
+
+INCREMENTAL_ENABLED = os.getenv("INCREMENTAL_PROCESSING", "true").lower() == "true"
+# Caché local del servidor; solo la escribe la aplicación
+CACHE_DIR = os.getenv("INCREMENTAL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "insightgrid_incremental"))
+BLOCK_ROWS = int(os.getenv("INCREMENTAL_BLOCK_ROWS", "500"))
+
+_save_lock = threading.Lock()
+
+
+def frame_row_hashes(df):
+    """Hash por fila de un DataFrame (valores y tipos tal como los ve el parser)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def rows_hashes(rows):
+    """Hash por fila de una secuencia de tuplas de celdas (openpyxl / xlrd)"""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(repr(tuple(row)).encode(), digest_size=8).digest(), "little")
+         for row in rows],
+        dtype=np.uint64,
+    )
+
+
+def block_fingerprints(row_hashes, block_rows=BLOCK_ROWS):
+    """
+    Huella encadenada de cada bloque completo de filas
+
+    La huella del bloque i cubre las filas [0, (i+1) * block_rows), así que dos archivos
+    comparten prefijo hasta el primer bloque cuya huella difiere. El último bloque
+    incompleto no se incluye: puede crecer en la próxima exportación.
+    """
+    fingerprints = []
+    digest = b""
+    row_hashes = np.ascontiguousarray(row_hashes, dtype=np.uint64)
+    for start in range(0, len(row_hashes) - block_rows + 1, block_rows):
+        digest = hashlib.blake2b(digest + row_hashes[start:start + block_rows].tobytes(), digest_size=16).digest()
+        fingerprints.append(digest.hex())
+    return fingerprints
+
+
+def source_version(source_file, *extra):
+    """Versión del parser: contenido del módulo + datos extra (p.ej. tipos de columnas)"""
+    digest = hashlib.sha1()
+    with open(source_file, "rb") as f:
+        digest.update(f.read())
+    for item in extra:
+        digest.update(repr(item).encode())
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", "-".join(str(part) for part in key))
+    return os.path.join(CACHE_DIR, f"{safe}.pkl")
+
+
+class IncrementalParse:
+    """Estado incremental de un parseo (ver docstring del módulo)"""
+
+    def __init__(self, key, version, fingerprints, total_rows, block_rows=BLOCK_ROWS):
+        self.key = key
+        self.version = version
+        self.fingerprints = fingerprints
+        self.total_rows = total_rows
+        self.block_rows = block_rows
+        self.checkpoints = []
+        # La fila 0 no se guarda: retomar desde ahí es procesar todo
+        self._next_boundary = block_rows
+
+    @property
+    def enabled(self):
+        return self.key is not None
+
+    def _load_previous(self):
+        path = _cache_path(self.key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                previous = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Caché incremental ilegible, se procesa todo: {e}")
+            return None
+        if previous.get("version") != self.version or previous.get("block_rows") != self.block_rows:
+            return None
+        return previous
+
+    def resume(self, initial_state):
+        """
+        Punto de partida del parseo
+
+        Returns:
+            (fila desde la que parsear, registros ya producidos, estado del parser)
+        """
+        previous = self._load_previous() if self.enabled else None
+        matched_blocks = 0
+        if previous:
+            for old, new in zip(previous["fingerprints"], self.fingerprints):
+                if old != new:
+                    break
+                matched_blocks += 1
+
+        matched_rows = matched_blocks * self.block_rows
+        # Último punto de retome cuya fila está dentro del prefijo idéntico: todo lo
+        # producido antes de él depende solo de filas que no cambiaron
+        usable = [cp for cp in (previous or {}).get("checkpoints", []) if cp[0] < matched_rows]
+
+        if not usable:
+            run_metadata.record("incremental", {"enabled": self.enabled, "reused_rows": 0,
+                                                "total_rows": self.total_rows})
+            return 0, [], initial_state
+
+        row, record_count, state = usable[-1]
+        self.checkpoints = list(usable)
+        self._next_boundary = (row // self.block_rows + 1) * self.block_rows
+        records = previous["records"][:record_count]
+
+        run_metadata.record("incremental", {
+            "enabled": True,
+            "matched_blocks": matched_blocks,
+            "reused_rows": row,
+            "reused_records": record_count,
+            "total_rows": self.total_rows,
+        })
+        print(f"♻️ Incremental: {row}/{self.total_rows} filas reutilizadas "
+              f"({record_count} registros), se parsean {self.total_rows - row} filas nuevas")
+        return row, records, state
+
+    def checkpoint(self, row, records, state):
+        """Registrar un punto de retome (solo el primero de cada bloque se guarda)"""
+        if self.enabled and row >= self._next_boundary:
+            self.checkpoints.append((row, len(records), state))
+            self._next_boundary = (row // self.block_rows + 1) * self.block_rows
+
+    def save(self, records):
+        """Guardar huellas, puntos de retome y registros para la próxima ejecución"""
+        if not self.enabled:
+            return
+        payload = {
+            "version": self.version,
+            "block_rows": self.block_rows,
+            "fingerprints": self.fingerprints,
+            "checkpoints": self.checkpoints,
+            "records": records,
+        }
+        path = _cache_path(self.key)
+        try:
+            with _save_lock:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la caché incremental: {e}")
+
+
+def start(row_hashes, version, block_rows=BLOCK_ROWS):
+    """
+    Preparar un parseo incremental para la ejecución en curso
+
+    La clave es (herramienta, empresa, usuario) del run; sin usuario o con
+    INCREMENTAL_PROCESSING=false devuelve una instancia desactivada.
+    """
+    run = run_metadata.current_run()
+    user = run.extra.get("user") if run is not None else None
+    key = None
+    if INCREMENTAL_ENABLED and user is not None:
+        key = (run.tool, run.company, user)
+    fingerprints = block_fingerprints(row_hashes, block_rows) if key else []
+    return IncrementalParse(key, version, fingerprints, len(row_hashes), block_rows)
@@ -0,0 +1,403 @@
+"""
+Workers de la cola de trabajos.
+
+Cada worker es una tarea asyncio que reclama un trabajo de `processing.jobs`, lo
+ejecuta en el pool de procesamiento (con las entradas en memoria, ver
+processing/memory_io.py), renueva su visibilidad mientras corre y guarda el
+`ProcessedFile` al terminar. La aplicación arranca `JOB_WORKERS` workers en cada
+proceso web; también se pueden correr aparte, en otros procesos o máquinas con
+acceso a la misma base:
+
+    python -m processing.job_worker --workers 2
+
+Los handlers encolan y esperan el resultado con `wait_for_job`: si el trabajo lo
+ejecutó un worker de este proceso se enteran al instante, si no consultan la base.
+Si el cliente se desconecta mientras espera, el trabajo se cancela.
+
+Mientras un trabajo corre, `supervise` renueva su visibilidad, atiende los pedidos de
+cancelación (del mismo proceso al instante, de otros consultando la base cada
+`JOB_CANCEL_POLL_INTERVAL`) y aplica el tiempo máximo de la herramienta; si el
+procesador no atiende la interrupción (processing/limits.py), mata su worker.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy import exc as sa_exc
+
+import metrics
+from processing import executor, jobs, limits, scratch
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(executor.PROCESSING_WORKERS)))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_IDLE_MAX_INTERVAL = float(os.getenv("JOB_IDLE_MAX_INTERVAL", "2"))
+JOB_CANCEL_POLL_INTERVAL = float(os.getenv("JOB_CANCEL_POLL_INTERVAL", "2"))
+JOB_CANCEL_ON_DISCONNECT = os.getenv("JOB_CANCEL_ON_DISCONNECT", "1") == "1"
+
+# job_id -> asyncio.Event de los handlers de este proceso que esperan el resultado
+_waiters = {}
+# job_id -> asyncio.Event de los trabajos que corren en este proceso (cancelación local)
+_running = {}
+# Se activa al encolar desde este proceso: los workers ociosos consultan sin esperar
+_wake = asyncio.Event()
+
+processor_runs = metrics.counter("processor_runs_total", "Processor runs by I/O mode: memory (process_bytes) or disk")
+
+
+def processed_name(filename: str) -> str:
+    """Nombre del archivo procesado basado en el original"""
+    return f"{os.path.splitext(filename)[0]}_PROCESADO.xlsx"
+
+
+def build_input_files_info(filename: str, metadata: dict):
+    """
+    input_files_info de un archivo subido (con el dialecto si el procesador leyó un CSV
+    y las filas reutilizadas si el procesamiento fue incremental)
+    """
+    csv_dialects = metadata.get("csv_dialects")
+    incremental_info = metadata.get("incremental")
+    if incremental_info and not incremental_info.get("reused_rows"):
+        incremental_info = None
+    if not csv_dialects and not incremental_info:
+        return None
+    info = {
+        "filename": filename,
+        "source": "upload",
+    }
+    if csv_dialects:
+        info["csv_dialect"] = csv_dialects[0]
+    if incremental_info:
+        info["incremental"] = incremental_info
+    return [info]
+
+
+def is_retryable(error):
+    """Errores de infraestructura: el mismo archivo puede funcionar en otro intento"""
+    return isinstance(error, (BrokenProcessPool, sa_exc.DBAPIError))
+
+
+def tool_name(job):
+    """Key de la herramienta del trabajo, para buscar sus límites"""
+    payload = job["payload"]
+    if job["kind"] == "process":
+        return payload["tool_key"]
+    return os.path.splitext(payload["tool_filename"])[0]
+
+
+async def run_process_job(job, files, work_dir, job_limits):
+    payload = job["payload"]
+    filename, content = files[0]
+    # Solo los archivos sueltos usan la caché incremental del usuario (no los lotes)
+    user_id = job["user_id"] if payload.get("incremental") else None
+    result = await executor.submit(
+        limits.run_limited, work_dir, job_limits, executor.run_processor_job,
+        payload["module"], payload["tool_key"], payload["company_id"], content, filename, user_id
+    )
+    processor_runs.inc(io=result["io"])
+    processed_file = {
+        "original_filename": filename,
+        "processed_filename": processed_name(filename),
+        "file_data": result["data"],
+        "file_size": len(result["data"]),
+        "input_files_info": build_input_files_info(filename, result["metadata"]),
+    }
+    return processed_file, {"elapsed": round(result["elapsed"], 3), "io": result["io"]}
+
+
+async def run_linking_job(job, files, work_dir, job_limits):
+    from linking.runner import run_linking_job as run_linking
+
+    result = await executor.submit(limits.run_limited, work_dir, job_limits, run_linking, job["payload"], files)
+    processor_runs.inc(io=result["io"])
+    processed_file = {
+        "original_filename": job["payload"]["original_filename"],
+        "processed_filename": result["output_name"],
+        "file_data": result["data"],
+        "file_size": len(result["data"]),
+        "input_files_info": result["input_files_info"],
+    }
+    return processed_file, {"elapsed": round(result["elapsed"], 3), "io": result["io"]}
+
+
+RUNNERS = {
+    "process": run_process_job,
+    "linking": run_linking_job,
+}
+
+
+async def supervise(job_id, worker_id, work_dir, job_limits, run, interrupted):
+    """
+    Acompañar al trabajo mientras corre: visibilidad, cancelación y tiempo máximo
+
+    Si el trabajo se interrumpe se anota en `interrupted` (status y motivo).
+    """
+    cancel_event = _running.setdefault(job_id, asyncio.Event())
+    deadline = limits.deadline_from(job_limits)
+    next_heartbeat = time.monotonic() + jobs.JOB_VISIBILITY_TIMEOUT / 3
+    kill_at = None
+    while not run.done():
+        try:
+            await asyncio.wait_for(cancel_event.wait(), JOB_CANCEL_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        if run.done():
+            return
+        now = time.monotonic()
+
+        if not interrupted:
+            cancelled = cancel_event.is_set()
+            if not cancelled:
+                try:
+                    cancelled = await asyncio.to_thread(jobs.is_cancel_requested, job_id)
+                except Exception as e:
+                    print(f"⚠️ Cancel check failed for job {job_id}: {str(e)}")
+            if cancelled:
+                interrupted.update(status="cancelled", reason="El procesamiento fue cancelado")
+                limits.request_interrupt(work_dir)
+                kill_at = now + limits.JOB_KILL_GRACE_SECONDS
+            elif deadline is not None and now >= deadline:
+                # El SIGALRM del worker no alcanzó (p.ej. una llamada larga a C): ya tuvo su margen
+                interrupted.update(
+                    status="timed_out",
+                    reason=f"El procesamiento superó el tiempo máximo ({job_limits['timeout_seconds']:.0f} s)",
+                )
+                kill_at = now
+
+        if kill_at is not None and now >= kill_at:
+            kill_at = None
+            if limits.kill_worker(work_dir):
+                print(f"💀 Job {job_id}: worker did not stop, killed it")
+            else:
+                # Todavía no empezó a correr en el pool
+                run.cancel()
+
+        if now >= next_heartbeat:
+            next_heartbeat = now + jobs.JOB_VISIBILITY_TIMEOUT / 3
+            try:
+                await asyncio.to_thread(jobs.heartbeat, job_id, worker_id)
+            except jobs.JobLost:
+                print(f"⚠️ Job {job_id} lost its lease, the result will be discarded")
+                return
+            except Exception as e:
+                print(f"⚠️ Heartbeat failed for job {job_id}: {str(e)}")
+
+
+async def record(function, *args):
+    """Registrar el resultado de un intento (sin pisar a otro worker que lo reclamó)"""
+    try:
+        return await asyncio.to_thread(function, *args)
+    except jobs.JobLost as lost:
+        print(f"⚠️ {str(lost)}")
+
+
+async def execute(job, worker_id):
+    """Ejecutar un trabajo reclamado y registrar el resultado"""
+    # El directorio del trabajo (pid del worker, cancelación, temporales y las entradas de
+    # los procesadores por rutas) se borra con cualquier resultado
+    with scratch.job_dir(job["id"]) as work_dir:
+        await _execute(job, worker_id, work_dir)
+
+
+async def _execute(job, worker_id, work_dir):
+    job_id = job["id"]
+    job_limits = limits.limits_for(tool_name(job))
+    interrupted = {}
+    run = watcher = None
+    try:
+        files = await asyncio.to_thread(jobs.load_files, job_id)
+        run = asyncio.create_task(RUNNERS[job["kind"]](job, files, work_dir, job_limits))
+        watcher = asyncio.create_task(supervise(job_id, worker_id, work_dir, job_limits, run, interrupted))
+        try:
+            processed_file, result_info = await run
+        except asyncio.CancelledError:
+            if interrupted and run.cancelled():
+                raise limits.JobCancelled(interrupted["reason"])
+            if executor.task_cancelled():
+                raise
+            # No cancelaron este worker sino la ejecución (el pool se cerró): otro intento
+            raise BrokenProcessPool("La ejecución del trabajo se canceló en el pool de procesamiento")
+        if interrupted:
+            # Terminó justo antes de atender la interrupción: el resultado es válido
+            print(f"ℹ️ Job {job_id} finished before it could be {interrupted['status']}")
+        result_info["attempts"] = job["attempts"]
+        await record(jobs.complete, job_id, worker_id, processed_file, result_info)
+        print(f"✅ Job {job_id} ({job['kind']}) succeeded in {result_info['elapsed']:.2f}s")
+    except (Exception, limits.JobInterrupted) as e:
+        # BrokenProcessPool: executor.submit ya cerró el pool roto, el próximo trabajo crea otro
+        if not interrupted and isinstance(e, (limits.JobCancelled, limits.JobTimedOut)):
+            reason = str(e)
+            if isinstance(e, limits.JobTimedOut):
+                reason = f"El procesamiento superó el tiempo máximo ({job_limits['timeout_seconds']:.0f} s)"
+            interrupted.update(status=e.status, reason=reason)
+
+        if interrupted:
+            print(f"⏹️ Job {job_id} ({job['kind']}) {interrupted['status']}: {interrupted['reason']}")
+            await record(jobs.finish_interrupted, job_id, worker_id, interrupted["status"], interrupted["reason"])
+        else:
+            print(f"❌ Job {job_id} ({job['kind']}) failed: {type(e).__name__}: {str(e)}")
+            await record(jobs.fail, job_id, worker_id, e, is_retryable(e))
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        _running.pop(job_id, None)
+        notify(job_id)
+
+
+async def run_worker(worker_id, stop_event):
+    """Reclamar y ejecutar trabajos hasta que se pida detener"""
+    idle = JOB_POLL_INTERVAL
+    while not stop_event.is_set():
+        try:
+            job = await asyncio.to_thread(jobs.claim, worker_id)
+        except Exception as e:
+            print(f"⚠️ Job claim failed ({worker_id}): {str(e)}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(_wake.wait(), idle)
+                _wake.clear()
+                idle = JOB_POLL_INTERVAL
+            except asyncio.TimeoutError:
+                idle = min(idle * 2, JOB_IDLE_MAX_INTERVAL)
+            continue
+        idle = JOB_POLL_INTERVAL
+        await execute(job, worker_id)
+
+
+def notify(job_id):
+    """Despertar a los handlers de este proceso que esperan el trabajo"""
+    event = _waiters.get(job_id)
+    if event is not None:
+        event.set()
+
+
+def wake_workers():
+    """Hay trabajo nuevo: los workers ociosos de este proceso vuelven a consultar ya"""
+    _wake.set()
+
+
+async def cancel_job(job_id):
+    """
+    Cancelar un trabajo: en cola termina en el momento; si corre, lo interrumpe su
+    worker (al instante si está en este proceso)
+
+    Returns:
+        El estado del trabajo después del pedido (ver `jobs.request_cancel`).
+    """
+    status = await asyncio.to_thread(jobs.request_cancel, job_id)
+    event = _running.get(job_id)
+    if event is not None:
+        event.set()
+    return status
+
+
+async def wait_for_job(job_id, timeout, request=None):
+    """
+    Esperar a que el trabajo llegue a un estado final
+
+    Con `request`, si el cliente se desconecta antes se cancela el trabajo
+    (JOB_CANCEL_ON_DISCONNECT).
+
+    Returns:
+        El trabajo (dict de `jobs.get_job`); si vence `timeout` se devuelve en el
+        estado en que esté.
+    """
+    event = _waiters.setdefault(job_id, asyncio.Event())
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    interval = JOB_POLL_INTERVAL
+    try:
+        while True:
+            job = await asyncio.to_thread(jobs.get_job, job_id)
+            if job is None or job["status"] in jobs.FINAL_STATUSES:
+                return job
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return job
+            if request is not None and JOB_CANCEL_ON_DISCONNECT and await request.is_disconnected():
+                print(f"🔌 Client disconnected, cancelling job {job_id}")
+                await cancel_job(job_id)
+                return job
+            try:
+                await asyncio.wait_for(event.wait(), min(interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+            interval = min(interval * 2, JOB_IDLE_MAX_INTERVAL)
+    finally:
+        _waiters.pop(job_id, None)
+
+
+async def run_retention(stop_event):
+    """Borrar las entradas y los trabajos vencidos cada JOB_RETENTION_INTERVAL (ver jobs.purge_expired)"""
+    while not stop_event.is_set():
+        try:
+            await asyncio.to_thread(jobs.purge_expired)
+        except Exception as e:
+            print(f"⚠️ Job retention sweep failed: {str(e)}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), jobs.JOB_RETENTION_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers(count=JOB_WORKERS):
+    """
+    Arrancar `count` workers en el event loop actual, más la limpieza de la cola
+
+    Returns:
+        (evento de parada, tareas)
+    """
+    stop_event = asyncio.Event()
+    tasks = [
+        asyncio.create_task(run_worker(jobs.new_worker_id(), stop_event))
+        for _ in range(count)
+    ]
+    tasks.append(asyncio.create_task(run_retention(stop_event)))
+    print(f"📬 {count} job workers started")
+    return stop_event, tasks
+
+
+async def stop_workers(stop_event, tasks, timeout=10):
+    """Dejar de reclamar trabajos y esperar (hasta `timeout`) a los que están corriendo"""
+    stop_event.set()
+    _wake.set()
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        # Sin completar: el trabajo vuelve a la cola cuando vence su visibilidad
+        task.cancel()
+
+
+async def _main(workers):
+    from database import init_db_async, mark_db_ready
+
+    await init_db_async()
+    mark_db_ready()
+    stop_event, tasks = start_workers(workers)
+    sweeper = asyncio.create_task(scratch.sweep_loop())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            # Terminar los trabajos en curso antes de salir (p.ej. en un deploy)
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        sweeper.cancel()
+        await stop_workers(stop_event, tasks)
+        executor.shutdown_pool(wait=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Workers de la cola de procesamiento")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,597 @@
+"""
+Cola durable de trabajos de procesamiento.
+
+Los trabajos (`ProcessingJob`) y sus archivos de entrada se guardan en la base de
+datos, así que un reinicio en medio de un procesamiento no pierde el trabajo: queda
+reclamado por un worker que ya no existe y, cuando vence su `locked_until`, otro
+worker lo toma. Cualquier proceso con acceso a la base puede ejecutar trabajos (los
+workers dentro de la aplicación o `python -m processing.job_worker`).
+
+Estados:
+
+    queued ──claim──> running ──complete──> succeeded
+       │ ^               │
+       │ └── reintento ──┤ (error de infraestructura, con backoff)
+       │                 ├──fail──> failed     (el procesador rechazó el archivo)
+       │                 ├────────> dead       (se agotaron los intentos)
+       │                 ├────────> timed_out  (superó el tiempo de la herramienta)
+       └──request_cancel─┴────────> cancelled
+
+Cancelar un trabajo en cola lo termina en el momento; en uno que está corriendo se
+marca `cancel_requested` y el worker que lo ejecuta interrumpe el procesador (ver
+processing/limits.py).
+
+Orden de ejecución: cada trabajo tiene una clase (`interactive` para los archivos
+sueltos y las vinculaciones, `batch` para los lotes, `admin-reprocess` para los
+reprocesos del panel) y una duración estimada a partir del tamaño de sus entradas y
+del rendimiento histórico de la herramienta (`estimate_seconds`). Al encolar se
+calcula una clave fija:
+
+    schedule_key = momento de encolado + demora de la clase + JOB_SJF_WEIGHT × duración estimada
+
+y se reclama siempre la menor. Dentro de una clase es "el más corto primero" con
+envejecimiento: un trabajo largo cede ante los cortos que llegan después, pero solo
+hasta que su espera compensa su duración, así que no queda postergado para siempre.
+Entre clases pasa lo mismo con la demora: un lote que esperó más que
+JOB_BATCH_DELAY_SECONDS pasa delante de los trabajos interactivos nuevos.
+
+Para reclamar se usa `SELECT ... FOR UPDATE SKIP LOCKED` en PostgreSQL y
+`BEGIN IMMEDIATE` (lock de escritura de toda la base) en SQLite. Cada escritura de un
+worker sobre un trabajo reclamado comprueba `locked_by`, así que un worker cuyo
+trabajo venció y fue reclamado por otro no pisa el resultado.
+
+Retención: las entradas de un trabajo terminado se guardan
+`JOB_INPUT_RETENTION_SECONDS` (para reprocesarlo desde el panel; con 0 se borran en la
+primera pasada después de terminar) y el trabajo terminado se borra a los
+`JOB_RETENTION_SECONDS`. Lo hace `purge_expired`, que corre junto a los workers (ver
+processing/job_worker.py) en lotes de `PURGE_BATCH_SIZE` filas por transacción.
+
+Las funciones de este módulo son síncronas (engine de SQLAlchemy sync); desde el
+event loop se llaman con `asyncio.to_thread`.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, or_, select, update
+
+import metrics
+from database import SessionLocal, engine
+from models import ProcessedFile, ProcessingJob, ProcessingJobFile
+
+# Sin heartbeat durante este tiempo el trabajo se considera abandonado
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "300"))
+
+FINAL_STATUSES = ("succeeded", "failed", "dead", "cancelled", "timed_out")
+# Estados finales sin resultado (el trabajo tiene last_error)
+UNSUCCESSFUL_STATUSES = ("failed", "dead", "cancelled", "timed_out")
+ACTIVE_STATUSES = ("queued", "running")
+
+# Clases de trabajo, en orden de prioridad, y cuánto ceden ante las anteriores
+JOB_CLASSES = ("interactive", "batch", "admin-reprocess")
+JOB_CLASS_DELAY_SECONDS = {
+    "interactive": 0.0,
+    "batch": float(os.getenv("JOB_BATCH_DELAY_SECONDS", "120")),
+    "admin-reprocess": float(os.getenv("JOB_REPROCESS_DELAY_SECONDS", "600")),
+}
+# Segundos de espera que compensan un segundo de duración estimada (0 = FIFO por clase)
+JOB_SJF_WEIGHT = float(os.getenv("JOB_SJF_WEIGHT", "1"))
+# Rendimiento supuesto para herramientas sin historial
+JOB_DEFAULT_MB_PER_SECOND = float(os.getenv("JOB_DEFAULT_MB_PER_SECOND", "1"))
+# Últimos trabajos exitosos de la herramienta que se usan para estimar su rendimiento
+THROUGHPUT_SAMPLE_SIZE = 50
+THROUGHPUT_CACHE_TTL = 60
+
+# Entradas de los trabajos terminados (las usa el reproceso desde el panel)
+JOB_INPUT_RETENTION_SECONDS = float(os.getenv("JOB_INPUT_RETENTION_SECONDS", str(7 * 24 * 3600)))
+# Trabajos terminados (estado y resultado para la API)
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(30 * 24 * 3600)))
+JOB_RETENTION_INTERVAL = float(os.getenv("JOB_RETENTION_INTERVAL", "600"))
+PURGE_BATCH_SIZE = 500
+
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+jobs_enqueued = metrics.counter("jobs_enqueued_total", "Jobs added to the processing queue")
+jobs_finished = metrics.counter("jobs_finished_total", "Jobs that reached a final status, by status")
+jobs_retried = metrics.counter("jobs_retried_total", "Jobs scheduled for another attempt")
+jobs_reclaimed = metrics.counter("jobs_reclaimed_total", "Jobs claimed again after their visibility timeout")
+jobs_wait_seconds = metrics.histogram("jobs_wait_seconds", "Time from enqueue to first claim, by job class", WAIT_BUCKETS)
+jobs_run_seconds = metrics.histogram("jobs_run_seconds", "Duration of successful jobs, by job class", WAIT_BUCKETS)
+jobs_purged = metrics.counter("jobs_purged_total", "Rows deleted by the retention sweep, by table")
+
+# tool_id -> (vence, segundos por byte)
+_throughput_cache = {}
+_throughput_lock = threading.Lock()
+
+
+class JobLost(RuntimeError):
+    """El trabajo ya no pertenece a este worker (venció y lo reclamó otro)"""
+
+
+class JobInputsPurged(LookupError):
+    """Las entradas del trabajo ya se borraron (retención)"""
+
+
+def new_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _now():
+    return datetime.utcnow()
+
+
+def retry_delay(attempts):
+    """Backoff exponencial: 5s, 10s, 20s... hasta JOB_RETRY_MAX_SECONDS"""
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+
+
+def seconds_per_byte(tool_id):
+    """Rendimiento histórico de la herramienta (de sus últimos trabajos exitosos)"""
+    now = time.monotonic()
+    with _throughput_lock:
+        cached = _throughput_cache.get(tool_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    table = ProcessingJob.__table__
+    recent = (
+        select(table.c.input_bytes, table.c.run_seconds)
+        .where(
+            (table.c.tool_id == tool_id)
+            & (table.c.status == "succeeded")
+            & table.c.run_seconds.is_not(None)
+        )
+        .order_by(table.c.id.desc())
+        .limit(THROUGHPUT_SAMPLE_SIZE)
+        .subquery()
+    )
+    with engine.connect() as connection:
+        total_bytes, total_seconds = connection.execute(
+            select(func.sum(recent.c.input_bytes), func.sum(recent.c.run_seconds))
+        ).one()
+    if total_bytes and total_seconds:
+        value = total_seconds / total_bytes
+    else:
+        value = 1 / (JOB_DEFAULT_MB_PER_SECOND * 1024 * 1024)
+
+    with _throughput_lock:
+        _throughput_cache[tool_id] = (now + THROUGHPUT_CACHE_TTL, value)
+    return value
+
+
+def estimate_seconds(tool_id, input_bytes):
+    """Duración estimada de un trabajo de la herramienta con `input_bytes` de entradas"""
+    return input_bytes * seconds_per_byte(tool_id)
+
+
+def schedule_key(job_class, expected_seconds, enqueued_at):
+    return enqueued_at + JOB_CLASS_DELAY_SECONDS[job_class] + JOB_SJF_WEIGHT * expected_seconds
+
+
+def enqueue(kind, tool_id, user_id, files, payload=None, job_class="interactive", max_attempts=None,
+            company_id=None):
+    """
+    Agregar un trabajo a la cola
+
+    Args:
+        kind: "process" (un archivo, process_bytes) o "linking" (varios, process_buffers)
+        files: lista de (nombre, bytes) en el orden en que los recibe el procesador
+        payload: datos que necesita el worker para ejecutarlo (módulo, opciones)
+        job_class: una de JOB_CLASSES
+        company_id: empresa de la herramienta (topes por empresa de admission.py)
+
+    Returns:
+        id del trabajo
+    """
+    if job_class not in JOB_CLASSES:
+        raise ValueError(f"Clase de trabajo desconocida: {job_class}")
+    now = _now()
+    input_bytes = sum(len(data) for _, data in files)
+    expected_seconds = estimate_seconds(tool_id, input_bytes)
+    with SessionLocal() as db:
+        job = ProcessingJob(
+            kind=kind,
+            status="queued",
+            tool_id=tool_id,
+            user_id=user_id,
+            company_id=company_id,
+            input_bytes=input_bytes,
+            payload=payload or {},
+            priority=JOB_CLASSES.index(job_class),
+            job_class=job_class,
+            expected_seconds=round(expected_seconds, 3),
+            schedule_key=schedule_key(job_class, expected_seconds, time.time()),
+            attempts=0,
+            max_attempts=max_attempts or JOB_MAX_ATTEMPTS,
+            available_at=now,
+            created_at=now,
+        )
+        job.files = [
+            ProcessingJobFile(position=position, filename=filename, data=data)
+            for position, (filename, data) in enumerate(files)
+        ]
+        db.add(job)
+        db.commit()
+        jobs_enqueued.inc(kind=kind, job_class=job_class)
+        return job.id
+
+
+def clone_job(job_id, job_class):
+    """
+    Encolar de nuevo un trabajo con las mismas entradas (reproceso desde el panel)
+
+    El resultado es un `ProcessedFile` nuevo del mismo usuario, calculado desde cero
+    (sin caché incremental).
+
+    Returns:
+        id del trabajo nuevo, o None si el original no existe.
+
+    Raises:
+        JobInputsPurged: si las entradas ya se borraron (JOB_INPUT_RETENTION_SECONDS).
+    """
+    job = get_job(job_id)
+    if job is None:
+        return None
+    files = load_files(job_id)
+    if not files:
+        raise JobInputsPurged(f"Job {job_id} inputs were purged")
+    payload = dict(job["payload"] or {})
+    if job["kind"] == "process":
+        payload["incremental"] = False
+    return enqueue(
+        job["kind"], job["tool_id"], job["user_id"], files, payload,
+        job_class=job_class, company_id=job["company_id"],
+    )
+
+
+def _claimable(now):
+    table = ProcessingJob.__table__
+    return or_(
+        (table.c.status == "queued") & (table.c.available_at <= now),
+        # Reclamado por un worker que dejó de dar señales
+        (table.c.status == "running") & (table.c.locked_until < now),
+    )
+
+
+def claim(worker_id):
+    """
+    Reclamar el próximo trabajo disponible
+
+    Returns:
+        dict con los campos del trabajo, o None si no hay trabajos disponibles.
+    """
+    table = ProcessingJob.__table__
+    now = _now()
+    with engine.connect() as connection:
+        is_sqlite = connection.dialect.name == "sqlite"
+        if is_sqlite:
+            # Toma el lock de escritura antes de leer: ningún otro proceso puede elegir
+            # el mismo trabajo hasta el commit
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+        query = (
+            select(table)
+            .where(_claimable(now))
+            .order_by(table.c.schedule_key, table.c.id)
+            .limit(1)
+        )
+        if not is_sqlite:
+            query = query.with_for_update(skip_locked=True)
+        row = connection.execute(query).mappings().first()
+        if row is None:
+            connection.rollback()
+            return None
+
+        job = dict(row)
+        if job["status"] == "running":
+            jobs_reclaimed.inc()
+            print(f"♻️ Job {job['id']} reclaimed: {job['locked_by']} stopped sending heartbeats")
+
+        if job["cancel_requested"]:
+            # Se pidió cancelarlo mientras corría en un worker que ya no existe
+            connection.execute(
+                update(table).where(table.c.id == job["id"]).values(
+                    status="cancelled", locked_by=None, locked_until=None, finished_at=now,
+                    last_error="El procesamiento fue cancelado",
+                )
+            )
+            connection.commit()
+            jobs_finished.inc(status="cancelled")
+            return claim(worker_id)
+
+        if job["attempts"] >= job["max_attempts"]:
+            # Venció en su último intento: no se vuelve a ejecutar
+            connection.execute(
+                update(table).where(table.c.id == job["id"]).values(
+                    status="dead", locked_by=None, locked_until=None, finished_at=now,
+                    last_error=job["last_error"] or "Se agotó el tiempo de visibilidad en el último intento",
+                )
+            )
+            connection.commit()
+            jobs_finished.inc(status="dead")
+            return claim(worker_id)
+
+        values = {
+            "status": "running",
+            "locked_by": worker_id,
+            "locked_until": now + timedelta(seconds=JOB_VISIBILITY_TIMEOUT),
+            "attempts": job["attempts"] + 1,
+            "started_at": now,
+        }
+        connection.execute(update(table).where(table.c.id == job["id"]).values(**values))
+        connection.commit()
+        if job["attempts"] == 0:
+            jobs_wait_seconds.observe((now - job["created_at"]).total_seconds(), job_class=job["job_class"])
+        job.update(values)
+        return job
+
+
+def load_files(job_id):
+    """(nombre, bytes) de las entradas del trabajo, en orden"""
+    table = ProcessingJobFile.__table__
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(table.c.filename, table.c.data)
+            .where(table.c.job_id == job_id)
+            .order_by(table.c.position)
+        ).all()
+    return [(filename, bytes(data)) for filename, data in rows]
+
+
+def _owned(job_id, worker_id):
+    table = ProcessingJob.__table__
+    return (table.c.id == job_id) & (table.c.status == "running") & (table.c.locked_by == worker_id)
+
+
+def heartbeat(job_id, worker_id):
+    """Extender la visibilidad del trabajo; JobLost si ya no es de este worker"""
+    table = ProcessingJob.__table__
+    with engine.begin() as connection:
+        result = connection.execute(
+            update(table).where(_owned(job_id, worker_id)).values(
+                locked_until=_now() + timedelta(seconds=JOB_VISIBILITY_TIMEOUT)
+            )
+        )
+    if result.rowcount == 0:
+        raise JobLost(f"Job {job_id} is no longer owned by {worker_id}")
+
+
+def complete(job_id, worker_id, processed_file, result_info=None):
+    """
+    Guardar el resultado y marcar el trabajo como terminado, en una transacción
+
+    Args:
+        processed_file: campos del `ProcessedFile` a crear
+    """
+    table = ProcessingJob.__table__
+    now = _now()
+    with SessionLocal() as db:
+        job = db.execute(
+            select(table.c.user_id, table.c.tool_id, table.c.job_class, table.c.started_at)
+            .where(_owned(job_id, worker_id))
+        ).first()
+        if job is None:
+            raise JobLost(f"Job {job_id} is no longer owned by {worker_id}")
+        record = ProcessedFile(user_id=job.user_id, tool_id=job.tool_id, **processed_file)
+        db.add(record)
+        db.flush()
+        record_id = record.id
+        run_seconds = (now - job.started_at).total_seconds()
+        # El UPDATE condicionado es el que decide: si el trabajo cambió de dueño
+        # entre la lectura y acá, no se guarda nada
+        result = db.execute(
+            update(table).where(_owned(job_id, worker_id)).values(
+                status="succeeded",
+                processed_file_id=record_id,
+                run_seconds=run_seconds,
+                result_info=result_info,
+                locked_by=None,
+                locked_until=None,
+                finished_at=now,
+            )
+        )
+        if result.rowcount == 0:
+            db.rollback()
+            raise JobLost(f"Job {job_id} is no longer owned by {worker_id}")
+        db.commit()
+    jobs_finished.inc(status="succeeded")
+    jobs_run_seconds.observe(run_seconds, job_class=job.job_class)
+    return record_id
+
+
+def fail(job_id, worker_id, error, retryable):
+    """
+    Registrar un intento fallido
+
+    Los errores de infraestructura (`retryable`) vuelven a la cola con backoff hasta
+    agotar los intentos (`dead`); los del procesador terminan el trabajo (`failed`).
+
+    Returns:
+        El estado resultante.
+    """
+    table = ProcessingJob.__table__
+    now = _now()
+    with engine.begin() as connection:
+        job = connection.execute(
+            select(table.c.attempts, table.c.max_attempts).where(_owned(job_id, worker_id))
+        ).first()
+        if job is None:
+            raise JobLost(f"Job {job_id} is no longer owned by {worker_id}")
+        attempts, max_attempts = job
+        values = {"locked_by": None, "locked_until": None, "last_error": str(error)[:4000]}
+        if retryable and attempts < max_attempts:
+            status = "queued"
+            values["available_at"] = now + timedelta(seconds=retry_delay(attempts))
+        else:
+            status = "dead" if retryable else "failed"
+            values["finished_at"] = now
+        values["status"] = status
+        connection.execute(update(table).where(table.c.id == job_id).values(**values))
+
+    if status == "queued":
+        jobs_retried.inc()
+        print(f"🔁 Job {job_id} will be retried (attempt {attempts}/{max_attempts}): {error}")
+    else:
+        jobs_finished.inc(status=status)
+    return status
+
+
+def finish_interrupted(job_id, worker_id, status, reason):
+    """Registrar un trabajo cancelado o que superó su tiempo (sin resultado)"""
+    table = ProcessingJob.__table__
+    with engine.begin() as connection:
+        result = connection.execute(
+            update(table).where(_owned(job_id, worker_id)).values(
+                status=status, locked_by=None, locked_until=None, finished_at=_now(),
+                last_error=reason,
+            )
+        )
+    if result.rowcount == 0:
+        raise JobLost(f"Job {job_id} is no longer owned by {worker_id}")
+    jobs_finished.inc(status=status)
+
+
+def request_cancel(job_id):
+    """
+    Pedir la cancelación de un trabajo
+
+    Returns:
+        El estado del trabajo después del pedido: "cancelled" si estaba en cola,
+        "running" si el worker todavía tiene que interrumpirlo, o su estado final si ya
+        había terminado. None si no existe.
+    """
+    table = ProcessingJob.__table__
+    now = _now()
+    with engine.begin() as connection:
+        cancelled = connection.execute(
+            update(table).where((table.c.id == job_id) & (table.c.status == "queued")).values(
+                status="cancelled", cancel_requested=True, finished_at=now,
+                last_error="El procesamiento fue cancelado",
+            )
+        ).rowcount
+        if not cancelled:
+            connection.execute(
+                update(table).where((table.c.id == job_id) & (table.c.status == "running"))
+                .values(cancel_requested=True)
+            )
+        status = connection.execute(select(table.c.status).where(table.c.id == job_id)).scalar()
+    if cancelled:
+        jobs_finished.inc(status="cancelled")
+    return status
+
+
+def is_cancel_requested(job_id):
+    table = ProcessingJob.__table__
+    with engine.connect() as connection:
+        return bool(connection.execute(
+            select(table.c.cancel_requested).where(table.c.id == job_id)
+        ).scalar())
+
+
+def get_job(job_id):
+    """Estado de un trabajo (sin los archivos), o None"""
+    table = ProcessingJob.__table__
+    with engine.connect() as connection:
+        row = connection.execute(select(table).where(table.c.id == job_id)).mappings().first()
+    return dict(row) if row else None
+
+
+def get_jobs(job_ids):
+    table = ProcessingJob.__table__
+    with engine.connect() as connection:
+        rows = connection.execute(select(table).where(table.c.id.in_(list(job_ids)))).mappings().all()
+    return {row["id"]: dict(row) for row in rows}
+
+
+def queue_stats():
+    """Cantidad de trabajos por estado y trabajos en cola por clase, para /ready"""
+    table = ProcessingJob.__table__
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(table.c.status, func.count()).group_by(table.c.status)
+        ).all()
+        queued = connection.execute(
+            select(table.c.job_class, func.count())
+            .where(table.c.status == "queued")
+            .group_by(table.c.job_class)
+        ).all()
+    stats = {status: count for status, count in rows}
+    stats["depth"] = sum(stats.get(status, 0) for status in ACTIVE_STATUSES)
+    stats["queued_by_class"] = {job_class: count for job_class, count in queued}
+    return stats
+
+
+def _finished_before(cutoff):
+    table = ProcessingJob.__table__
+    return table.c.status.in_(FINAL_STATUSES) & (table.c.finished_at <= cutoff)
+
+
+def _delete_in_batches(table, condition):
+    """Borrar las filas que cumplen `condition`, de a PURGE_BATCH_SIZE por transacción"""
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            ids = connection.execute(
+                select(table.c.id).where(condition).limit(PURGE_BATCH_SIZE)
+            ).scalars().all()
+            if ids:
+                connection.execute(delete(table).where(table.c.id.in_(ids)))
+        total += len(ids)
+        if len(ids) < PURGE_BATCH_SIZE:
+            return total
+
+
+def purge_expired():
+    """
+    Borrar las entradas de los trabajos terminados y los trabajos viejos
+
+    Returns:
+        dict con las filas borradas de cada tabla.
+    """
+    jobs_table = ProcessingJob.__table__
+    files_table = ProcessingJobFile.__table__
+    now = _now()
+    # Las entradas se van a más tardar con su trabajo
+    input_cutoff = now - timedelta(seconds=min(JOB_INPUT_RETENTION_SECONDS, JOB_RETENTION_SECONDS))
+    job_cutoff = now - timedelta(seconds=JOB_RETENTION_SECONDS)
+
+    report = {
+        "input_files": _delete_in_batches(
+            files_table,
+            files_table.c.job_id.in_(select(jobs_table.c.id).where(_finished_before(input_cutoff))),
+        ),
+        "jobs": _delete_in_batches(jobs_table, _finished_before(job_cutoff)),
+    }
+    jobs_purged.inc(report["input_files"], table="processing_job_files")
+    jobs_purged.inc(report["jobs"], table="processing_jobs")
+    if report["input_files"] or report["jobs"]:
+        print(f"🧹 Job retention: removed {report['input_files']} input files and {report['jobs']} finished jobs")
+    return report
+
+
+def job_summary(job):
+    """Representación pública de un trabajo para la API"""
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "job_class": job["job_class"],
+        "status": job["status"],
+        "tool_id": job["tool_id"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "processed_file_id": job["processed_file_id"],
+        "expected_seconds": job["expected_seconds"],
+        "run_seconds": job["run_seconds"],
+        "cancel_requested": bool(job["cancel_requested"]),
+        "error": job["last_error"] if job["status"] in UNSUCCESSFUL_STATUSES else None,
+        "created_at": job["created_at"].isoformat() if job["created_at"] else None,
+        "started_at": job["started_at"].isoformat() if job["started_at"] else None,
+        "finished_at": job["finished_at"].isoformat() if job["finished_at"] else None,
+        "result": job["result_info"],
+    }
@@ -0,0 +1,242 @@
+"""
+Límites de tiempo y memoria de los procesadores, y cancelación de ejecuciones.
+
+Los límites se aplican dentro del worker del pool que ejecuta el trabajo
+(`run_limited`):
+
+- tiempo: un `SIGALRM` (setitimer) a los `timeout_seconds` levanta `JobTimedOut`
+  dentro del procesador.
+- memoria: el soft limit de `RLIMIT_AS` del worker se baja a lo que ya usa más
+  `memory_mb` mientras corre el trabajo; una asignación que lo supera levanta
+  `MemoryError`, que se informa como `JobMemoryExceeded`.
+- cancelación: el worker de la cola crea el archivo `CANCEL_FILE` en el directorio del
+  trabajo y le manda `SIGUSR1` al proceso (cuyo pid está en `PID_FILE`); el handler
+  levanta `JobCancelled` solo si el archivo existe en el directorio del trabajo que
+  está corriendo, así que una señal que llega tarde a un worker que ya pasó a otro
+  trabajo se ignora.
+
+Las excepciones de interrupción heredan de `BaseException`, así que los `except
+Exception` de los procesadores no las atrapan. Si igual las atrapa (un `except:`
+pelado) o las envuelve en otra excepción, el handler deja anotada la interrupción y
+`run_limited` la levanta al terminar el procesador, con o sin resultado: un
+procesador interrumpido puede haber dejado el resultado a medias. Un `MemoryError`
+envuelto por el procesador también se informa como `JobMemoryExceeded`.
+
+Las tres son cooperativas: la excepción se levanta entre instrucciones de Python, no
+en medio de una llamada larga a C. Si el procesador no termina `JOB_KILL_GRACE_SECONDS`
+después, el worker de la cola mata el proceso (`kill`) y el pool se recrea.
+
+Los límites por herramienta se configuran con `TOOL_LIMITS`, un JSON con la key de
+la herramienta (la de PROCESSING_TOOL_KEYS, o el archivo sin `.py` en las de
+vinculación):
+
+    TOOL_LIMITS='{"facturacion": {"timeout_seconds": 1800, "memory_mb": 4096}}'
+"""
+import json
+import os
+import signal
+import time
+
+from processing import scratch
+
+try:
+    import resource
+except ImportError:  # Windows: sin límite de memoria
+    resource = None
+
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "900"))
+# Memoria adicional permitida a un trabajo (0 = sin límite)
+JOB_MEMORY_LIMIT_MB = float(os.getenv("JOB_MEMORY_LIMIT_MB", "0"))
+# Tiempo que se espera a que el procesador atienda la interrupción antes de matarlo
+JOB_KILL_GRACE_SECONDS = float(os.getenv("JOB_KILL_GRACE_SECONDS", "10"))
+TOOL_LIMITS = json.loads(os.getenv("TOOL_LIMITS", "{}") or "{}")
+
+PID_FILE = ".worker_pid"
+CANCEL_FILE = ".cancel"
+
+_CAN_SIGNAL = hasattr(signal, "SIGUSR1") and hasattr(signal, "setitimer")
+
+# Directorio del trabajo que corre en este worker (lo consulta el handler de SIGUSR1)
+_current_dir = None
+# Interrupción levantada por un handler durante el trabajo actual
+_pending_interrupt = None
+
+
+class JobInterrupted(BaseException):
+    """
+    El trabajo se interrumpió antes de terminar; `status` es el estado final
+
+    Hereda de BaseException para atravesar los `except Exception` de los procesadores.
+    """
+    status = "failed"
+
+
+class JobCancelled(JobInterrupted):
+    status = "cancelled"
+
+
+class JobTimedOut(JobInterrupted):
+    status = "timed_out"
+
+
+class JobMemoryExceeded(JobInterrupted):
+    status = "failed"
+
+
+def limits_for(tool_name):
+    """Límites de la herramienta: los de TOOL_LIMITS sobre los valores por defecto"""
+    limits = {"timeout_seconds": JOB_TIMEOUT_SECONDS, "memory_mb": JOB_MEMORY_LIMIT_MB}
+    limits.update(TOOL_LIMITS.get(tool_name, {}))
+    return limits
+
+
+def _address_space_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _interrupt(error):
+    """Anotar la interrupción (por si el procesador la atrapa) y levantarla"""
+    global _pending_interrupt
+    _pending_interrupt = error
+    raise error
+
+
+def _on_alarm(signum, frame):
+    _interrupt(JobTimedOut("El procesamiento superó el tiempo máximo"))
+
+
+def _on_cancel(signum, frame):
+    if _current_dir and os.path.exists(os.path.join(_current_dir, CANCEL_FILE)):
+        _interrupt(JobCancelled("El procesamiento fue cancelado"))
+
+
+def _caused_by(error, error_type):
+    """Si `error` o alguna de las excepciones que envuelve es de `error_type`"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, error_type):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def run_limited(job_dir, limits, function, *args):
+    """
+    Ejecutar `function(*args)` dentro del worker del pool, con los límites del trabajo
+
+    Los temporales del procesador van al directorio del trabajo (ver processing/scratch.py).
+
+    Args:
+        job_dir: directorio del trabajo (pid del worker y pedido de cancelación)
+        limits: dict de `limits_for`
+    """
+    with scratch.redirect_tempdir(job_dir):
+        return _run_limited(job_dir, limits, function, *args)
+
+
+def _run_limited(job_dir, limits, function, *args):
+    global _current_dir, _pending_interrupt
+    if not _CAN_SIGNAL:
+        return function(*args)
+
+    # Queda instalado al terminar: con _current_dir en None, una señal tardía se ignora
+    # (la acción por defecto de SIGUSR1 mataría al worker)
+    signal.signal(signal.SIGUSR1, _on_cancel)
+    with open(os.path.join(job_dir, PID_FILE), "w") as f:
+        f.write(str(os.getpid()))
+    memory_mb = limits.get("memory_mb") or 0
+    previous_alarm = signal.getsignal(signal.SIGALRM)
+    previous_rlimit = None
+    try:
+        _pending_interrupt = None
+        _current_dir = job_dir
+        signal.signal(signal.SIGALRM, _on_alarm)
+        # Cancelado antes de que el worker lo tomara (la señal llegó antes que el handler)
+        if os.path.exists(os.path.join(job_dir, CANCEL_FILE)):
+            raise JobCancelled("El procesamiento fue cancelado")
+
+        in_use = _address_space_bytes() if memory_mb and resource is not None else None
+        if in_use is not None:
+            previous_rlimit = resource.getrlimit(resource.RLIMIT_AS)
+            soft = in_use + int(memory_mb * 1024 * 1024)
+            hard = previous_rlimit[1]
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+        if limits.get("timeout_seconds"):
+            signal.setitimer(signal.ITIMER_REAL, limits["timeout_seconds"])
+        result = function(*args)
+        if _pending_interrupt is not None:
+            # El procesador atrapó la interrupción y siguió
+            raise _pending_interrupt
+        return result
+    except JobInterrupted:
+        raise
+    except BaseException as e:
+        # El procesador envolvió la interrupción (o el MemoryError) en su propia excepción
+        if _pending_interrupt is not None:
+            raise _pending_interrupt from e
+        if _caused_by(e, MemoryError):
+            raise JobMemoryExceeded(f"El procesamiento superó el límite de memoria ({memory_mb:.0f} MB)") from e
+        raise
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        _current_dir = None
+        _pending_interrupt = None
+        try:
+            os.unlink(os.path.join(job_dir, PID_FILE))
+        except OSError:
+            pass
+        if previous_rlimit is not None:
+            resource.setrlimit(resource.RLIMIT_AS, previous_rlimit)
+        signal.signal(signal.SIGALRM, previous_alarm)
+
+
+def _worker_pid(job_dir):
+    try:
+        with open(os.path.join(job_dir, PID_FILE)) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def request_interrupt(job_dir):
+    """Pedirle al worker que está ejecutando el trabajo que lo cancele"""
+    with open(os.path.join(job_dir, CANCEL_FILE), "w"):
+        pass
+    pid = _worker_pid(job_dir)
+    if pid is not None and _CAN_SIGNAL:
+        try:
+            os.kill(pid, signal.SIGUSR1)
+        except OSError:
+            pass
+
+
+def kill_worker(job_dir):
+    """
+    Matar el worker que ejecuta el trabajo (no atendió la interrupción)
+
+    Returns:
+        True si había un worker para matar.
+    """
+    pid = _worker_pid(job_dir)
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+    except OSError:
+        return False
+    return True
+
+
+def deadline_from(limits, started=None):
+    """Momento (time.monotonic) a partir del cual el worker de la cola mata la ejecución"""
+    if not limits.get("timeout_seconds"):
+        return None
+    return (started or time.monotonic()) + limits["timeout_seconds"] + JOB_KILL_GRACE_SECONDS
@@ -0,0 +1,103 @@
+"""
+Protocolo de procesadores en memoria.
+
+El contrato original de un procesador es por rutas: `process_file(ruta)` lee la
+entrada del disco y escribe el xlsx en disco, y quien lo llama lee la salida y la
+borra. Los procesadores que exponen `process_bytes` trabajan en memoria:
+
+    def process_bytes(data, filename):
+        ...
+        return df_resultado        # o los bytes de un xlsx ya armado
+
+- `data` son los bytes del archivo subido y `filename` su nombre original (la
+  extensión decide cómo leerlo). `buffer(data)` da un objeto tipo archivo que aceptan
+  pandas y openpyxl; los CSV se leen con `csv_io.read_csv_bytes`.
+- el resultado es un DataFrame, que se escribe como xlsx de una hoja sin índice
+  (`xlsx_bytes`), o los bytes de un xlsx ya armado para los que aplican formato. Como
+  en `process_file`, también se acepta una tupla cuyo primer elemento es el resultado.
+
+Las herramientas de vinculación exponen `process_buffers(inputs)`, con `inputs` la
+lista de (nombre, bytes) en orden, y devuelven (bytes del xlsx, nombre de la salida).
+
+El executor y el runner de vinculación prefieren estas funciones y solo escriben las
+entradas en disco (`write_inputs`, en el directorio del trabajo) para los módulos que
+exponen únicamente la versión con rutas. Los módulos mantienen `process_file` /
+`process_files` como una capa fina sobre la versión en memoria (`run_on_path`), para
+el CLI y las herramientas externas.
+"""
+import io
+import os
+import tempfile
+
+PROCESS_BYTES = "process_bytes"
+PROCESS_BUFFERS = "process_buffers"
+
+
+def buffer(data):
+    """Objeto tipo archivo sobre los bytes de la entrada"""
+    return io.BytesIO(data)
+
+
+def extension(filename):
+    return os.path.splitext(filename or "")[1].lower()
+
+
+def xlsx_bytes(df, sheet_name="Sheet1", index=False):
+    """Escribir un DataFrame como xlsx en memoria"""
+    import pandas as pd
+
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, sheet_name=sheet_name, index=index)
+    return output.getvalue()
+
+
+def output_bytes(result):
+    """Normalizar el resultado de `process_bytes` a los bytes del xlsx"""
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, (bytes, bytearray)):
+        return bytes(result)
+    # pandas se importa acá y no al cargar el módulo: main lo importa al arrancar
+    import pandas as pd
+
+    if isinstance(result, pd.DataFrame):
+        return xlsx_bytes(result)
+    raise TypeError(f"Resultado de procesador no soportado: {type(result).__name__}")
+
+
+def read_path(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def run_on_path(process_bytes, filepath, output_path, *args):
+    """
+    Ejecutar un procesador en memoria sobre un archivo en disco y escribir la salida
+
+    Returns:
+        `output_path`, como `process_file`.
+    """
+    result = process_bytes(read_path(filepath), os.path.basename(filepath), *args)
+    with open(output_path, "wb") as f:
+        f.write(output_bytes(result))
+    return output_path
+
+
+def write_inputs(files, directory=None):
+    """
+    Escribir en disco las entradas de un procesador que solo acepta rutas
+
+    Sin `directory` van al directorio temporal, que en la cola es el del trabajo.
+
+    Returns:
+        Las rutas, en el orden de `files` (lista de (nombre, bytes)).
+    """
+    directory = directory or tempfile.gettempdir()
+    paths = []
+    for position, (filename, data) in enumerate(files):
+        path = os.path.join(directory, f"input_{position}{extension(filename)}")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    return paths
@@ -0,0 +1,162 @@
+"""
+Precarga de procesadores al iniciar la aplicación.
+
+El primer request de cada herramienta pagaba la importación en frío del módulo del
+procesador (y de pandas, openpyxl, xlrd, dateutil). Al arrancar, esta fase importa en
+paralelo todos los procesadores registrados, valida que expongan la función esperada
+con una firma que el handler sabe llamar y deja un reporte con el tiempo de
+importación de cada módulo. Los errores aparecen en el deploy (y en /health) en lugar
+de en el request del primer usuario.
+
+También precalienta los workers del pool de procesamiento, que con `spawn` arrancan
+sin nada importado.
+"""
+import importlib
+import inspect
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+PREWARM_PROCESSORS = os.getenv("PREWARM_PROCESSORS", "true").lower() == "true"
+PREWARM_POOL = os.getenv("PREWARM_POOL", "true").lower() == "true"
+# Con PREWARM_STRICT=true un procesador que no importa hace fallar el arranque
+PREWARM_STRICT = os.getenv("PREWARM_STRICT", "false").lower() == "true"
+PREWARM_THREADS = int(os.getenv("PREWARM_THREADS", "4"))
+
+# Parámetros que el handler pasa por nombre además de la ruta (ver executor.call_processor)
+OPTIONAL_PARAMS = ("original_filename", "return_bytes")
+# Parámetros que se pasan siempre, por función (ver processing/memory_io.py)
+PASSED_PARAMS = {"process_bytes": ("filename",)}
+
+_report = None
+
+
+class PrewarmError(RuntimeError):
+    """Algún procesador no se pudo importar o validar (solo con PREWARM_STRICT)"""
+
+
+def check_signature(function, passed=()):
+    """
+    Validar que el procesador se pueda llamar como `f(ruta)` (o `f(datos, *passed)`)
+
+    Returns:
+        Mensaje de error, o None si la firma es válida.
+    """
+    if not callable(function):
+        return "no es una función"
+    try:
+        params = list(inspect.signature(function).parameters.values())
+    except (TypeError, ValueError) as e:
+        return f"firma ilegible: {e}"
+
+    positional = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    if not params or params[0].kind not in positional:
+        return "debe recibir la ruta del archivo como primer parámetro"
+
+    required = [
+        p.name for p in params[1:]
+        if p.default is inspect.Parameter.empty and p.name not in passed
+        and p.kind not in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
+    ]
+    if required:
+        return f"parámetros obligatorios no soportados: {', '.join(required)}"
+    return None
+
+
+def prewarm_module(module_path, function_names):
+    """
+    Importar un procesador y validar su función; devuelve el resultado para el reporte
+
+    `function_names` es una función o una tupla de alternativas en orden de preferencia:
+    se valida la primera que exponga el módulo, que es la que llama el executor.
+    """
+    if isinstance(function_names, str):
+        function_names = (function_names,)
+    result = {"module": module_path, "function": function_names[0]}
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(module_path)
+        result["import_seconds"] = round(time.perf_counter() - start, 4)
+        function_name = next((name for name in function_names if hasattr(module, name)), None)
+        if function_name is None:
+            result.update(status="error", error=f"no expone {' ni '.join(function_names)}")
+            return result
+        result["function"] = function_name
+        function = getattr(module, function_name)
+        error = check_signature(function, PASSED_PARAMS.get(function_name, ()))
+        if error:
+            result.update(status="error", error=f"{function_name}: {error}")
+            return result
+        result["signature"] = str(inspect.signature(function))
+        result["status"] = "ok"
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}",
+                      import_seconds=round(time.perf_counter() - start, 4))
+    return result
+
+
+def prewarm_processors(processors):
+    """
+    Importar en paralelo todos los procesadores
+
+    Args:
+        processors: lista de (módulo, función o alternativas) a validar, p.ej.
+            ("company_01.ventas", ("process_bytes", "process_file"))
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, PREWARM_THREADS), thread_name_prefix="prewarm") as pool:
+        modules = list(pool.map(lambda item: prewarm_module(*item), processors))
+    errors = [m for m in modules if m["status"] != "ok"]
+    return {
+        "status": "error" if errors else "ok",
+        "started_at": datetime.utcnow().isoformat(),
+        "total_seconds": round(time.perf_counter() - start, 4),
+        "modules": modules,
+        "errors": len(errors),
+    }
+
+
+def print_report(report):
+    print(f"🔥 Procesadores precargados en {report['total_seconds']:.2f}s "
+          f"({len(report['modules']) - report['errors']}/{len(report['modules'])} OK)")
+    for module in sorted(report["modules"], key=lambda m: -m.get("import_seconds", 0)):
+        if module["status"] == "ok":
+            print(f"   ✅ {module['module']}.{module['function']}: {module['import_seconds']:.2f}s")
+        else:
+            print(f"   ❌ {module['module']}.{module['function']}: {module['error']}")
+    pool = report.get("pool")
+    if pool and "error" in pool:
+        print(f"   ❌ Workers del pool: {pool['error']}")
+    elif pool:
+        print(f"   ⚙️ Workers precalentados: {pool['workers_warmed']} en {pool['seconds']:.2f}s")
+
+
+def set_report(report):
+    global _report
+    _report = report
+
+
+def get_report():
+    """Último reporte de precarga (None si no se ejecutó)"""
+    return _report
+
+
+def health():
+    """Resumen para /health"""
+    report = get_report()
+    if report is None:
+        return {"status": "skipped" if not PREWARM_PROCESSORS else "pending"}
+    return {
+        "status": "healthy" if report["status"] == "ok" else "unhealthy",
+        "total_seconds": report["total_seconds"],
+        "errors": report["errors"],
+        "modules": {
+            f"{m['module']}.{m['function']}": (
+                {"import_seconds": m.get("import_seconds")} if m["status"] == "ok"
+                else {"error": m["error"]}
+            )
+            for m in report["modules"]
+        },
+        "pool": report.get("pool"),
+    }
@@ -0,0 +1,58 @@
+"""
+Metadatos de la ejecución en curso de un procesador.
+
+El handler abre un contexto con `run_context(...)` antes de llamar al procesador y
+las utilidades compartidas (lector de CSV, etc.) registran en él lo que detectan,
+sin que los procesadores tengan que cambiar su firma.
+"""
+import contextvars
+from contextlib import contextmanager
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+class RunMetadata:
+    """Datos de una ejecución: herramienta, empresa y lo registrado durante el proceso"""
+
+    def __init__(self, tool=None, company=None, **extra):
+        self.tool = tool
+        self.company = company
+        self.extra = extra
+        self.data = {}
+
+    def record(self, key, value):
+        self.data[key] = value
+
+    def append(self, key, value):
+        self.data.setdefault(key, []).append(value)
+
+    def to_dict(self):
+        return dict(self.data)
+
+
+@contextmanager
+def run_context(tool=None, company=None, **extra):
+    """Abrir un contexto de ejecución para el procesador que se va a llamar"""
+    run = RunMetadata(tool=tool, company=company, **extra)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def current_run():
+    """Ejecución en curso, o None si el procesador se llama fuera de un contexto"""
+    return _current_run.get()
+
+
+def record(key, value):
+    run = current_run()
+    if run is not None:
+        run.record(key, value)
+
+
+def append(key, value):
+    run = current_run()
+    if run is not None:
+        run.append(key, value)
@@ -0,0 +1,160 @@
+"""
+Directorios temporales de los trabajos y limpieza de lo que quede huérfano.
+
+Cada trabajo de la cola corre en su propio directorio (`job_dir`) bajo `SCRATCH_DIR`:
+ahí se escriben las entradas, y mientras el procesador corre en el pool
+`tempfile.gettempdir()` apunta a ese directorio (`redirect_tempdir`), así que las
+salidas y los temporales de los procesadores quedan adentro. El directorio se borra
+al terminar el trabajo, sea cual sea el resultado.
+
+Lo que sobrevive a un worker que murió (kill, OOM, reinicio) lo borra `sweep`, que
+corre en segundo plano cada `SCRATCH_SWEEP_INTERVAL` segundos:
+
+- directorios de trabajo cuyo proceso dueño (el pid está en el nombre) ya no existe
+- archivos de `downloads/` más viejos que `SCRATCH_MAX_AGE_SECONDS` (herramientas que
+  escriben ahí su salida; en el camino feliz se borra apenas se lee)
+
+Por defecto `SCRATCH_DIR` está en `/dev/shm` (tmpfs, en memoria) si tiene al menos
+`SCRATCH_TMPFS_MIN_FREE_MB` libres, y si no en el directorio temporal del sistema.
+"""
+import asyncio
+import contextlib
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import metrics
+
+SCRATCH_TMPFS_MIN_FREE_MB = float(os.getenv("SCRATCH_TMPFS_MIN_FREE_MB", "512"))
+# Antigüedad a partir de la cual un archivo de downloads/ se considera abandonado
+SCRATCH_MAX_AGE_SECONDS = float(os.getenv("SCRATCH_MAX_AGE_SECONDS", "3600"))
+SCRATCH_SWEEP_INTERVAL = float(os.getenv("SCRATCH_SWEEP_INTERVAL", "300"))
+DOWNLOADS_DIR = "downloads"
+
+_JOB_DIR_NAME = re.compile(r"^job_(\d+)_(\d+)_")
+
+# Directorios de trabajo abiertos por este proceso
+_active = set()
+
+scratch_disk_bytes = metrics.gauge("scratch_disk_bytes", "Bytes used by temporary files at the last sweep, by directory")
+scratch_leaked = metrics.counter("scratch_leaked_files_total", "Orphaned temporary files and job directories removed by the sweeper")
+metrics.gauge("scratch_job_dirs_active", "Job scratch directories open in this process", fn=lambda: len(_active))
+
+
+def _default_root():
+    shm = "/dev/shm"
+    try:
+        if os.access(shm, os.W_OK) and shutil.disk_usage(shm).free >= SCRATCH_TMPFS_MIN_FREE_MB * 1024 * 1024:
+            return os.path.join(shm, "insightgrid_scratch")
+    except OSError:
+        pass
+    return os.path.join(tempfile.gettempdir(), "insightgrid_scratch")
+
+
+SCRATCH_DIR = os.getenv("SCRATCH_DIR") or _default_root()
+
+
+@contextlib.contextmanager
+def job_dir(job_id):
+    """Directorio temporal del trabajo; se borra al salir, con o sin error"""
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    # El pid en el nombre le dice al sweeper si el dueño sigue vivo
+    path = tempfile.mkdtemp(prefix=f"job_{job_id}_{os.getpid()}_", dir=SCRATCH_DIR)
+    _active.add(path)
+    try:
+        yield path
+    finally:
+        _active.discard(path)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def redirect_tempdir(path):
+    """Dentro del worker del pool: los temporales del procesador van a `path`"""
+    previous = tempfile.tempdir
+    tempfile.tempdir = path
+    try:
+        yield
+    finally:
+        tempfile.tempdir = previous
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _tree_size(path):
+    total = 0
+    files = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+                files += 1
+            except OSError:
+                pass
+    return total, files
+
+
+def sweep():
+    """
+    Borrar los temporales huérfanos y actualizar las métricas de uso de disco
+
+    Returns:
+        dict con lo borrado y lo que ocupa cada directorio.
+    """
+    now = time.time()
+    report = {"removed_job_dirs": 0, "removed_downloads": 0}
+
+    if os.path.isdir(SCRATCH_DIR):
+        for name in os.listdir(SCRATCH_DIR):
+            path = os.path.join(SCRATCH_DIR, name)
+            match = _JOB_DIR_NAME.match(name)
+            # Con el dueño vivo el trabajo puede seguir corriendo, dure lo que dure
+            if not match or path in _active or _pid_alive(int(match.group(2))):
+                continue
+            _, files = _tree_size(path)
+            shutil.rmtree(path, ignore_errors=True)
+            scratch_leaked.inc(files + 1, dir="scratch")
+            report["removed_job_dirs"] += 1
+            print(f"🧹 Removed orphaned job directory {name} ({files} files)")
+
+    if os.path.isdir(DOWNLOADS_DIR):
+        for name in os.listdir(DOWNLOADS_DIR):
+            path = os.path.join(DOWNLOADS_DIR, name)
+            try:
+                if not os.path.isfile(path) or now - os.stat(path).st_mtime < SCRATCH_MAX_AGE_SECONDS:
+                    continue
+                os.unlink(path)
+            except OSError:
+                continue
+            scratch_leaked.inc(dir="downloads")
+            report["removed_downloads"] += 1
+        if report["removed_downloads"]:
+            print(f"🧹 Removed {report['removed_downloads']} stale files from {DOWNLOADS_DIR}/")
+
+    for label, path in (("scratch", SCRATCH_DIR), ("downloads", DOWNLOADS_DIR)):
+        size, files = _tree_size(path) if os.path.isdir(path) else (0, 0)
+        scratch_disk_bytes.set(size, dir=label)
+        report[label] = {"path": path, "bytes": size, "files": files}
+    return report
+
+
+async def sweep_loop():
+    """Tarea de fondo: barrer cada SCRATCH_SWEEP_INTERVAL segundos (la primera vez al arrancar)"""
+    while True:
+        try:
+            await asyncio.to_thread(sweep)
+        except Exception as e:
+            print(f"⚠️ Scratch sweep failed: {str(e)}")
+        await asyncio.sleep(SCRATCH_SWEEP_INTERVAL)
@@ -0,0 +1,106 @@
+"""
+Estado compartido entre los workers del servidor.
+
+Con varios workers (ver gunicorn.conf.py) cada proceso tiene sus propias cachés en
+memoria (catálogo, contexto de usuario). Lo que tiene que ser global vive acá, en
+archivos de un directorio local protegidos con `flock`:
+
+- contadores de generación: cada caché guarda la generación con la que se construyó
+  y la descarta cuando el contador compartido avanzó. Invalidar en un worker
+  (`bump`) invalida en todos; leer la generación es leer un archivo de pocos bytes.
+- locks entre procesos (`process_lock`) para trabajo que debe correr una sola vez
+  por máquina, como las migraciones al arrancar.
+- estado JSON chico que se lee y modifica bajo lock (`update_json`), como los
+  token buckets del control de admisión.
+
+El directorio es local a la máquina: varias réplicas en máquinas distintas
+comparten la base de datos, no este estado.
+"""
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo worker, alcanza con el lock de hilos
+    fcntl = None
+
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", os.path.join(tempfile.gettempdir(), "insightgrid_shared"))
+
+# Un lock de hilos por nombre (sin fcntl es la única exclusión): un lock largo, como
+# el de las migraciones, no frena a los demás nombres, y se pueden anidar nombres distintos
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(name):
+    with _thread_locks_guard:
+        lock = _thread_locks.get(name)
+        if lock is None:
+            lock = _thread_locks[name] = threading.Lock()
+        return lock
+
+
+def _path(name, suffix):
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    return os.path.join(SHARED_STATE_DIR, f"{safe}{suffix}")
+
+
+@contextlib.contextmanager
+def process_lock(name):
+    """Lock exclusivo entre procesos de la máquina (y entre hilos del proceso), por nombre"""
+    os.makedirs(SHARED_STATE_DIR, exist_ok=True)
+    with _thread_lock(name):
+        with open(_path(name, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def get_generation(name):
+    """Generación actual del contador `name` (0 si nunca se incrementó)"""
+    try:
+        with open(_path(name, ".gen")) as f:
+            return int(f.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_atomic(path, content):
+    # Escritura atómica: los lectores que no toman el lock ven el archivo viejo o el nuevo
+    fd, tmp_path = tempfile.mkstemp(dir=SHARED_STATE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def update_json(name, fn):
+    """
+    Leer el estado `name` (un dict), aplicarle `fn` y guardarlo, bajo lock
+
+    `fn` recibe el dict y lo modifica en el lugar; lo que devuelve se devuelve acá.
+    """
+    with process_lock(name):
+        try:
+            with open(_path(name, ".json")) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        result = fn(state)
+        _write_atomic(_path(name, ".json"), json.dumps(state))
+    return result
+
+
+def bump_generation(name):
+    """Incrementar el contador `name` para todos los workers y devolver el nuevo valor"""
+    with process_lock(name):
+        generation = get_generation(name) + 1
+        _write_atomic(_path(name, ".gen"), str(generation))
+    return generation
@@ -0,0 +1,62 @@
+"""
+Presupuesto de arranque: importar `main` no debe cargar los módulos pesados.
+
+Railway reinicia seguido y cada segundo de arranque se paga; los procesadores, pandas
+y openpyxl se cargan recién cuando hacen falta (ver main.py). Este test importa
+`main` en un proceso nuevo con `python -X importtime` y falla si se cuela alguno de
+esos módulos o si el tiempo acumulado supera el presupuesto.
+
+    python -m pytest tests
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Medido ~0.8 s; el margen cubre máquinas de CI más lentas
+IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET_SECONDS", "2.5"))
+HEAVY_MODULES = ("pandas", "openpyxl", "numpy", "xlrd", "fastapi_sso")
+
+
+def import_main():
+    """Importar main en un proceso nuevo; devuelve (módulos pesados cargados, segundos)"""
+    env = dict(os.environ)
+    env.pop("DATABASE_URL", None)
+    code = (
+        "import sys, main; "
+        f"print('HEAVY=' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules), flush=True)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) == 3 and parts[2].strip() == "main":
+            cumulative_us = int(parts[1])
+    assert cumulative_us is not None, "importtime no reportó el módulo main"
+
+    # main imprime sus propios mensajes al importarse
+    marker = [line for line in result.stdout.splitlines() if line.startswith("HEAVY=")]
+    assert marker, result.stdout[-2000:]
+    loaded = [m for m in marker[-1][len("HEAVY="):].split(",") if m]
+    return loaded, cumulative_us / 1_000_000
+
+
+def test_import_main_skips_heavy_modules():
+    loaded, _ = import_main()
+    assert loaded == [], f"importar main cargó {loaded}"
+
+
+def test_import_main_within_budget():
+    _, seconds = import_main()
+    assert seconds < IMPORT_BUDGET_SECONDS, (
+        f"importar main tardó {seconds:.2f}s (presupuesto {IMPORT_BUDGET_SECONDS}s)"
+    )
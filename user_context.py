@@ -0,0 +1,133 @@
+"""
+Contexto del usuario autenticado.
+
+Resuelve la sesión a (id, admin, empresas permitidas) una vez por request y lo
+guarda en una caché en proceso con TTL corto, de modo que la ráfaga de llamadas del
+dashboard (`/sso/api/user`, `/api/user/companies`, `/config`, `/has-guide`,
+`/history`) cueste una sola consulta. Las ediciones de usuarios y empresas desde el
+panel de administración invalidan la caché; la invalidación avanza un contador de
+`shared_state`, así que alcanza a los demás workers (que descartan todas sus entradas).
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from database import get_async_db
+from models import User
+import metrics
+import shared_state
+
+USER_CONTEXT_TTL = float(os.getenv("USER_CONTEXT_TTL_SECONDS", "30"))
+GENERATION_KEY = "user_context"
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+cache_hits = metrics.counter("user_context_cache_hits_total", "User context lookups served from cache")
+cache_misses = metrics.counter("user_context_cache_misses_total", "User context lookups that queried the database")
+
+
+@dataclass(frozen=True)
+class UserContext:
+    id: int
+    username: str
+    email: str
+    is_admin: bool
+    company_ids: FrozenSet[int]
+
+    def can_access_company(self, company_id):
+        return self.is_admin or company_id in self.company_ids
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_admin=bool(user.is_admin),
+            company_ids=frozenset(company.id for company in user.companies),
+        )
+
+
+def _get_cached(email):
+    generation = shared_state.get_generation(GENERATION_KEY)
+    with _cache_lock:
+        entry = _cache.get(email)
+        if entry is None:
+            return None
+        expires_at, entry_generation, context = entry
+        if expires_at < time.monotonic() or entry_generation != generation:
+            del _cache[email]
+            return None
+        return context
+
+
+def _store(context, generation):
+    with _cache_lock:
+        _cache[context.email] = (time.monotonic() + USER_CONTEXT_TTL, generation, context)
+
+
+def invalidate(email=None, shared=True):
+    """
+    Invalidar la caché de un usuario, o de todos si no se indica email
+
+    Con shared=False solo se limpia la caché de este worker (p.ej. al iniciar sesión,
+    donde no cambió nada que otro worker pueda tener cacheado).
+    """
+    if shared:
+        # Los demás workers no saben qué email cambió: descartan toda su caché
+        shared_state.bump_generation(GENERATION_KEY)
+    with _cache_lock:
+        if email is None:
+            _cache.clear()
+        else:
+            _cache.pop(email, None)
+
+
+async def resolve_user_context(request: Request, db: AsyncSession) -> Optional[UserContext]:
+    """Contexto del usuario de la sesión, o None si no hay sesión o usuario"""
+    user_session = request.session.get("user")
+    if not user_session:
+        return None
+
+    context = getattr(request.state, "user_context", None)
+    if context is not None:
+        return context
+
+    email = user_session["email"]
+    context = _get_cached(email)
+    if context is not None:
+        cache_hits.inc()
+    else:
+        cache_misses.inc()
+        # Generación leída antes de consultar: si alguien invalida mientras tanto, la
+        # entrada nace vieja y se descarta en la próxima lectura
+        generation = shared_state.get_generation(GENERATION_KEY)
+        user = await db.scalar(
+            select(User).where(User.email == email).options(selectinload(User.companies))
+        )
+        if not user:
+            return None
+        context = UserContext.from_user(user)
+        _store(context, generation)
+
+    request.state.user_context = context
+    return context
+
+
+async def get_user_context(request: Request, db: AsyncSession = Depends(get_async_db)) -> UserContext:
+    """Dependency: contexto del usuario autenticado (401 sin sesión, 404 si no existe)"""
+    if not request.session.get("user"):
+        raise HTTPException(status_code=401, detail="No autorizado")
+
+    context = await resolve_user_context(request, db)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return context